@@ -0,0 +1,56 @@
+# check_import_time.py
+# Confere o custo de inicialização do pv-process.py com `python -X importtime`: falha (código 1) se
+# a soma dos imports passar do orçamento ou se um backend opcional pesado (MoviePy, Pydub, imageio)
+# for importado só para iniciar. Cada execução em lote paga esse custo a cada trabalho.
+# Uso: python partial-scripts/check_import_time.py [orçamento_ms]
+import os
+import sys
+import subprocess
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DEFAULT_BUDGET_MS = 400
+# Carregados apenas no primeiro uso (fallback do ffprobe, detector "pydub").
+LAZY_ONLY_PACKAGES = ("moviepy", "pydub", "imageio", "imageio_ffmpeg", "proglog")
+RUNS = 3 # Vale a menor soma (a primeira execução paga a leitura do disco)
+
+
+def measure_imports(command):
+    """
+    Executa o comando com -X importtime e retorna {módulo: tempo cumulativo em µs} dos imports de topo.
+    Levanta RuntimeError (com a saída e o stderr, sem as linhas do importtime) se o comando terminar com erro:
+    um import que quebra cedo também seria rápido.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", *command], cwd=REPO_DIR,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        errors = "\n".join(line for line in (result.stdout + result.stderr).splitlines() if not line.startswith("import time:"))
+        raise RuntimeError(f"'{' '.join(command)}' terminou com código {result.returncode}:\n{errors}")
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line: continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(cumulative_us), not name.startswith("  ")) # (µs, é de topo)
+    return modules
+
+
+if __name__ == "__main__":
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET_MS
+    best_total_ms, best_modules = None, None
+    for _ in range(RUNS):
+        try: modules = measure_imports(["pv-process.py", "--help"])
+        except RuntimeError as e:
+            print(f"FALHA: {e}"); sys.exit(1)
+        total_ms = sum(us for us, top_level in modules.values() if top_level) / 1000.0
+        if best_total_ms is None or total_ms < best_total_ms: best_total_ms, best_modules = total_ms, modules
+
+    print(f"Imports de 'pv-process.py --help': {best_total_ms:.0f}ms (orçamento: {budget_ms:.0f}ms)")
+    heaviest = sorted(((us, name) for name, (us, top_level) in best_modules.items() if top_level), reverse=True)[:8]
+    for us, name in heaviest: print(f"  {us / 1000.0:7.1f}ms  {name}")
+
+    failures = []
+    eager = sorted({name.split(".")[0] for name in best_modules if name.split(".")[0] in LAZY_ONLY_PACKAGES})
+    if eager: failures.append(f"backends opcionais importados na inicialização: {', '.join(eager)}")
+    if best_total_ms > budget_ms: failures.append(f"inicialização acima do orçamento ({best_total_ms:.0f}ms > {budget_ms:.0f}ms)")
+    for failure in failures: print(f"FALHA: {failure}")
+    if failures: sys.exit(1)
+    print("OK")
@@ -0,0 +1,91 @@
+# check_segment_plan.py
+# Confere que o plano de segmentos da Etapa 1 (pv_step_01_audio_segment.plan_segments, feito com
+# pv_intervals) é idêntico ao dos laços originais, e mede o tempo com planos muito grandes.
+# Uso: python partial-scripts/check_segment_plan.py
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import pv_step_01_audio_segment as step1
+
+
+def legacy_plan_segments(silent_chunks_ms, duration_ms, speech_start_padding_ms, speech_end_padding_ms):
+    """Cópia dos laços que segment_video usava antes de pv_intervals (referência)."""
+    # 1. Gerar lista inicial de segmentos contíguos
+    initial_segments = []
+    current_time_ms = 0
+    if duration_ms > 0:
+        if not silent_chunks_ms:
+            initial_segments.append({"start_ms": 0, "end_ms": duration_ms, "type": "speech"})
+        else:
+            for silent_start, silent_end in silent_chunks_ms:
+                if silent_start > current_time_ms: initial_segments.append({"start_ms": current_time_ms, "end_ms": silent_start, "type": "speech"})
+                if silent_end > silent_start: initial_segments.append({"start_ms": silent_start, "end_ms": silent_end, "type": "silent"})
+                current_time_ms = silent_end
+            if current_time_ms < duration_ms: initial_segments.append({"start_ms": current_time_ms, "end_ms": duration_ms, "type": "speech"})
+        initial_segments = [s for s in initial_segments if s["end_ms"] > s["start_ms"]]
+        if not initial_segments: initial_segments.append({"start_ms": 0, "end_ms": duration_ms, "type": "speech"})
+    
+    # 2. Aplicar padding e criar a lista final de segmentos
+    final_segments_props = []
+    if initial_segments:
+        expanded_speech = []
+        for seg in initial_segments:
+            if seg['type'] == "speech":
+                expanded_start = max(0, seg['start_ms'] - speech_start_padding_ms)
+                expanded_end = min(duration_ms, seg['end_ms'] + speech_end_padding_ms)
+                expanded_speech.append({"start_ms": expanded_start, "end_ms": expanded_end, "type": "speech"})
+        
+        if expanded_speech:
+            merged_speech = [expanded_speech[0].copy()]
+            for i in range(1, len(expanded_speech)):
+                if expanded_speech[i]['start_ms'] < merged_speech[-1]['end_ms']:
+                    merged_speech[-1]['end_ms'] = max(merged_speech[-1]['end_ms'], expanded_speech[i]['end_ms'])
+                else:
+                    merged_speech.append(expanded_speech[i].copy())
+        else: merged_speech = []
+
+        last_end_time_ms = 0
+        for speech_seg in merged_speech:
+            if speech_seg['start_ms'] > last_end_time_ms:
+                final_segments_props.append({"start_ms": last_end_time_ms, "end_ms": speech_seg['start_ms'], "type": "silent"})
+            final_segments_props.append(speech_seg)
+            last_end_time_ms = speech_seg['end_ms']
+        if last_end_time_ms < duration_ms:
+            final_segments_props.append({"start_ms": last_end_time_ms, "end_ms": duration_ms, "type": "silent"})
+        if not final_segments_props and duration_ms > 0:
+            final_segments_props.append({"start_ms": 0, "end_ms": duration_ms, "type": "silent" if not merged_speech else "speech"})
+    
+    return final_segments_props
+
+
+def random_silences(rng, duration_ms, count):
+    cuts = sorted(rng.sample(range(1, duration_ms), min(2 * count, duration_ms - 1)))
+    silences = [[cuts[i], cuts[i + 1]] for i in range(0, len(cuts) - 1, 2)]
+    if silences and rng.random() < 0.3: silences[0][0] = 0 # Silêncio no início
+    if silences and rng.random() < 0.3: silences[-1][1] = duration_ms # Silêncio até o fim
+    return silences
+
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    for case in range(2000):
+        duration_ms = rng.randint(1, 60000)
+        silences = random_silences(rng, duration_ms, rng.randint(0, 40))
+        pad_start, pad_end = rng.choice([0, 100, 500, 2000]), rng.choice([0, 100, 500, 2000])
+        expected = legacy_plan_segments(silences, duration_ms, pad_start, pad_end)
+        got = step1.plan_segments(silences, duration_ms, pad_start, pad_end)
+        if got != expected:
+            print(f"DIFERENÇA no caso {case}: duração {duration_ms}, silêncios {silences}, padding {pad_start}/{pad_end}")
+            print(f"  esperado: {expected}\n  obtido:   {got}")
+            sys.exit(1)
+    print("2000 planos aleatórios idênticos aos do algoritmo original.")
+
+    duration_ms = 40 * 3600 * 1000 # 40h de fonte, ~100k silêncios
+    silences = random_silences(rng, duration_ms, 100000)
+    for name, function in (("original", legacy_plan_segments), ("pv_intervals", step1.plan_segments)):
+        started = time.perf_counter()
+        plan = function(silences, duration_ms, 500, 500)
+        print(f"  {name:12s}: {len(plan)} segmentos em {(time.perf_counter() - started) * 1000:.0f}ms")
@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
+import os
 import json
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import pv_intervals
+
 # Ajuste nomes caso necessário
 audio_edl_file  = "video-teste-unfrag.edl.audio.json"
 motion_edl_file = "video-teste-unfrag.edl.motion.json"
@@ -41,40 +45,21 @@ def load_edl(path, which):
 edl_audio  = load_edl(audio_edl_file,  "audio")
 edl_motion = load_edl(motion_edl_file, "motion")
 
-# 2) Coleta todos os limites (start/end) de ambos os EDLs
-boundaries = set()
+# 2) Valida os segmentos; cada seg é um dict com "start" e "dur"; o “end” = start + dur
 for seg in edl_audio + edl_motion:
-    # Cada seg é um dict com "start" e "dur"; o “end” = start + dur
-    start = seg.get("start")
-    dur   = seg.get("dur")
-    if start is None or dur is None:
+    if seg.get("start") is None or seg.get("dur") is None:
         print("Erro: segmento sem 'start' ou 'dur'.")
         sys.exit(1)
-    boundaries.add(start)
-    boundaries.add(start + dur)
-
-bounds = sorted(boundaries)
-
-# 3) Para cada intervalo [bounds[i], bounds[i+1]) decide o tipo
-combined = []
-for i in range(len(bounds) - 1):
-    s   = bounds[i]
-    e   = bounds[i + 1]
-    mid = (s + e) / 2.0
-
-    # Verifica se mid cai em algum segmento de áudio (fala)
-    in_audio  = any(seg["start"] <= mid < seg["start"] + seg["dur"] for seg in edl_audio)
-    # Verifica se mid cai em algum segmento de movimento (código)
-    in_motion = any(seg["start"] <= mid < seg["start"] + seg["dur"] for seg in edl_motion)
-
-    if in_audio:
-        typ = "speech"
-    elif in_motion:
-        typ = "code"
-    else:
-        typ = "inactive"
-
-    combined.append({"start": s, "end": e, "type": typ})
+
+# 3) Divide nos limites (start/end) de ambos os EDLs e decide o tipo de cada trecho
+#    [bounds[i], bounds[i+1]): fala tem prioridade sobre movimento (código); o resto é inativo.
+#    Nenhum limite cai dentro de um trecho, então testar o ponto médio equivale a testar o início.
+def edl_arrays(edl):
+    return pv_intervals.as_arrays([[seg["start"], seg["start"] + seg["dur"]] for seg in edl])
+
+starts, ends, types = pv_intervals.union_labeled(
+    [(*edl_arrays(edl_audio), "speech"), (*edl_arrays(edl_motion), "code")], "inactive", merge_adjacent=False)
+combined = [{"start": s, "end": e, "type": typ} for (s, e), typ in zip(pv_intervals.to_ranges(starts, ends), types.tolist())]
 
 # 4) Salva o JSON combinado
 with open(output_file, 'w') as f:
@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
+import os
 import json
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import pv_intervals
+
 audio_edl_file  = "video-teste-unfrag.edl.audio.json"
 motion_edl_file = "video-teste-unfrag.edl.motion.json"
 output_file     = "video-teste-unfrag.edl.combined.json"
@@ -31,38 +35,20 @@ def load_edl(path, which):
 edl_audio  = load_edl(audio_edl_file,  "audio")
 edl_motion = load_edl(motion_edl_file, "motion")
 
-# Coleta todos os boundaries (início/fim)
-boundaries = set()
+# Valida os segmentos (cada um com "start" e "dur")
 for seg in edl_audio + edl_motion:
-    s = seg.get("start")
-    d = seg.get("dur")
-    if s is None or d is None:
+    if seg.get("start") is None or seg.get("dur") is None:
         print("Erro: segmento sem 'start' ou 'dur'.")
         sys.exit(1)
-    boundaries.add(s)
-    boundaries.add(s + d)
-
-bounds = sorted(boundaries)
-
-combined = []
-# Para cada pedaço [bounds[i], bounds[i+1]):
-for i in range(len(bounds) - 1):
-    s = bounds[i]
-    e = bounds[i+1]
 
-    # Checa se [s,e) overlap com ANY trecho de áudio
-    overlaps_audio = any(not (e <= a["start"] or s >= a["start"] + a["dur"]) for a in edl_audio)
-    # Se não for áudio, checa overlap com movimento
-    overlaps_motion = any(not (e <= m["start"] or s >= m["start"] + m["dur"]) for m in edl_motion)
-
-    if overlaps_audio:
-        typ = "speech"
-    elif overlaps_motion:
-        typ = "code"
-    else:
-        typ = "inactive"
+# Para cada pedaço [bounds[i], bounds[i+1]) entre os limites dos dois EDLs: se sobrepõe
+# fala → "speech"; senão, se sobrepõe movimento → "code"; senão "inactive".
+def edl_arrays(edl):
+    return pv_intervals.as_arrays([[seg["start"], seg["start"] + seg["dur"]] for seg in edl])
 
-    combined.append({"start": s, "end": e, "type": typ})
+starts, ends, types = pv_intervals.union_labeled(
+    [(*edl_arrays(edl_audio), "speech"), (*edl_arrays(edl_motion), "code")], "inactive", merge_adjacent=False)
+combined = [{"start": s, "end": e, "type": typ} for (s, e), typ in zip(pv_intervals.to_ranges(starts, ends), types.tolist())]
 
 with open(output_file, 'w') as f:
     json.dump(combined, f, indent=2)
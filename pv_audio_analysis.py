@@ -0,0 +1,456 @@
+# pv_audio_analysis.py
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pv_intervals
+import pv_ffmpeg_runner
+
+# Taxa usada para a análise: mono e baixa, suficiente para energia de voz e
+# barata de decodificar/transferir pelo pipe.
+ENVELOPE_SAMPLE_RATE = 8000
+# Leitura do pipe em blocos de ~1s de áudio para manter a memória constante.
+READ_BLOCK_SECONDS = 1.0
+# Decodificação paralela: cada faixa começa um pouco antes (descartado) para o decoder estabilizar,
+# e faixas menores que isso não compensam o custo de um processo FFmpeg extra.
+PARALLEL_PREROLL_MS = 1000
+MIN_PARALLEL_RANGE_S = 300
+# Passo da passada grossa da detecção; a resolução de 1ms só é usada perto das transições.
+DEFAULT_COARSE_HOP_MS = 50
+
+
+def read_audio_envelope(video_path, window_ms=1, start_s=None, duration_s=None,
+                        sample_rate=ENVELOPE_SAMPLE_RATE):
+    """
+    Decodifica o áudio via FFmpeg (mono, baixa taxa, s16le em stdout) em streaming
+    e calcula o envelope por janela de window_ms.
+    Retorna (mean_square, peak): arrays float32 normalizados para fundo de escala
+    (1.0 = 0 dBFS), um valor por janela. A última janela pode ser parcial.
+    Levanta RuntimeError se o FFmpeg falhar ou não houver áudio.
+    """
+    samples_per_window = int(sample_rate * window_ms / 1000)
+    if samples_per_window < 1:
+        raise ValueError(f"Janela de {window_ms}ms é curta demais para {sample_rate}Hz.")
+
+    command = ['ffmpeg', '-v', 'error', '-nostdin']
+    if start_s: command.extend(['-ss', f"{start_s:.3f}"])
+    command.extend(['-i', video_path])
+    if duration_s: command.extend(['-t', f"{duration_s:.3f}"])
+    command.extend(['-vn', '-ac', '1', '-ar', str(sample_rate), '-f', 's16le', '-'])
+
+    windows_per_block = max(1, int(READ_BLOCK_SECONDS * 1000 / window_ms))
+    block_bytes = windows_per_block * samples_per_window * 2
+    mean_square_parts, peak_parts = [], []
+
+    def read_samples(stream):
+        pending = b""
+        while True:
+            data = stream.read(block_bytes)
+            if not data: break
+            pending += data
+            usable = (len(pending) // (samples_per_window * 2)) * samples_per_window * 2
+            if usable == 0: continue
+            _append_windows(pending[:usable], samples_per_window, mean_square_parts, peak_parts)
+            pending = pending[usable:]
+        if len(pending) >= 2:
+            tail = pending[:len(pending) - (len(pending) % 2)]
+            _append_windows(tail, len(tail) // 2, mean_square_parts, peak_parts)
+
+    result = pv_ffmpeg_runner.run(command, label="envelope de áudio", stdout_handler=read_samples)
+    if result["returncode"] != 0:
+        raise RuntimeError(f"FFmpeg falhou ao decodificar o áudio (código {result['returncode']}): {result['stderr_tail'][-400:]}")
+    if not mean_square_parts:
+        raise RuntimeError("Nenhuma amostra de áudio decodificada (o arquivo tem trilha de áudio?).")
+    return np.concatenate(mean_square_parts), np.concatenate(peak_parts)
+
+
+def _append_windows(raw_bytes, samples_per_window, mean_square_parts, peak_parts):
+    samples = np.frombuffer(raw_bytes, dtype='<i2').astype(np.float32) / 32768.0
+    windows = samples.reshape(-1, samples_per_window)
+    mean_square_parts.append(np.mean(windows * windows, axis=1, dtype=np.float64).astype(np.float32))
+    peak_parts.append(np.max(np.abs(windows), axis=1))
+
+
+def mean_square_to_dbfs(mean_square):
+    """Converte potência média normalizada em dBFS (silêncio absoluto vira -999.0, como no Pydub)."""
+    mean_square = np.asarray(mean_square, dtype=np.float64)
+    with np.errstate(divide='ignore'):
+        dbfs = 10.0 * np.log10(mean_square)
+    return np.where(mean_square > 0, dbfs, -999.0)
+
+
+def detect_silence_ms(mean_square_ms, min_silence_len_ms, silence_thresh_dbfs, coarse_hop_ms=None):
+    """
+    Equivalente vetorizado do pydub.silence.detect_silence (seek_step=1) sobre o envelope de 1ms:
+    uma posição i é silenciosa se o RMS de [i, i+min_silence_len_ms) estiver abaixo do limiar.
+    Posições silenciosas separadas por até min_silence_len_ms formam um único trecho.
+    Retorna [[start_ms, end_ms], ...], no mesmo formato do Pydub.
+    Com coarse_hop_ms, usa a detecção em dois níveis (ver detect_silence_in_range).
+    """
+    return detect_silence_in_range(mean_square_ms, len(mean_square_ms), min_silence_len_ms, silence_thresh_dbfs,
+                                   coarse_hop_ms=coarse_hop_ms)
+
+
+def detect_silence_in_range(mean_square_ms, range_len_ms, min_silence_len_ms, silence_thresh_dbfs, offset_ms=0,
+                            coarse_hop_ms=None, stats=None):
+    """
+    Detecta silêncios avaliando apenas as posições [0, range_len_ms) do envelope recebido.
+    O envelope pode se estender além da faixa (até min_silence_len_ms) para cobrir as janelas
+    que cruzam a borda. Os trechos retornados são deslocados por offset_ms (tempo global).
+
+    Sem coarse_hop_ms (modo exato) toda posição de 1ms é avaliada. Com coarse_hop_ms, uma passada
+    grossa avalia uma posição a cada coarse_hop_ms e a resolução de 1ms só é calculada entre duas
+    posições grossas com estados diferentes. O passo é limitado a min_silence_len_ms, então um ruído
+    dentro de um silêncio nunca é perdido; silêncios com menos de min_silence_len_ms + passo podem ser.
+    Se stats (dict) for informado, recebe 'positions' e 'evaluated' (posições realmente avaliadas).
+    """
+    window = int(min_silence_len_ms)
+    if window <= 0 or len(mean_square_ms) < window: return []
+    cumulative = np.concatenate(([0.0], np.cumsum(mean_square_ms, dtype=np.float64)))
+    threshold = 10.0 ** (silence_thresh_dbfs / 10.0)
+    num_positions = min(range_len_ms, len(mean_square_ms) - window + 1)
+    if num_positions <= 0: return []
+
+    hop = min(int(coarse_hop_ms or 1), window)
+    if hop <= 1:
+        window_mean = (cumulative[window:window + num_positions] - cumulative[:num_positions]) / window
+        silence_starts = np.flatnonzero(window_mean <= threshold) + offset_ms
+        if stats is not None: stats.update(positions=num_positions, evaluated=num_positions)
+        return _silence_starts_to_ranges(silence_starts, window)
+
+    def is_silent(positions):
+        return (cumulative[positions + window] - cumulative[positions]) / window <= threshold
+
+    coarse_positions = np.arange(0, num_positions, hop)
+    if coarse_positions[-1] != num_positions - 1:
+        coarse_positions = np.append(coarse_positions, num_positions - 1)
+    coarse_state = is_silent(coarse_positions)
+
+    # Passada fina: só entre posições grossas vizinhas com estados diferentes.
+    transitions = np.flatnonzero(coarse_state[1:] != coarse_state[:-1])
+    fine_positions = np.concatenate([np.arange(coarse_positions[c] + 1, coarse_positions[c + 1]) for c in transitions]
+                                    or [np.empty(0, dtype=np.int64)]).astype(np.int64)
+    positions = np.concatenate((coarse_positions, fine_positions))
+    states = np.concatenate((coarse_state, is_silent(fine_positions)))
+    order = np.argsort(positions, kind='stable')
+    positions, states = positions[order], states[order]
+    if stats is not None: stats.update(positions=num_positions, evaluated=len(positions))
+
+    # Cada posição avaliada vale até a próxima: trechos grossos sem transição herdam o estado.
+    next_positions = np.append(positions[1:], num_positions)
+    run_starts, run_ends = positions[states], next_positions[states]
+    if len(run_starts) == 0: return []
+    # Une trechos contíguos e converte para posições silenciosas (primeira, última) de cada trecho.
+    breaks = np.flatnonzero(run_starts[1:] != run_ends[:-1])
+    firsts = np.concatenate(([run_starts[0]], run_starts[breaks + 1])) + offset_ms
+    lasts = np.concatenate((run_ends[breaks], [run_ends[-1]])) - 1 + offset_ms
+    return _silence_runs_to_ranges(firsts, lasts, window)
+
+
+def merge_silence_ranges(range_lists):
+    """
+    Junta os trechos de silêncio detectados em faixas consecutivas.
+    Dois trechos se unem quando o seguinte começa até o fim do anterior: é exatamente a regra do
+    Pydub (posições silenciosas a até min_silence_len_ms de distância pertencem ao mesmo trecho),
+    então o resultado é igual ao da detecção sequencial.
+    """
+    merged = []
+    for ranges in range_lists:
+        for start_ms, end_ms in ranges:
+            if merged and start_ms <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end_ms)
+            else:
+                merged.append([start_ms, end_ms])
+    return merged
+
+
+def split_time_ranges(total_ms, jobs):
+    """Divide [0, total_ms) em até `jobs` faixas contíguas de tamanho semelhante."""
+    jobs = max(1, min(jobs, int(total_ms // (MIN_PARALLEL_RANGE_S * 1000)) or 1))
+    bounds = [total_ms * i // jobs for i in range(jobs + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(jobs)]
+
+
+def _analyze_range(video_path, range_start_ms, range_end_ms, is_last, min_silence_len_ms, silence_thresh_dbfs,
+                   coarse_hop_ms=None):
+    """Decodifica e analisa uma faixa. Retorna (envelope da faixa, trechos de silêncio em tempo global)."""
+    preroll_ms = min(PARALLEL_PREROLL_MS, range_start_ms)
+    decode_start_ms = range_start_ms - preroll_ms
+    # Faixas intermediárias decodificam min_silence_len_ms a mais para cobrir as janelas na borda.
+    decode_duration_s = None if is_last else (range_end_ms + min_silence_len_ms - decode_start_ms) / 1000.0
+    mean_square, peak = read_audio_envelope(video_path, window_ms=1, start_s=decode_start_ms / 1000.0,
+                                            duration_s=decode_duration_s)
+    mean_square, peak = mean_square[preroll_ms:], peak[preroll_ms:]
+    range_len_ms = len(mean_square) if is_last else min(range_end_ms - range_start_ms, len(mean_square))
+    ranges = detect_silence_in_range(mean_square, range_len_ms, min_silence_len_ms, silence_thresh_dbfs,
+                                     offset_ms=range_start_ms, coarse_hop_ms=coarse_hop_ms)
+    return mean_square[:range_len_ms], peak[:range_len_ms], ranges
+
+
+def read_and_detect_parallel(video_path, total_ms, jobs, min_silence_len_ms, silence_thresh_dbfs, coarse_hop_ms=None):
+    """
+    Decodifica o áudio em faixas de tempo concorrentes (um FFmpeg com -ss por faixa),
+    detecta os silêncios em cada uma e junta os resultados nas bordas.
+    Retorna (mean_square, peak, silent_ranges_ms) equivalentes à leitura sequencial
+    (idênticos no modo exato; no modo grosso a grade de cada faixa começa na sua borda).
+    """
+    time_ranges = split_time_ranges(total_ms, jobs)
+    print(f"  Decodificando áudio em {len(time_ranges)} faixas paralelas...")
+    with ThreadPoolExecutor(max_workers=len(time_ranges)) as executor:
+        futures = [executor.submit(_analyze_range, video_path, start_ms, end_ms, i == len(time_ranges) - 1,
+                                   min_silence_len_ms, silence_thresh_dbfs, coarse_hop_ms)
+                   for i, (start_ms, end_ms) in enumerate(time_ranges)]
+        results = [f.result() for f in futures]
+    mean_square = np.concatenate([r[0] for r in results])
+    peak = np.concatenate([r[1] for r in results])
+    return mean_square, peak, merge_silence_ranges([r[2] for r in results])
+
+
+def _silence_starts_to_ranges(silence_starts, window):
+    if len(silence_starts) == 0: return []
+    breaks = np.flatnonzero(np.diff(silence_starts) > window)
+    group_first = np.concatenate(([silence_starts[0]], silence_starts[breaks + 1]))
+    group_last = np.concatenate((silence_starts[breaks], [silence_starts[-1]]))
+    return [[int(first), int(last) + window] for first, last in zip(group_first, group_last)]
+
+
+def _silence_runs_to_ranges(run_firsts, run_lasts, window):
+    """Como _silence_starts_to_ranges, mas recebendo sequências contíguas de posições silenciosas."""
+    breaks = np.flatnonzero(run_firsts[1:] - run_lasts[:-1] > window)
+    group_first = np.concatenate(([run_firsts[0]], run_firsts[breaks + 1]))
+    group_last = np.concatenate((run_lasts[breaks], [run_lasts[-1]]))
+    return [[int(first), int(last) + window] for first, last in zip(group_first, group_last)]
+
+
+_SILENCE_START_RE = re.compile(r"silence_start:\s*(-?[0-9.]+(?:e[-+]?[0-9]+)?)")
+_SILENCE_END_RE = re.compile(r"silence_end:\s*(-?[0-9.]+(?:e[-+]?[0-9]+)?)")
+
+
+def detect_silence_ffmpeg(video_path, min_silence_len_ms, silence_thresh_dbfs, duration_ms=None):
+    """
+    Detecta silêncios com o filtro silencedetect do próprio FFmpeg, lendo as linhas
+    silence_start/silence_end do stderr conforme são emitidas: o áudio nunca passa pelo Python
+    (memória constante, qualquer duração). Um silêncio ainda aberto no fim vai até duration_ms.
+    Retorna [[início_ms, fim_ms], ...], no mesmo formato do detect_silence do Pydub.
+    Levanta RuntimeError se o FFmpeg falhar.
+    """
+    command = ['ffmpeg', '-hide_banner', '-nostats', '-nostdin', '-i', video_path, '-vn',
+               '-af', f"silencedetect=noise={silence_thresh_dbfs}dB:d={min_silence_len_ms / 1000.0:.3f}",
+               '-f', 'null', '-']
+    silent_ranges_ms = []
+    open_start_ms = None
+
+    def parse_line(line):
+        nonlocal open_start_ms
+        match = _SILENCE_START_RE.search(line)
+        if match:
+            open_start_ms = max(0, int(round(float(match.group(1)) * 1000)))
+            return
+        match = _SILENCE_END_RE.search(line)
+        if match:
+            end_ms = int(round(float(match.group(1)) * 1000))
+            silent_ranges_ms.append([open_start_ms if open_start_ms is not None else 0, end_ms])
+            open_start_ms = None
+
+    # Sem novas tentativas: as linhas já lidas de uma tentativa anterior se repetiriam.
+    result = pv_ffmpeg_runner.run(command, label="silencedetect", on_stderr_line=parse_line, retries=0,
+                                  expected_duration_s=duration_ms / 1000.0 if duration_ms else None)
+    if result["returncode"] != 0:
+        raise RuntimeError(f"FFmpeg silencedetect falhou (código {result['returncode']}): {result['stderr_tail'][-400:]}")
+    if open_start_ms is not None and duration_ms and duration_ms > open_start_ms:
+        silent_ranges_ms.append([open_start_ms, duration_ms])
+    return [r for r in silent_ranges_ms if r[1] > r[0]]
+
+
+def analyze_source_audio(video_path, min_silence_len_ms, silence_thresh_dbfs, cache_dir=None,
+                         jobs=1, duration_s=None, coarse_hop_ms=DEFAULT_COARSE_HOP_MS, detector="envelope"):
+    """
+    Análise de áudio feita uma única vez por fonte: decodifica o envelope de 1ms em streaming
+    (mono, 8kHz) e detecta os silêncios na fonte inteira.
+    Com jobs > 1 e duration_s conhecido, fontes longas são decodificadas em faixas paralelas.
+    Se cache_dir for informado, o envelope é salvo/reaproveitado ali (a detecção é barata e refeita).
+    coarse_hop_ms=None força a detecção exata (todas as posições de 1ms).
+    Com detector="ffmpeg", os silêncios vêm do silencedetect (detect_silence_ffmpeg) e não há
+    envelope (mean_square e peak ficam None; os níveis por segmento ficam indisponíveis).
+    Retorna um dicionário com duration_ms, silent_ranges_ms, mean_square e peak.
+    """
+    print(f"--- Análise de áudio da fonte '{os.path.basename(video_path)}' ---")
+    if detector == "ffmpeg":
+        duration_ms = int((duration_s or 0) * 1000)
+        print(f"  Detectando silêncio com FFmpeg silencedetect (min_len: {min_silence_len_ms}ms, threshold: {silence_thresh_dbfs}dBFS)...")
+        silent_ranges_ms = detect_silence_ffmpeg(video_path, min_silence_len_ms, silence_thresh_dbfs, duration_ms)
+        if silent_ranges_ms: duration_ms = max(duration_ms, silent_ranges_ms[-1][1])
+        print(f"  {len(silent_ranges_ms)} trechos de silêncio em {duration_ms / 1000.0:.1f}s de áudio.")
+        return {"duration_ms": duration_ms, "silent_ranges_ms": silent_ranges_ms, "mean_square": None, "peak": None}
+    cache_path = None
+    if cache_dir:
+        source_stat = os.stat(video_path)
+        base = os.path.splitext(os.path.basename(video_path))[0]
+        cache_path = os.path.join(cache_dir, f"audio_envelope_{base}_{source_stat.st_size}.npz")
+
+    silent_ranges_ms = None
+    if cache_path and os.path.isfile(cache_path):
+        print(f"  Envelope de áudio já existe: {os.path.basename(cache_path)}. Reaproveitando.")
+        with np.load(cache_path) as cached:
+            mean_square, peak = cached["mean_square"], cached["peak"]
+    else:
+        total_ms = int((duration_s or 0) * 1000)
+        if jobs > 1 and len(split_time_ranges(total_ms, jobs)) > 1:
+            mean_square, peak, silent_ranges_ms = read_and_detect_parallel(
+                video_path, total_ms, jobs, min_silence_len_ms, silence_thresh_dbfs, coarse_hop_ms)
+        else:
+            print("  Decodificando envelope de áudio (1ms)...")
+            mean_square, peak = read_audio_envelope(video_path, window_ms=1)
+        if cache_path:
+            os.makedirs(cache_dir, exist_ok=True)
+            np.savez(cache_path, mean_square=mean_square, peak=peak)
+
+    if silent_ranges_ms is None:
+        mode = f"grosso/fino, passo {coarse_hop_ms}ms" if coarse_hop_ms else "exato"
+        print(f"  Detectando silêncio (min_len: {min_silence_len_ms}ms, threshold: {silence_thresh_dbfs}dBFS, modo {mode})...")
+        stats = {}
+        silent_ranges_ms = detect_silence_in_range(mean_square, len(mean_square), min_silence_len_ms,
+                                                   silence_thresh_dbfs, coarse_hop_ms=coarse_hop_ms, stats=stats)
+        if stats.get("positions"):
+            print(f"  Posições avaliadas: {stats['evaluated']}/{stats['positions']} ({100.0 * stats['evaluated'] / stats['positions']:.1f}%).")
+    print(f"  {len(silent_ranges_ms)} trechos de silêncio em {len(mean_square) / 1000.0:.1f}s de áudio.")
+    return {"duration_ms": len(mean_square), "silent_ranges_ms": silent_ranges_ms,
+            "mean_square": mean_square, "peak": peak}
+
+
+def slice_analysis(analysis, start_s, end_s):
+    """
+    Recorta a análise da fonte para o intervalo [start_s, end_s) de um chunk.
+    Os tempos do resultado são relativos ao início do chunk; os envelopes são views (sem cópia)
+    ou None, se a análise não tiver envelope.
+    """
+    start_ms, end_ms = int(round(start_s * 1000)), int(round(end_s * 1000))
+    end_ms = min(end_ms, analysis["duration_ms"])
+    silent_starts, silent_ends = pv_intervals.intersect(*pv_intervals.as_arrays(analysis["silent_ranges_ms"]),
+                                                       np.array([start_ms]), np.array([end_ms]))
+    silent_ranges_ms = pv_intervals.to_ranges(silent_starts - start_ms, silent_ends - start_ms)
+    has_envelope = analysis["mean_square"] is not None
+    return {"duration_ms": max(0, end_ms - start_ms), "silent_ranges_ms": silent_ranges_ms,
+            "mean_square": analysis["mean_square"][start_ms:end_ms] if has_envelope else None,
+            "peak": analysis["peak"][start_ms:end_ms] if has_envelope else None}
+
+
+def segment_levels_dbfs(analysis, start_ms, end_ms):
+    """Retorna (dBFS médio, dBFS de pico) de um trecho, como o dBFS/max_dBFS do Pydub ((None, None) sem envelope)."""
+    if analysis["mean_square"] is None: return None, None
+    mean_square = analysis["mean_square"][start_ms:end_ms]
+    if len(mean_square) == 0: return -999.0, -999.0
+    mean_dbfs = float(mean_square_to_dbfs(np.mean(mean_square, dtype=np.float64)))
+    peak = float(np.max(analysis["peak"][start_ms:end_ms]))
+    peak_dbfs = 20.0 * np.log10(peak) if peak > 0 else -999.0
+    return mean_dbfs, float(peak_dbfs)
+
+
+def build_minmax_pyramid(values):
+    """
+    Pirâmide min/max de um envelope para desenhar qualquer zoom rapidamente: o nível k tem um
+    par (min, max) a cada 2^k amostras. O nível 0 usa o próprio array (sem cópia).
+    """
+    levels = [(values, values)]
+    while len(levels[-1][0]) > 1:
+        mins, maxs = levels[-1]
+        if len(mins) % 2: # Repete a última amostra para fechar o último par
+            mins, maxs = np.append(mins, mins[-1]), np.append(maxs, maxs[-1])
+        levels.append((np.minimum(mins[0::2], mins[1::2]), np.maximum(maxs[0::2], maxs[1::2])))
+    return levels
+
+
+def pyramid_columns(pyramid, start, end, columns):
+    """
+    (mins, maxs) de [start, end) (em amostras do nível 0) reduzidos a `columns` colunas, lendo o
+    nível mais grosso que ainda tem pelo menos uma amostra por coluna.
+    """
+    start, end = max(0, int(start)), min(int(end), len(pyramid[0][0]))
+    if end <= start or columns <= 0: return np.zeros(0), np.zeros(0)
+    level = int(np.clip(np.floor(np.log2(max(1.0, (end - start) / columns))), 0, len(pyramid) - 1))
+    mins, maxs = pyramid[level]
+    first, last = start >> level, max((start >> level) + 1, -(-end // (1 << level)))
+    mins, maxs = mins[first:last], maxs[first:last]
+    columns = min(columns, len(mins))
+    bounds = np.linspace(0, len(mins), columns + 1).astype(np.int64)[:-1]
+    return np.minimum.reduceat(mins, bounds), np.maximum.reduceat(maxs, bounds)
+
+
+if __name__ == "__main__":
+    # Autoteste da detecção: a junção das faixas paralelas nas bordas deve reproduzir exatamente a
+    # detecção sequencial, e a grosso/fina deve coincidir com a exata quando nenhum trecho é mais
+    # curto que janela + passo. Usa envelopes sintéticos e, se houver FFmpeg, um áudio gerado por ele.
+    print("--- Testando pv_audio_analysis.py diretamente ---")
+    rng = np.random.default_rng(0)
+    failures = 0
+    for case in range(200):
+        total_ms = int(rng.integers(50, 5000))
+        # Alterna trechos de "fala" e "silêncio" com durações aleatórias, incluindo bordas exatas.
+        levels = rng.choice([1e-6, 1e-2], size=int(rng.integers(1, 40)))
+        mean_square = np.repeat(levels, int(np.ceil(total_ms / len(levels))))[:total_ms].astype(np.float32)
+        mean_square *= rng.uniform(0.5, 1.5, size=total_ms).astype(np.float32)
+        window = int(rng.integers(1, 400))
+        thresh = float(rng.choice([-50, -35, -25]))
+        jobs = int(rng.integers(2, 9))
+        bounds = [total_ms * i // jobs for i in range(jobs + 1)]
+
+        per_range = []
+        for i in range(jobs):
+            start_ms, end_ms = bounds[i], bounds[i + 1]
+            is_last = i == jobs - 1
+            decoded = mean_square[start_ms:] if is_last else mean_square[start_ms:end_ms + window]
+            per_range.append(detect_silence_in_range(decoded, end_ms - start_ms, window, thresh, offset_ms=start_ms))
+
+        expected = detect_silence_ms(mean_square, window, thresh)
+        if merge_silence_ranges(per_range) != expected:
+            failures += 1
+            print(f"  FALHA no caso {case}: total={total_ms}ms janela={window}ms faixas={jobs}")
+    # Detecção grossa/fina: com silêncios e falas mais longos que janela + passo, deve ser igual à exata.
+    evaluated, positions = 0, 0
+    for case in range(200):
+        window, hop = int(rng.integers(50, 2500)), DEFAULT_COARSE_HOP_MS
+        runs = [np.full(int(rng.integers(window + hop, 4 * window + hop)), level)
+                for level in rng.choice([1e-6, 1e-2], size=int(rng.integers(1, 30)))]
+        mean_square = np.concatenate(runs) * rng.uniform(0.5, 1.5, size=sum(len(r) for r in runs))
+        stats = {}
+        coarse = detect_silence_in_range(mean_square, len(mean_square), window, -35, coarse_hop_ms=hop, stats=stats)
+        evaluated, positions = evaluated + stats.get("evaluated", 0), positions + stats.get("positions", 0)
+        if coarse != detect_silence_ms(mean_square, window, -35):
+            failures += 1
+            print(f"  FALHA grosso/fino no caso {case}: janela={window}ms")
+    print(f"  Grosso/fino avaliou {100.0 * evaluated / max(positions, 1):.1f}% das posições de 1ms.")
+
+    # Faixas decodificadas de verdade (-ss com preroll e a duração extra da borda): a junção deve
+    # reproduzir a leitura sequencial do mesmo arquivo. Pulado sem FFmpeg.
+    import shutil, tempfile
+    if shutil.which("ffmpeg") is None:
+        print("  FFmpeg não encontrado; teste com áudio decodificado pulado.")
+    else:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            wav_path = os.path.join(temp_dir, "tom_e_silencio.wav")
+            tone = f"aevalsrc=exprs='if(lt(mod(t,1.7),0.9),0.5*sin(2*PI*440*t),0)':s={ENVELOPE_SAMPLE_RATE}:d=20"
+            result = pv_ffmpeg_runner.run(['ffmpeg', '-v', 'error', '-nostdin', '-f', 'lavfi', '-i', tone,
+                                           '-c:a', 'pcm_s16le', wav_path], label="autoteste")
+            if result["returncode"] != 0:
+                failures += 1
+                print(f"  FALHA ao gerar o áudio de teste: {result['stderr_tail'][-400:]}")
+            else:
+                window, thresh = 500, -35
+                mean_square, _ = read_audio_envelope(wav_path)
+                expected = detect_silence_ms(mean_square, window, thresh)
+                bounds = [0, 6503, 13257, len(mean_square)] # Bordas fora da grade do tom e do silêncio
+                results = [_analyze_range(wav_path, bounds[i], bounds[i + 1], i == len(bounds) - 2, window, thresh)
+                           for i in range(len(bounds) - 1)]
+                parallel_envelope = np.concatenate([r[0] for r in results])
+                if merge_silence_ranges([r[2] for r in results]) != expected:
+                    failures += 1
+                    print(f"  FALHA com áudio decodificado: {merge_silence_ranges([r[2] for r in results])} != {expected}")
+                elif len(parallel_envelope) != len(mean_square) or not np.allclose(parallel_envelope, mean_square, atol=1e-4):
+                    failures += 1
+                    print(f"  FALHA no envelope das faixas decodificadas ({len(parallel_envelope)} x {len(mean_square)} janelas)")
+                else:
+                    print(f"  Faixas decodificadas: {len(expected)} silêncios iguais aos da leitura sequencial.")
+
+    print("Autoteste OK: detecção paralela e grosso/fina iguais à exata." if failures == 0 else f"Autoteste FALHOU em {failures} casos.")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,160 @@
+# pv_encoder_profiles.py
+import os
+import json
+import time
+import socket
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+import pv_ffmpeg_runner
+
+try:
+    import pv_utils
+except ImportError:
+    print("AVISO: pv_utils.py não encontrado.")
+    pv_utils = None
+
+# Perfis de codificação de vídeo. crf=None usa o padrão do codec; threads=0 deixa o FFmpeg decidir.
+# height/fps (opcionais) reduzem a resolução e a taxa de quadros da saída (ver video_filters).
+ENCODER_PROFILES = {
+    "rapido":      {"codec": "libx264", "preset": "ultrafast", "crf": None, "video_bitrate": None, "threads": 0},
+    "equilibrado": {"codec": "libx264", "preset": "veryfast",  "crf": 23,   "video_bitrate": None, "threads": 0},
+    "qualidade":   {"codec": "libx264", "preset": "medium",    "crf": 23,   "video_bitrate": None, "threads": 0},
+    # Prévia para revisar os cortes (--proxy): 360p a 15fps, o mais rápido possível.
+    "proxy":       {"codec": "libx264", "preset": "ultrafast", "crf": 32,   "video_bitrate": None, "threads": 0,
+                    "height": 360, "fps": 15},
+}
+
+# Perfil padrão de cada etapa (os mesmos ajustes que estavam fixos no código).
+DEFAULT_STAGE_PROFILES = {"cut": "rapido", "accelerate": "rapido", "keyframes": "qualidade"}
+
+AUTOTUNE_CACHE_FILE = "autotune.json"
+AUTOTUNE_SAMPLE_SECONDS = 10
+
+
+def get_profile(profile_name, threads=None):
+    """Retorna uma cópia do perfil; threads (se informado) substitui o do perfil."""
+    if profile_name not in ENCODER_PROFILES:
+        raise ValueError(f"Perfil de codificação desconhecido: '{profile_name}'. Opções: {', '.join(ENCODER_PROFILES)}")
+    profile = dict(ENCODER_PROFILES[profile_name], name=profile_name)
+    if threads is not None: profile["threads"] = threads
+    return profile
+
+
+def video_encoder_args(profile):
+    """Converte um perfil (dict ou nome) nos argumentos de vídeo do FFmpeg."""
+    if isinstance(profile, str): profile = get_profile(profile)
+    args = ['-c:v', profile["codec"], '-preset', profile["preset"]]
+    if profile.get("crf") is not None: args.extend(['-crf', str(profile["crf"])])
+    if profile.get("video_bitrate"): args.extend(['-b:v', str(profile["video_bitrate"])])
+    if profile.get("threads"): args.extend(['-threads', str(profile["threads"])])
+    return args
+
+
+def video_filters(profile):
+    """Filtros de vídeo do perfil (escala para height, fps), para juntar a um -vf/-filter_complex. Lista vazia se nenhum."""
+    if isinstance(profile, str): profile = get_profile(profile)
+    filters = []
+    if profile.get("height"): filters.append(f"scale=-2:{profile['height']}")
+    if profile.get("fps"): filters.append(f"fps={profile['fps']}")
+    return filters
+
+
+def decoder_args(profile):
+    """
+    Argumentos de entrada (antes do -i) para decodificar a fonte: com keyframes_only, o decodificador
+    só entrega os keyframes. Não serve para os segmentos cortados (têm keyframe só no início).
+    """
+    if isinstance(profile, str): profile = get_profile(profile)
+    return ['-skip_frame', 'nokey'] if profile.get("keyframes_only") else []
+
+
+def keyframe_fill_filters(profile, source_fps, duration_s):
+    """
+    Filtros de vídeo de um corte com keyframes_only, no lugar de video_filters. A entrada é buscada
+    com -ss antes do -i e -noaccurate_seek, então o keyframe anterior ao início chega com t < 0:
+    o fps com start_time=0 faz dele o quadro de t=0 e repete cada keyframe até o próximo; o tpad
+    repete o último até duration_s. Assim nenhum segmento fica sem vídeo ou mais curto que o áudio.
+    """
+    if isinstance(profile, str): profile = get_profile(profile)
+    filters = [f"scale=-2:{profile['height']}"] if profile.get("height") else []
+    filters.append(f"fps={profile.get('fps') or source_fps}:start_time=0")
+    filters.append(f"tpad=stop_mode=clone:stop_duration={duration_s:.3f}")
+    return filters
+
+
+def _autotune_cache_path():
+    return os.path.join(pv_utils.get_cache_dir(), AUTOTUNE_CACHE_FILE)
+
+
+def load_autotune_result(profile_name):
+    """Retorna {"jobs", "threads", ...} salvo para este host e perfil, ou None."""
+    try:
+        with open(_autotune_cache_path(), 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        return cache.get(socket.gethostname(), {}).get(profile_name)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_autotune_result(profile_name, result):
+    cache_path = _autotune_cache_path()
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f: cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    cache.setdefault(socket.gethostname(), {})[profile_name] = result
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, indent=2)
+
+
+def candidate_splits(cpu_count):
+    """Combinações jobs x threads que ocupam todos os núcleos (jobs em potências de 2)."""
+    splits, jobs = [], 1
+    while jobs <= cpu_count:
+        splits.append((jobs, max(1, cpu_count // jobs)))
+        jobs *= 2
+    return splits
+
+
+def _encode_sample(source_path, start_s, duration_s, profile):
+    # Com os filtros do perfil (ex.: 360p/15fps do proxy), para medir a mesma carga da execução real.
+    filters = video_filters(profile)
+    filter_args = ['-vf', ",".join(filters)] if filters else []
+    command = ['ffmpeg', '-v', 'error', '-nostdin', '-ss', f"{start_s:.3f}", '-t', str(duration_s),
+               '-i', source_path, '-an', *filter_args, *video_encoder_args(profile), '-f', 'null', '-']
+    result = pv_ffmpeg_runner.run(command, label="autotune", retries=0)
+    if result["returncode"] != 0:
+        raise RuntimeError(f"FFmpeg falhou no benchmark: {result['stderr_tail'][-300:]}")
+
+
+def autotune(source_path, profile_name, cpu_count=None, sample_seconds=AUTOTUNE_SAMPLE_SECONDS):
+    """
+    Mede, com um trecho curto da própria fonte, qual divisão jobs x threads rende mais
+    segundos de vídeo codificados por segundo nesta máquina. O resultado é salvo por host e perfil.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    info = pv_utils.get_extended_video_info(source_path)
+    duration_s = info.get("duration_s", 0)
+    if duration_s <= 0:
+        raise ValueError(f"Não foi possível obter a duração de '{source_path}'.")
+    sample_seconds = min(sample_seconds, duration_s)
+    start_s = max(0.0, duration_s / 2 - sample_seconds / 2)
+
+    print(f"--- Autotune: perfil '{profile_name}', {cpu_count} CPUs, amostra de {sample_seconds:.0f}s de '{os.path.basename(source_path)}' ---")
+    best = None
+    for jobs, threads in candidate_splits(cpu_count):
+        profile = get_profile(profile_name, threads=threads)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            for future in [executor.submit(_encode_sample, source_path, start_s, sample_seconds, profile) for _ in range(jobs)]:
+                future.result()
+        elapsed = time.perf_counter() - started
+        throughput = jobs * sample_seconds / elapsed if elapsed > 0 else 0.0
+        print(f"  jobs={jobs:2d} x threads={threads:2d}: {throughput:.2f}s de vídeo por segundo")
+        if best is None or throughput > best["throughput"]:
+            best = {"jobs": jobs, "threads": threads, "throughput": round(throughput, 3)}
+
+    best.update(cpu_count=cpu_count, measured_at=datetime.datetime.now().isoformat())
+    _save_autotune_result(profile_name, best)
+    print(f"  Melhor divisão: {best['jobs']} jobs x {best['threads']} threads (salvo em {_autotune_cache_path()}).")
+    return best
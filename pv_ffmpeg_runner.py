@@ -0,0 +1,266 @@
+# pv_ffmpeg_runner.py
+"""
+Ponto único de execução do FFmpeg/FFprobe para todas as etapas.
+Cada chamada lê o progresso em tempo real (-progress pipe:1), guarda só o final do stderr,
+respeita um tempo limite, repete falhas transitórias e registra tempo de parede, tempo de CPU
+(os.wait4) e bytes gerados, somados por rótulo (ver stats_summary). O arquivo de saída é
+gravado com um nome temporário e renomeado só no sucesso: um FFmpeg interrompido nunca deixa
+um arquivo parcial com o nome final (que uma retomada tomaria por pronto).
+"""
+import os
+import re
+import time
+import threading
+import subprocess
+from collections import deque
+
+# Linhas finais do stderr guardadas para mensagens de erro (o resto é descartado enquanto é lido).
+DEFAULT_STDERR_TAIL_LINES = 40
+RETRY_DELAY_S = 2.0
+# Sufixo (antes da extensão, que o FFmpeg usa para escolher o formato) da saída em andamento.
+PARTIAL_SUFFIX = ".partial"
+# Falhas que costumam passar sozinhas (recurso momentaneamente esgotado, disco de rede instável).
+TRANSIENT_ERROR_RE = re.compile(r"Resource temporarily unavailable|Cannot allocate memory|Too many open files|"
+                                r"Input/output error|Connection (?:reset|timed out)|Device or resource busy", re.IGNORECASE)
+
+# Padrões da execução (ajustados por pv-process.py via configure). timeout_s 0 = sem limite.
+_settings = {"timeout_s": 0, "retries": 1}
+_stats = {}
+_stats_lock = threading.Lock()
+_active_processes = {} # FFmpeg/FFprobe em execução neste processo -> rótulo (ver signal_active_processes)
+
+
+def configure(timeout_s=None, retries=None):
+    """Define o tempo limite (s, 0 = sem limite) e as novas tentativas usados quando run() não os recebe."""
+    if timeout_s is not None: _settings["timeout_s"] = timeout_s
+    if retries is not None: _settings["retries"] = max(0, int(retries))
+
+
+def _progress_snapshot(block, expected_duration_s):
+    """Converte um bloco key=value do -progress em {out_time_s, fps, speed, percent, done}."""
+    def number(key, suffix=""):
+        try: return float(block.get(key, "").rstrip(suffix))
+        except ValueError: return None
+    out_time_us = number("out_time_us")
+    out_time_s = out_time_us / 1e6 if out_time_us is not None and out_time_us >= 0 else None
+    percent = None
+    if out_time_s is not None and expected_duration_s:
+        percent = min(100.0, 100.0 * out_time_s / expected_duration_s)
+    return {"out_time_s": out_time_s, "fps": number("fps"), "speed": number("speed", "x"),
+            "percent": 100.0 if block.get("progress") == "end" else percent, "done": block.get("progress") == "end"}
+
+
+def _wait_with_rusage(process):
+    """Espera o processo e devolve (código, cpu_user_s, cpu_system_s); sem os.wait4 (Windows), CPU fica None."""
+    if hasattr(os, "wait4"):
+        try:
+            _, status, rusage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            return process.returncode, rusage.ru_utime, rusage.ru_stime
+        except ChildProcessError:
+            pass # Já coletado (ex.: morto pelo timeout e esperado em outro ponto)
+    return process.wait(), None, None
+
+
+def _run_once(command, label, timeout_s, on_progress, expected_duration_s, stdout_handler, on_stderr_line,
+              stderr_tail_lines, read_progress):
+    stderr_tail = deque(maxlen=stderr_tail_lines)
+    timed_out = threading.Event()
+    last_progress = None
+    stdout_result = None
+    started = time.perf_counter()
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL,
+                               stdout=subprocess.PIPE if (stdout_handler or read_progress) else subprocess.DEVNULL,
+                               stderr=subprocess.PIPE)
+    with _stats_lock:
+        _active_processes[process] = label
+
+    def drain_stderr():
+        for raw_line in process.stderr:
+            line = raw_line.decode('utf-8', errors='replace').rstrip('\r\n')
+            stderr_tail.append(line)
+            if on_stderr_line: on_stderr_line(line)
+
+    def kill_on_timeout():
+        timed_out.set()
+        try: process.kill()
+        except OSError: pass
+
+    stderr_thread = threading.Thread(target=drain_stderr, daemon=True)
+    stderr_thread.start()
+    timer = threading.Timer(timeout_s, kill_on_timeout) if timeout_s else None
+    if timer: timer.daemon = True; timer.start()
+    try:
+        if stdout_handler:
+            stdout_result = stdout_handler(process.stdout)
+        elif read_progress:
+            block = {}
+            for raw_line in process.stdout:
+                key, _, value = raw_line.decode('ascii', errors='replace').strip().partition('=')
+                block[key] = value
+                if key == "progress": # Último campo de cada bloco
+                    last_progress = _progress_snapshot(block, expected_duration_s)
+                    if on_progress: on_progress(last_progress)
+                    block = {}
+        if process.stdout: process.stdout.close()
+        stderr_thread.join()
+        return_code, cpu_user_s, cpu_system_s = _wait_with_rusage(process)
+    except BaseException:
+        if process.poll() is None:
+            process.kill(); process.wait()
+        raise
+    finally:
+        if timer: timer.cancel()
+        with _stats_lock:
+            _active_processes.pop(process, None)
+
+    return {"returncode": return_code, "stderr_tail": "\n".join(stderr_tail), "stdout_result": stdout_result,
+            "timed_out": timed_out.is_set(), "wall_s": time.perf_counter() - started,
+            "cpu_user_s": cpu_user_s, "cpu_system_s": cpu_system_s, "last_progress": last_progress}
+
+
+def partial_path(output_path):
+    """Nome temporário de output_path enquanto o FFmpeg escreve (mesmo diretório, para o rename ser atômico)."""
+    root, ext = os.path.splitext(output_path)
+    return f"{root}{PARTIAL_SUFFIX}{ext}"
+
+
+def run(command, label="ffmpeg", timeout_s=None, retries=None, on_progress=None, expected_duration_s=None,
+        stdout_handler=None, on_stderr_line=None, output_path=None, stderr_tail_lines=DEFAULT_STDERR_TAIL_LINES,
+        atomic_output=True):
+    """
+    Executa um comando FFmpeg/FFprobe.
+    - Comandos 'ffmpeg' sem stdout_handler recebem '-progress pipe:1 -nostats'; on_progress(snapshot)
+      é chamado a cada bloco com out_time_s, fps, speed, percent (se expected_duration_s) e done.
+    - stdout_handler(stream binário) consome o stdout nesta thread (ex.: áudio/vídeo cru); seu retorno
+      vai em 'stdout_result'. Nesse caso não há nova tentativa (parte da saída já foi consumida).
+    - on_stderr_line(linha) recebe cada linha do stderr (em outra thread); só as últimas
+      stderr_tail_lines ficam em 'stderr_tail'.
+    - timeout_s/retries: padrão de configure(). Timeout e erros transitórios (TRANSIENT_ERROR_RE)
+      são repetidos após RETRY_DELAY_S.
+    - output_path (padrão: último argumento de um comando 'ffmpeg') é medido para 'output_bytes'.
+      Com atomic_output, um comando 'ffmpeg' escreve em partial_path(último argumento), que é
+      renomeado para o nome final só com código 0 (e apagado em qualquer falha).
+    Retorna um dicionário com returncode, stderr_tail, stdout_result, timed_out, attempts, wall_s,
+    cpu_user_s, cpu_system_s, output_bytes e last_progress. Levanta FileNotFoundError se o
+    executável não existir, como o subprocess.
+    """
+    timeout_s = _settings["timeout_s"] if timeout_s is None else timeout_s
+    retries = 0 if stdout_handler else (_settings["retries"] if retries is None else retries)
+    is_ffmpeg = os.path.basename(command[0]).split('.')[0] == "ffmpeg"
+    if output_path is None and is_ffmpeg and command[-1] != '-': output_path = command[-1]
+    read_progress = is_ffmpeg and stdout_handler is None
+    full_command = [command[0], '-progress', 'pipe:1', '-nostats', *command[1:]] if read_progress else list(command)
+    temp_output = None
+    if atomic_output and is_ffmpeg and command[-1] not in ('-', os.devnull) and not command[-1].startswith("pipe:"):
+        temp_output = full_command[-1] = partial_path(command[-1])
+
+    totals = {"wall_s": 0.0, "cpu_user_s": None, "cpu_system_s": None}
+    try:
+        for attempt in range(1, retries + 2):
+            result = _run_once(full_command, label, timeout_s, on_progress, expected_duration_s, stdout_handler,
+                               on_stderr_line, stderr_tail_lines, read_progress)
+            totals["wall_s"] += result["wall_s"]
+            for key in ("cpu_user_s", "cpu_system_s"):
+                if result[key] is not None: totals[key] = (totals[key] or 0.0) + result[key]
+            transient = result["timed_out"] or (result["returncode"] != 0 and TRANSIENT_ERROR_RE.search(result["stderr_tail"]))
+            if result["returncode"] == 0 or not transient or attempt > retries: break
+            reason = f"tempo limite de {timeout_s}s" if result["timed_out"] else "erro transitório"
+            print(f"  AVISO: {label} falhou ({reason}). Nova tentativa {attempt + 1}/{retries + 1} em {RETRY_DELAY_S:.0f}s...")
+            time.sleep(RETRY_DELAY_S)
+        if temp_output and result["returncode"] == 0 and os.path.isfile(temp_output):
+            os.replace(temp_output, command[-1])
+    finally:
+        if temp_output and os.path.isfile(temp_output):
+            try: os.remove(temp_output) # Saída incompleta (falha, timeout ou interrupção)
+            except OSError: pass
+
+    result.update(totals, attempts=attempt)
+    result["output_bytes"] = (os.path.getsize(output_path)
+                              if result["returncode"] == 0 and output_path and os.path.isfile(output_path) else 0)
+    _record(label, result)
+    return result
+
+
+def active_processes():
+    """Lista de (pid, rótulo) dos FFmpeg/FFprobe em execução (usada por pv_resource_sampler)."""
+    with _stats_lock:
+        return [(process.pid, label) for process, label in _active_processes.items()]
+
+
+def signal_active_processes(signal_number):
+    """Envia um sinal a todos os FFmpeg/FFprobe em execução (ex.: SIGSTOP/SIGCONT/SIGTERM do pv_pipeline.CancelToken)."""
+    with _stats_lock:
+        processes = list(_active_processes)
+    for process in processes:
+        try: process.send_signal(signal_number)
+        except OSError: pass # Já terminou
+    return len(processes)
+
+
+def _record(label, result):
+    with _stats_lock:
+        entry = _stats.setdefault(label, {"count": 0, "failures": 0, "retries": 0, "timeouts": 0, "wall_s": 0.0,
+                                          "cpu_user_s": 0.0, "cpu_system_s": 0.0, "output_bytes": 0})
+        entry["count"] += 1
+        entry["failures"] += result["returncode"] != 0
+        entry["retries"] += result["attempts"] - 1
+        entry["timeouts"] += result["timed_out"]
+        entry["wall_s"] += result["wall_s"]
+        entry["cpu_user_s"] += result["cpu_user_s"] or 0.0
+        entry["cpu_system_s"] += result["cpu_system_s"] or 0.0
+        entry["output_bytes"] += result["output_bytes"]
+
+
+def stats_summary():
+    """Totais por rótulo desde o início (ou reset_stats), com a utilização de CPU (CPU / parede)."""
+    with _stats_lock:
+        summary = {label: dict(entry) for label, entry in _stats.items()}
+    for entry in summary.values():
+        cpu_s = entry["cpu_user_s"] + entry["cpu_system_s"]
+        entry["cpu_utilization"] = round(cpu_s / entry["wall_s"], 2) if entry["wall_s"] > 0 else 0.0
+        for key in ("wall_s", "cpu_user_s", "cpu_system_s"): entry[key] = round(entry[key], 2)
+    return summary
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def format_stats_lines(summary):
+    """Linhas legíveis de stats_summary() para o sumário TXT."""
+    return [f"{label:<20}: {entry['count']} exec., {entry['failures']} falhas, {entry['retries']} repetidas, "
+            f"parede {entry['wall_s']:.1f}s, CPU {entry['cpu_user_s'] + entry['cpu_system_s']:.1f}s "
+            f"({entry['cpu_utilization']:.2f} núcleos), saída {entry['output_bytes'] / (1024*1024):.1f}MB"
+            for label, entry in sorted(summary.items())]
+
+
+if __name__ == "__main__":
+    # Autoteste com o próprio Python fazendo o papel do FFmpeg (não precisa de FFmpeg).
+    import sys, tempfile
+    print("--- Testando pv_ffmpeg_runner.py diretamente ---")
+    noisy = [sys.executable, "-c", "import sys\nfor i in range(1000): print('linha', i, file=sys.stderr)\nsys.exit(3)"]
+    result = run(noisy, label="teste", retries=0)
+    assert result["returncode"] == 3 and result["stderr_tail"].splitlines()[-1] == "linha 999"
+    assert len(result["stderr_tail"].splitlines()) == DEFAULT_STDERR_TAIL_LINES
+    assert run([sys.executable, "-c", "print('ok')"], stdout_handler=lambda s: s.read())["stdout_result"].strip() == b"ok"
+    started = time.perf_counter()
+    slow = run([sys.executable, "-c", "import time; time.sleep(30)"], label="teste", timeout_s=0.5, retries=1)
+    assert slow["timed_out"] and slow["attempts"] == 2 and time.perf_counter() - started < 10
+    busy = run([sys.executable, "-c", "sum(range(3 * 10**7))"], label="cpu")
+    assert busy["returncode"] == 0 and (busy["cpu_user_s"] is None or busy["cpu_user_s"] > 0.1)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Falso "ffmpeg" (só o nome importa): escreve no último argumento e falha se pedido.
+        fake_ffmpeg = os.path.join(temp_dir, "ffmpeg")
+        with open(fake_ffmpeg, 'w') as f:
+            f.write(f"#!{sys.executable}\nimport sys\nopen(sys.argv[-1], 'w').write('x')\nsys.exit(int(sys.argv[-2]))\n")
+        os.chmod(fake_ffmpeg, 0o755)
+        target = os.path.join(temp_dir, "saida.mp4")
+        assert run([fake_ffmpeg, "1", target], retries=0)["returncode"] == 1
+        assert not os.path.exists(target) and not os.path.exists(partial_path(target)), "saída parcial ficou no disco"
+        assert run([fake_ffmpeg, "0", target])["output_bytes"] == 1 and not os.path.exists(partial_path(target))
+    block = {"out_time_us": "5000000", "fps": "59.9", "speed": "2.5x", "progress": "continue"}
+    assert _progress_snapshot(block, 10.0) == {"out_time_s": 5.0, "fps": 59.9, "speed": 2.5, "percent": 50.0, "done": False}
+    print("\n".join(format_stats_lines(stats_summary())))
+    print("OK")
@@ -4,27 +4,62 @@ from tkinter import ttk, filedialog, scrolledtext, messagebox
 import subprocess
 import threading
 import queue
+import multiprocessing
 import os
 import sys
 import shlex # Ainda útil para a lógica geral
 import json
+import signal
+import datetime
+from collections import deque
+
+import pv_utils
+import pv_pipeline
+
+try:
+    import numpy as np
+    import pv_audio_analysis
+except ImportError:
+    print("AVISO: NumPy/pv_audio_analysis não encontrados. A linha do tempo ficará desativada.")
+    pv_audio_analysis = None
 
 # --- CONFIGURAÇÃO ---
 PV_PROCESS_SCRIPT_PATH = "pv-process.py" 
 CONFIG_FILE_NAME = "pv_gui_config.json"
+LOG_SPOOL_FILE_PATTERN = "{destination_root}_gui_{timestamp}.log" # Log completo de cada trabalho, ao lado do destino
+LOG_MAX_VISIBLE_LINES = 5000 # Linhas mantidas por trabalho no painel de log (as mais antigas são descartadas)
+LOG_MAX_LINES_PER_TICK = 5000 # Linhas retiradas da fila a cada atualização da tela
+LOG_TICK_MS = 100
+JOB_POLL_INTERVAL_S = 0.2 # Espera máxima por mensagens do processo de um trabalho antes de verificar se ele terminou
+# Estados de um trabalho da fila
+JOB_QUEUED, JOB_RUNNING, JOB_PAUSED = "Na fila", "Executando", "Pausado"
+JOB_DONE, JOB_FAILED, JOB_CANCELLED = "Concluído", "Erro", "Cancelado"
+TIMELINE_HEIGHT = 140
+TIMELINE_DB_FLOOR = -80.0 # Base do gráfico (dBFS)
+TIMELINE_RESEGMENT_DELAY_MS = 300 # Espera após a última edição de parâmetro para re-segmentar
 # --------------------
 
+# Cada trabalho roda um pv_pipeline.Pipeline em um processo próprio (a configuração do FFmpeg, as
+# estatísticas e o progresso são do processo). O forkserver já carrega pv_pipeline uma vez só.
+if "forkserver" in multiprocessing.get_all_start_methods():
+    JOB_CONTEXT = multiprocessing.get_context("forkserver")
+    JOB_CONTEXT.set_forkserver_preload(["pv_pipeline"])
+else:
+    JOB_CONTEXT = multiprocessing.get_context("spawn")
+
 
 class App(tk.Tk):
     def __init__(self):
         super().__init__()
 
         self.title("Processador de Vídeo (PV-Process)")
-        self.geometry("800x800")
+        self.geometry("850x1080")
 
         self.source_files = [] # Esta lista agora será salva e carregada
-        self.processing_process = None
-        self.processing_thread = None
+        # Fila de trabalhos: cada um é um dict com comando, estado, processo, log e progresso próprios
+        self.jobs = []
+        self.next_job_id = 1
+        self.visible_job_id = None # Trabalho cujo log/progresso aparece no painel de log
 
         # --- Variáveis de controle para os widgets ---
         self.destination_file_var = tk.StringVar()
@@ -40,6 +75,8 @@ class App(tk.Tk):
         self.apply_fade_var = tk.BooleanVar()
         self.keep_temp_dirs_var = tk.BooleanVar()
         self.clean_start_var = tk.BooleanVar()
+        self.proxy_var = tk.BooleanVar()
+        self.max_parallel_jobs_var = tk.StringVar()
         
         self.config_vars = {
             "destination_file": self.destination_file_var,
@@ -54,12 +91,29 @@ class App(tk.Tk):
             "join_only": self.join_only_var,
             "apply_fade": self.apply_fade_var,
             "keep_temp_dirs": self.keep_temp_dirs_var,
-            "clean_start": self.clean_start_var
+            "clean_start": self.clean_start_var,
+            "proxy": self.proxy_var,
+            "max_parallel_jobs": self.max_parallel_jobs_var
             # A lista de arquivos de origem será tratada separadamente
         }
 
         self.log_queue = queue.Queue()
-        self.after(100, self.process_log_queue)
+        self.overall_progress_var = tk.DoubleVar()
+        self.stage_progress_var = tk.DoubleVar()
+        self.overall_progress_text = tk.StringVar()
+        self.stage_progress_text = tk.StringVar()
+        self.after(LOG_TICK_MS, self.process_log_queue)
+
+        # Linha do tempo: envelope (pirâmide min/max) + segmentos, atualizados por threads via timeline_queue
+        self.timeline_queue = queue.Queue()
+        self.timeline_pyramid = None
+        self.timeline_duration_ms = 0
+        self.timeline_view = (0, 0)
+        self.timeline_segments = None # (starts, ends, is_speech) em ms
+        self.timeline_generation = 0
+        self.timeline_resegment_job = None
+        self.timeline_drag_x = None
+        self.timeline_status_var = tk.StringVar(value="Nenhum áudio carregado.")
         
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
 
@@ -69,10 +123,14 @@ class App(tk.Tk):
 
         self.create_file_selection_widgets(main_frame)
         self.create_parameters_widgets(main_frame)
+        self.create_timeline_widgets(main_frame)
+        self.create_job_queue_widgets(main_frame)
         self.create_log_widgets(main_frame)
         self.create_action_buttons(main_frame)
         
         self.load_settings() # Carrega as últimas configurações salvas
+        for var in (self.min_silence_len_var, self.silence_thresh_var, self.speech_padding_start_var, self.speech_padding_end_var):
+            var.trace_add("write", self.schedule_timeline_resegment)
 
     def get_default_settings(self):
         """Retorna um dicionário com todos os valores padrão."""
@@ -81,11 +139,17 @@ class App(tk.Tk):
             "destination_file": "", "min_silence_len": "2000", "silence_thresh": "-35",
             "speech_padding_start": "500", "speech_padding_end": "500", "fade_duration": "20",
             "min_silent_speedup_duration": "1500", "speedup_factor": "4", "chunk_size": "500",
-            "join_only": False, "apply_fade": False, "keep_temp_dirs": False, "clean_start": False
+            "join_only": False, "apply_fade": False, "keep_temp_dirs": False, "clean_start": False,
+            "proxy": False, "max_parallel_jobs": "1"
         }
     
     def on_closing(self):
-        """Salva as configurações ao fechar a janela."""
+        """Salva as configurações ao fechar a janela (e encerra os trabalhos ativos, se confirmado)."""
+        active_jobs = [job for job in self.jobs if job["process"] is not None]
+        if active_jobs:
+            if not messagebox.askyesno("Trabalhos em execução", f"{len(active_jobs)} trabalho(s) ainda em execução. Cancelar e sair?"):
+                return
+            for job in active_jobs: self.signal_job(job, signal.SIGTERM)
         self.save_settings()
         self.destroy()
 
@@ -169,7 +233,7 @@ class App(tk.Tk):
             ("Duração Fade (ms):", self.fade_duration_var),
             ("Duração Mín. p/ Acelerar (ms):", self.min_silent_speedup_duration_var),
             ("Fator de Aceleração:", self.speedup_factor_var),
-            ("Tamanho do Chunk (MB) [0=desativado]:", self.chunk_size_var),
+            ("Tamanho do Chunk (MB) [0=desativado, auto]:", self.chunk_size_var),
         ]
         
         for i, (label_text, var) in enumerate(params):
@@ -184,6 +248,7 @@ class App(tk.Tk):
         ttk.Checkbutton(options_frame, text="Aplicar Fades de Áudio (--fade)", variable=self.apply_fade_var).pack(anchor="w")
         ttk.Checkbutton(options_frame, text="Manter Dirs Temporários (--keep-temp-dirs)", variable=self.keep_temp_dirs_var).pack(anchor="w")
         ttk.Checkbutton(options_frame, text="Forçar Execução Limpa (--clean-start)", variable=self.clean_start_var).pack(anchor="w")
+        ttk.Checkbutton(options_frame, text="Prévia 360p para Revisão (--proxy)", variable=self.proxy_var).pack(anchor="w")
 
         reset_button = ttk.Button(options_frame, text="Resetar Parâmetros", command=self.reset_to_defaults)
         reset_button.pack(anchor="w", pady=(10,0))
@@ -191,25 +256,203 @@ class App(tk.Tk):
         frame.columnconfigure(0, weight=1)
         frame.columnconfigure(1, weight=1)
     
+    def create_timeline_widgets(self, parent):
+        frame = ttk.LabelFrame(parent, text="Linha do Tempo (roda: zoom, arrastar: mover)", padding="10")
+        frame.pack(fill=tk.X, pady=5)
+        top_frame = ttk.Frame(frame)
+        top_frame.pack(fill=tk.X)
+        load_button = ttk.Button(top_frame, text="Analisar Áudio da Origem Selecionada", command=self.load_timeline)
+        load_button.pack(side=tk.LEFT)
+        if pv_audio_analysis is None: load_button.config(state='disabled')
+        ttk.Label(top_frame, textvariable=self.timeline_status_var).pack(side=tk.LEFT, padx=10)
+        self.timeline_canvas = tk.Canvas(frame, height=TIMELINE_HEIGHT, bg="black", highlightthickness=0)
+        self.timeline_canvas.pack(fill=tk.X, pady=(5, 0))
+        self.timeline_canvas.bind("<Configure>", lambda event: self.render_timeline())
+        self.timeline_canvas.bind("<MouseWheel>", lambda event: self.zoom_timeline(event.x, 0.8 if event.delta > 0 else 1.25))
+        self.timeline_canvas.bind("<Button-4>", lambda event: self.zoom_timeline(event.x, 0.8)) # Linux
+        self.timeline_canvas.bind("<Button-5>", lambda event: self.zoom_timeline(event.x, 1.25))
+        self.timeline_canvas.bind("<ButtonPress-1>", lambda event: setattr(self, "timeline_drag_x", event.x))
+        self.timeline_canvas.bind("<B1-Motion>", self.pan_timeline)
+
+    def load_timeline(self):
+        """Analisa (em uma thread) o áudio da origem selecionada e monta a pirâmide min/max do envelope."""
+        if not self.source_files:
+            self.log_message("ERRO: Adicione pelo menos um arquivo de origem.\n"); return
+        selected = self.source_listbox.curselection()
+        source_path = self.source_files[selected[0] if selected else 0]
+        self.timeline_generation += 1
+        generation = self.timeline_generation
+        try: min_len, thresh = int(self.min_silence_len_var.get()), int(self.silence_thresh_var.get())
+        except ValueError:
+            self.log_message("ERRO: Silêncio mínimo e limiar devem ser números inteiros.\n"); return
+        self.timeline_status_var.set(f"Analisando '{os.path.basename(source_path)}'...")
+
+        def worker(): # Nada de Tk aqui: o resultado volta pela timeline_queue
+            try:
+                duration_s = pv_utils.get_extended_video_info(source_path).get("duration_s")
+                analysis = pv_audio_analysis.analyze_source_audio(
+                    source_path, min_len, thresh,
+                    cache_dir=pv_utils.get_cache_dir(), jobs=os.cpu_count() or 1, duration_s=duration_s)
+                pyramid = pv_audio_analysis.build_minmax_pyramid(analysis["mean_square"])
+                self.timeline_queue.put(("loaded", generation, (os.path.basename(source_path), pyramid)))
+            except Exception as e:
+                self.timeline_queue.put(("error", generation, str(e)))
+        threading.Thread(target=worker, daemon=True).start()
+
+    def schedule_timeline_resegment(self, *_):
+        if self.timeline_pyramid is None: return
+        if self.timeline_resegment_job: self.after_cancel(self.timeline_resegment_job)
+        self.timeline_resegment_job = self.after(TIMELINE_RESEGMENT_DELAY_MS, self.start_timeline_resegment)
+
+    def start_timeline_resegment(self):
+        """Refaz a detecção e o plano de segmentos sobre o envelope já carregado (nenhum FFmpeg)."""
+        self.timeline_resegment_job = None
+        try:
+            min_len, thresh = int(self.min_silence_len_var.get()), int(self.silence_thresh_var.get())
+            pad_start, pad_end = int(self.speech_padding_start_var.get()), int(self.speech_padding_end_var.get())
+        except ValueError:
+            return # Campo sendo editado
+        self.timeline_generation += 1
+        generation = self.timeline_generation
+        mean_square = self.timeline_pyramid[0][0]
+
+        def worker():
+            try:
+                import pv_step_01_audio_segment as step1
+                silent_ranges = pv_audio_analysis.detect_silence_in_range(
+                    mean_square, len(mean_square), min_len, thresh, coarse_hop_ms=pv_audio_analysis.DEFAULT_COARSE_HOP_MS)
+                plan = step1.plan_segments(silent_ranges, len(mean_square), pad_start, pad_end)
+                segments = (np.array([seg["start_ms"] for seg in plan]), np.array([seg["end_ms"] for seg in plan]),
+                            np.array([seg["type"] == "speech" for seg in plan]))
+                self.timeline_queue.put(("segments", generation, segments))
+            except Exception as e:
+                self.timeline_queue.put(("error", generation, str(e)))
+        threading.Thread(target=worker, daemon=True).start()
+
+    def process_timeline_queue(self):
+        while True:
+            try: kind, generation, payload = self.timeline_queue.get_nowait()
+            except queue.Empty: break
+            if generation != self.timeline_generation: continue # Resultado de um pedido já substituído
+            if kind == "loaded":
+                name, self.timeline_pyramid = payload
+                self.timeline_duration_ms = len(self.timeline_pyramid[0][0])
+                self.timeline_view = (0, self.timeline_duration_ms)
+                self.timeline_segments = None
+                self.timeline_status_var.set(f"{name}: {self.timeline_duration_ms / 1000.0:.1f}s")
+                self.start_timeline_resegment()
+            elif kind == "segments":
+                self.timeline_segments = payload
+                speech_count = int(payload[2].sum())
+                self.timeline_status_var.set(f"{speech_count} falas, {len(payload[2]) - speech_count} silêncios "
+                                             f"em {self.timeline_duration_ms / 1000.0:.1f}s")
+            else:
+                self.timeline_status_var.set(f"Erro na análise: {payload}")
+            self.render_timeline()
+
+    def zoom_timeline(self, x, factor):
+        if self.timeline_pyramid is None: return
+        start, end = self.timeline_view
+        width = max(1, self.timeline_canvas.winfo_width())
+        anchor_ms = start + (end - start) * x / width # O ponto sob o mouse fica parado
+        new_span = min(self.timeline_duration_ms, max(width, (end - start) * factor))
+        new_start = min(max(0, anchor_ms - new_span * x / width), self.timeline_duration_ms - new_span)
+        self.timeline_view = (new_start, new_start + new_span)
+        self.render_timeline()
+
+    def pan_timeline(self, event):
+        if self.timeline_pyramid is None or self.timeline_drag_x is None: return
+        start, end = self.timeline_view
+        shift_ms = (self.timeline_drag_x - event.x) * (end - start) / max(1, self.timeline_canvas.winfo_width())
+        shift_ms = min(max(shift_ms, -start), self.timeline_duration_ms - end)
+        self.timeline_view = (start + shift_ms, end + shift_ms)
+        self.timeline_drag_x = event.x
+        self.render_timeline()
+
+    def render_timeline(self):
+        canvas = self.timeline_canvas
+        canvas.delete("all")
+        if self.timeline_pyramid is None: return
+        width, height = max(1, canvas.winfo_width()), TIMELINE_HEIGHT
+        start, end = self.timeline_view
+        ms_per_px = (end - start) / width
+
+        def y_of(dbfs): return height * (1.0 - (dbfs - TIMELINE_DB_FLOOR) / -TIMELINE_DB_FLOOR)
+
+        # Regiões de fala/silêncio visíveis (faixa no topo e fundo colorido)
+        if self.timeline_segments is not None:
+            seg_starts, seg_ends, is_speech = self.timeline_segments
+            first = int(np.searchsorted(seg_ends, start, side="right"))
+            last = int(np.searchsorted(seg_starts, end, side="left"))
+            for i in range(first, last):
+                x0, x1 = (seg_starts[i] - start) / ms_per_px, (seg_ends[i] - start) / ms_per_px
+                color = "#1f4f1f" if is_speech[i] else "#2a2a2a"
+                canvas.create_rectangle(x0, 0, x1, height, fill=color, outline="")
+
+        # Envelope: uma linha min..max por coluna, lida do nível da pirâmide adequado ao zoom
+        mins, maxs = pv_audio_analysis.pyramid_columns(self.timeline_pyramid, start, end, width)
+        if len(mins):
+            col_width = width / len(mins)
+            y_tops = [y_of(v) for v in pv_audio_analysis.mean_square_to_dbfs(maxs).clip(TIMELINE_DB_FLOOR, 0.0)]
+            y_bottoms = [y_of(v) for v in pv_audio_analysis.mean_square_to_dbfs(mins).clip(TIMELINE_DB_FLOOR, 0.0)]
+            for i, (y_top, y_bottom) in enumerate(zip(y_tops, y_bottoms)):
+                x = i * col_width
+                canvas.create_line(x, y_bottom + 1, x, y_top, fill="limegreen")
+
+        # Linha do limiar de silêncio
+        try:
+            y = y_of(float(self.silence_thresh_var.get()))
+            canvas.create_line(0, y, width, y, fill="orange", dash=(4, 2))
+            canvas.create_text(width - 4, y - 2, text=f"{self.silence_thresh_var.get()} dBFS", fill="orange", anchor="se", font=("Consolas", 8))
+        except ValueError: pass
+        canvas.create_text(4, height - 2, text=f"{start / 1000.0:.1f}s", fill="white", anchor="sw", font=("Consolas", 8))
+        canvas.create_text(width - 4, height - 2, text=f"{end / 1000.0:.1f}s", fill="white", anchor="se", font=("Consolas", 8))
+
     def create_log_widgets(self, parent):
         frame = ttk.LabelFrame(parent, text="Log de Processamento", padding="10")
         frame.pack(fill=tk.BOTH, expand=True, pady=5)
-        self.log_text = scrolledtext.ScrolledText(frame, wrap=tk.WORD, height=15, bg="black", fg="limegreen", font=("Consolas", 9))
+        progress_frame = ttk.Frame(frame)
+        progress_frame.pack(fill=tk.X, pady=(0, 5))
+        for row, (var, text_var) in enumerate([(self.overall_progress_var, self.overall_progress_text),
+                                               (self.stage_progress_var, self.stage_progress_text)]):
+            ttk.Progressbar(progress_frame, variable=var, maximum=100).grid(row=row, column=0, sticky="ew", padx=5, pady=1)
+            ttk.Label(progress_frame, textvariable=text_var, width=45).grid(row=row, column=1, sticky="w", padx=5)
+        progress_frame.columnconfigure(0, weight=1)
+        self.log_text = scrolledtext.ScrolledText(frame, wrap=tk.WORD, height=12, bg="black", fg="limegreen", font=("Consolas", 9))
         self.log_text.pack(fill=tk.BOTH, expand=True)
         self.log_text.config(state='disabled')
 
+    def create_job_queue_widgets(self, parent):
+        frame = ttk.LabelFrame(parent, text="Fila de Trabalhos", padding="10")
+        frame.pack(fill=tk.X, pady=5)
+        self.job_tree = ttk.Treeview(frame, columns=("status", "progress", "destination"), height=5, selectmode="browse")
+        for column, heading, width in [("#0", "Trabalho", 180), ("status", "Estado", 90), ("progress", "Progresso", 220), ("destination", "Destino", 200)]:
+            self.job_tree.heading(column, text=heading)
+            self.job_tree.column(column, width=width, stretch=(column == "destination"))
+        self.job_tree.grid(row=0, column=0, sticky="ew", padx=5)
+        self.job_tree.bind("<<TreeviewSelect>>", lambda event: self.show_selected_job())
+        buttons_frame = ttk.Frame(frame)
+        buttons_frame.grid(row=0, column=1, sticky="ns", padx=5)
+        for text, command in [("Subir", lambda: self.move_selected_job(-1)), ("Descer", lambda: self.move_selected_job(1)),
+                              ("Pausar/Retomar", self.toggle_pause_selected_job), ("Cancelar", self.cancel_selected_job),
+                              ("Remover", self.remove_selected_job)]:
+            ttk.Button(buttons_frame, text=text, command=command).pack(fill=tk.X, pady=1)
+        parallel_frame = ttk.Frame(frame)
+        parallel_frame.grid(row=1, column=0, sticky="w", padx=5, pady=(5, 0))
+        ttk.Label(parallel_frame, text="Execuções simultâneas:").pack(side=tk.LEFT)
+        ttk.Spinbox(parallel_frame, from_=1, to=max(1, os.cpu_count() or 1), textvariable=self.max_parallel_jobs_var, width=5).pack(side=tk.LEFT, padx=5)
+        frame.columnconfigure(0, weight=1)
+
     def create_action_buttons(self, parent):
         frame = ttk.Frame(parent, padding="10")
         frame.pack(fill=tk.X)
         
-        self.start_button = ttk.Button(frame, text="Iniciar Processamento", command=self.start_processing, style="Accent.TButton")
+        self.start_button = ttk.Button(frame, text="Adicionar à Fila", command=self.enqueue_job, style="Accent.TButton")
         self.start_button.pack(side=tk.RIGHT, padx=5)
         
         self.copy_button = ttk.Button(frame, text="Gerar e Copiar Comando", command=self.generate_and_copy_command)
         self.copy_button.pack(side=tk.RIGHT, padx=5)
         
-        self.cancel_button = ttk.Button(frame, text="Cancelar Processo", command=self.cancel_processing)
-        
         ttk.Button(frame, text="Sair", command=self.on_closing).pack(side=tk.LEFT, padx=5)
         
         style = ttk.Style(self)
@@ -234,6 +477,7 @@ class App(tk.Tk):
         if self.apply_fade_var.get(): command.append("--fade")
         if self.keep_temp_dirs_var.get(): command.append("--keep-temp-dirs")
         if self.clean_start_var.get(): command.append("--clean-start")
+        if self.proxy_var.get(): command.append("--proxy")
         return command
 
     # === FUNÇÃO MODIFICADA PARA SER MULTIPLATAFORMA ===
@@ -259,57 +503,220 @@ class App(tk.Tk):
         self.log_message("Agora você pode colar e executar este comando em um terminal (com o ambiente virtual 'venv' ativo).\n")
     # =================================================
 
-    def start_processing(self):
+    def enqueue_job(self):
+        """Cria um trabalho com os arquivos e parâmetros atuais e o coloca no fim da fila."""
         command = self._build_command()
         if not command: return
-        self.start_button.pack_forget(); self.copy_button.pack_forget()
-        self.cancel_button.pack(side=tk.RIGHT, padx=5)
+        active_destinations = {job["destination"] for job in self.jobs if job["status"] in (JOB_QUEUED, JOB_RUNNING, JOB_PAUSED)}
+        if self.destination_file_var.get():
+            destination = os.path.abspath(self.destination_file_var.get())
+        else:
+            # O destino automático é resolvido já na fila (e não na execução), para ser comparado com os
+            # outros trabalhos: dois criados no mesmo segundo ganhariam o mesmo nome.
+            root, ext = os.path.splitext(os.path.abspath(pv_pipeline.generate_default_output_filename(len(self.source_files), datetime.datetime.now())))
+            destination, suffix = root + ext, 2
+            while destination in active_destinations:
+                destination, suffix = f"{root}-{suffix}{ext}", suffix + 1
+            command.extend(["-d", destination])
+        # O diretório temporário do processamento deriva do destino: dois trabalhos ativos com o mesmo destino colidiriam
+        if destination in active_destinations:
+            self.log_message(f"ERRO: Já existe um trabalho ativo com o destino '{destination}'.\n"); return
+        try: config = pv_pipeline.parse_config(command[3:]) # Sem python, -u e o script
+        except ValueError as e:
+            self.log_message(f"ERRO: {e}\n"); return
+        job = {"id": self.next_job_id, "command": command, "config": config, "destination": destination,
+               "name": os.path.basename(destination) + (" (prévia)" if self.proxy_var.get() else ""),
+               "status": JOB_QUEUED, "process": None, "result": None, "cancel_requested": False,
+               "log": deque(maxlen=LOG_MAX_VISIBLE_LINES), "progress": {}}
+        self.next_job_id += 1
+        self.jobs.append(job)
+        self.job_tree.insert("", tk.END, iid=str(job["id"]), text=f"#{job['id']} {job['name']}")
+        self.refresh_job_row(job)
+        self.job_tree.selection_set(str(job["id"]))
+        self.schedule_jobs()
+
+    def find_job(self, job_id):
+        return next((job for job in self.jobs if job["id"] == job_id), None)
+
+    def selected_job(self):
+        selection = self.job_tree.selection()
+        return self.find_job(int(selection[0])) if selection else None
+
+    def refresh_job_row(self, job):
+        progress = job["progress"].get(True) or job["progress"].get(False)
+        progress_text = f"{progress.get('stage', '')}: {progress.get('done', 0)}/{progress.get('total', 0)}" if progress else ""
+        self.job_tree.item(str(job["id"]), values=(job["status"], progress_text, job["destination"]))
+
+    def schedule_jobs(self):
+        """Inicia os próximos trabalhos da fila (na ordem da lista) enquanto houver vaga de execução."""
+        try: max_parallel = max(1, int(self.max_parallel_jobs_var.get()))
+        except ValueError: max_parallel = 1
+        running = sum(1 for job in self.jobs if job["status"] == JOB_RUNNING)
+        for job in self.jobs:
+            if running >= max_parallel: break
+            if job["status"] != JOB_QUEUED: continue
+            job["status"] = JOB_RUNNING
+            self.append_job_log(job, ["--- Iniciando Processamento ---\n"])
+            self.refresh_job_row(job)
+            threading.Thread(target=self.run_job_worker, args=(job,), daemon=True).start()
+            running += 1
+
+    def move_selected_job(self, offset):
+        job = self.selected_job()
+        if not job: return
+        index = self.jobs.index(job)
+        new_index = min(max(index + offset, 0), len(self.jobs) - 1)
+        if new_index == index: return
+        self.jobs.insert(new_index, self.jobs.pop(index))
+        self.job_tree.move(str(job["id"]), "", new_index)
+
+    def signal_job(self, job, signal_number):
+        """Envia um sinal ao grupo de processos do trabalho (o processo do Pipeline e os FFmpeg que ele iniciou)."""
+        process = job["process"]
+        if process is None or not process.is_alive(): return False
+        if sys.platform == "win32":
+            if signal_number != signal.SIGTERM: return False # Windows não tem SIGSTOP/SIGCONT
+            process.terminate()
+        else:
+            try: os.killpg(process.pid, signal_number)
+            except OSError: return False
+        return True
+
+    def toggle_pause_selected_job(self):
+        """Na fila: segura/libera o trabalho. Em execução: suspende/retoma o processo (fora do Windows)."""
+        job = self.selected_job()
+        if not job: return
+        if job["status"] == JOB_QUEUED: job["status"] = JOB_PAUSED
+        elif job["status"] == JOB_PAUSED and job["process"] is None: job["status"] = JOB_QUEUED
+        elif job["status"] == JOB_RUNNING:
+            if self.signal_job(job, signal.SIGSTOP): job["status"] = JOB_PAUSED
+            else: self.log_message("AVISO: Não é possível pausar um trabalho em execução nesta plataforma.\n")
+        elif job["status"] == JOB_PAUSED and self.signal_job(job, signal.SIGCONT): job["status"] = JOB_RUNNING
+        self.refresh_job_row(job)
+        self.schedule_jobs()
+
+    def cancel_selected_job(self):
+        job = self.selected_job()
+        if not job or job["status"] not in (JOB_QUEUED, JOB_RUNNING, JOB_PAUSED): return
+        if job["process"] is None:
+            job["status"] = JOB_CANCELLED
+        else:
+            job["cancel_requested"] = True
+            self.append_job_log(job, ["\n--- TENTANDO CANCELAR O PROCESSO... ---\n"])
+            if job["status"] == JOB_PAUSED and sys.platform != "win32": self.signal_job(job, signal.SIGCONT) # Parado não trata o SIGTERM
+            self.signal_job(job, signal.SIGTERM)
+        self.refresh_job_row(job)
+
+    def remove_selected_job(self):
+        job = self.selected_job()
+        if not job: return
+        if job["status"] in (JOB_RUNNING, JOB_PAUSED) and job["process"] is not None:
+            self.log_message("AVISO: Cancele o trabalho antes de removê-lo da fila.\n"); return
+        self.jobs.remove(job)
+        self.job_tree.delete(str(job["id"]))
+        if self.visible_job_id == job["id"]: self.visible_job_id = None
+
+    def show_selected_job(self):
+        """Mostra no painel de log o log e o progresso do trabalho selecionado."""
+        job = self.selected_job()
+        if not job or job["id"] == self.visible_job_id: return
+        self.visible_job_id = job["id"]
         self.log_text.config(state='normal'); self.log_text.delete(1.0, tk.END); self.log_text.config(state='disabled')
-        self.processing_thread = threading.Thread(target=self.run_script_worker, args=(command,), daemon=True)
-        self.processing_thread.start()
+        self.log_message("".join(job["log"]))
+        for overall in (True, False): self.update_progress(job["progress"].get(overall) or {}, overall)
 
-    def cancel_processing(self):
-        if self.processing_process and self.processing_process.poll() is None:
-            self.log_message("\n--- TENTANDO CANCELAR O PROCESSO... ---\n")
-            self.processing_process.terminate()
+    def append_job_log(self, job, lines):
+        job["log"].extend(lines)
+        if job["id"] == self.visible_job_id: self.log_message("".join(lines))
 
-    def run_script_worker(self, command):
+    def run_job_worker(self, job):
+        # O log completo vai para o arquivo (nesta thread); o painel só mostra as últimas linhas.
+        # Com data e hora no nome, um trabalho de outra sessão (ids recomeçam em 1) não sobrescreve o log.
+        spool_path = LOG_SPOOL_FILE_PATTERN.format(destination_root=os.path.splitext(job["destination"])[0],
+                                                   timestamp=datetime.datetime.now().strftime("%Y%m%d_%H%M%S"))
+        try:
+            os.makedirs(os.path.dirname(spool_path), exist_ok=True)
+            spool_file = open(spool_path, 'w', encoding='utf-8')
+        except OSError as e:
+            spool_file = None
+            self.log_queue.put((job["id"], "log", f"AVISO: não foi possível gravar o log em '{spool_path}': {e}\n"))
         try:
-            self.log_message("--- Iniciando Processamento ---\n")
-            startup_info = None
-            if sys.platform == "win32":
-                startup_info = subprocess.STARTUPINFO()
-                startup_info.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            self.processing_process = subprocess.Popen(
-                command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                text=True, encoding='utf-8', errors='replace',
-                startupinfo=startup_info, bufsize=1
-            )
-            for line in iter(self.processing_process.stdout.readline, ''): self.log_queue.put(line)
-            self.processing_process.stdout.close()
-            return_code = self.processing_process.wait()
-            
-            if return_code == 0: self.log_queue.put("\n--- Processamento Concluído com Sucesso! ---")
-            elif return_code in [-9, -15, 1]: self.log_queue.put("\n--- Processo Cancelado/Interrompido ---")
-            else: self.log_queue.put(f"\n--- ERRO: Processo finalizado com código {return_code} ---")
-        except Exception as e: self.log_queue.put(f"\n--- ERRO CRÍTICO AO INICIAR O SCRIPT: {e} ---")
+            if spool_file: self.log_queue.put((job["id"], "log", f"Log completo em: {os.path.abspath(spool_path)}\n"))
+            message_queue = JOB_CONTEXT.Queue()
+            process = JOB_CONTEXT.Process(target=pv_pipeline.run_in_worker_process, args=(job["config"], message_queue))
+            process.start()
+            job["process"] = process
+
+            def handle(kind, payload):
+                if kind == "log":
+                    if spool_file: spool_file.write(payload)
+                    self.log_queue.put((job["id"], "log", payload))
+                elif kind == "progress": self.log_queue.put((job["id"], "progress", payload))
+                elif kind == "result": job["result"] = payload
+                elif kind == "error": self.log_queue.put((job["id"], "log", f"\n--- ERRO: {payload} ---\n"))
+
+            while True:
+                try: handle(*message_queue.get(timeout=JOB_POLL_INTERVAL_S))
+                except queue.Empty:
+                    if not process.is_alive(): break
+            while True: # O que o processo enviou antes de terminar
+                try: handle(*message_queue.get_nowait())
+                except queue.Empty: break
+            process.join()
+
+            status = (job["result"] or {}).get("status")
+            if status == "SUCESSO": self.log_queue.put((job["id"], "log", "\n--- Processamento Concluído com Sucesso! ---\n"))
+            elif status == "CANCELADO" or job["cancel_requested"]: self.log_queue.put((job["id"], "log", "\n--- Processo Cancelado/Interrompido ---\n"))
+            elif status: self.log_queue.put((job["id"], "log", f"\n--- ERRO: Processamento finalizado com status {status} ---\n"))
+            else: self.log_queue.put((job["id"], "log", f"\n--- ERRO: Processo finalizado com código {process.exitcode} ---\n"))
+        except Exception as e: self.log_queue.put((job["id"], "log", f"\n--- ERRO CRÍTICO AO INICIAR O PROCESSAMENTO: {e} ---\n"))
         finally:
-            self.processing_process = None
-            self.log_queue.put("##PROCESS_FINISHED##")
+            if spool_file: spool_file.close()
+            self.log_queue.put((job["id"], "finished", None))
 
     def process_log_queue(self):
+        # Junta as linhas de um tick por trabalho em uma única inserção; do progresso só vale o último de cada barra.
+        pending_lines, finished_ids = {}, []
         try:
-            while not self.log_queue.empty():
-                line = self.log_queue.get_nowait()
-                if line == "##PROCESS_FINISHED##":
-                    self.cancel_button.pack_forget()
-                    self.start_button.pack(side=tk.RIGHT, padx=5); self.copy_button.pack(side=tk.RIGHT, padx=5)
-                else: self.log_message(line)
-        except queue.Empty: pass 
-        self.after(100, self.process_log_queue)
+            for _ in range(LOG_MAX_LINES_PER_TICK):
+                job_id, kind, payload = self.log_queue.get_nowait()
+                job = self.find_job(job_id)
+                if job is None: continue # Removido da fila
+                if kind == "finished": finished_ids.append(job_id)
+                elif kind == "progress":
+                    job["progress"][bool(payload.get("overall"))] = payload
+                    pending_lines.setdefault(job_id, [])
+                else: pending_lines.setdefault(job_id, []).append(payload)
+        except queue.Empty: pass
+        for job_id, lines in pending_lines.items():
+            job = self.find_job(job_id)
+            if lines: self.append_job_log(job, lines)
+            if job_id == self.visible_job_id:
+                for overall, progress in job["progress"].items(): self.update_progress(progress, overall)
+            self.refresh_job_row(job)
+        for job_id in finished_ids:
+            job = self.find_job(job_id)
+            if job is None: continue
+            job["process"] = None
+            if job["cancel_requested"]: job["status"] = JOB_CANCELLED
+            else: job["status"] = JOB_DONE if (job["result"] or {}).get("status") == "SUCESSO" else JOB_FAILED
+            self.refresh_job_row(job)
+        self.schedule_jobs()
+        self.process_timeline_queue()
+        self.after(LOG_TICK_MS, self.process_log_queue)
+
+    def update_progress(self, progress, overall):
+        total = progress.get("total") or 0
+        done = progress.get("done") or 0
+        text = f"{progress.get('stage', '')}: {done}/{total}" + (f" ({progress['detail']})" if progress.get("detail") else "") if progress else ""
+        (self.overall_progress_var if overall else self.stage_progress_var).set(100.0 * done / total if total else 0)
+        (self.overall_progress_text if overall else self.stage_progress_text).set(text)
 
     def log_message(self, message):
         self.log_text.config(state='normal'); self.log_text.insert(tk.END, message)
+        # Mantém só as últimas LOG_MAX_VISIBLE_LINES linhas no widget (o arquivo de log tem tudo)
+        excess_lines = int(self.log_text.index('end-1c').split('.')[0]) - LOG_MAX_VISIBLE_LINES
+        if excess_lines > 0: self.log_text.delete('1.0', f"{excess_lines + 1}.0")
         self.log_text.see(tk.END); self.log_text.config(state='disabled')
     
     def select_source_files(self):
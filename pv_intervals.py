@@ -0,0 +1,166 @@
+# pv_intervals.py
+"""
+Álgebra de intervalos usada pelas etapas (plano de segmentos, movimento, EDLs).
+Um conjunto de intervalos é um par de arrays NumPy (starts, ends), meio-abertos [start, end).
+Cada operação é uma varredura O(n log n) (ordenação + searchsorted), sem laços em Python.
+"""
+import numpy as np
+
+
+def as_arrays(ranges):
+    """Converte [[início, fim], ...] em (starts, ends)."""
+    if len(ranges) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    array = np.asarray(ranges)
+    if array.dtype.kind not in "iuf": array = array.astype(np.float64)
+    return array[:, 0].copy(), array[:, 1].copy()
+
+
+def to_ranges(starts, ends):
+    """Converte (starts, ends) de volta em [[início, fim], ...] com tipos nativos do Python."""
+    return [[s, e] for s, e in zip(starts.tolist(), ends.tolist())]
+
+
+def merge(starts, ends, join_touching=False):
+    """
+    Ordena e une intervalos sobrepostos. Com join_touching=False, intervalos que apenas se
+    encostam (fim == início do próximo) continuam separados. Intervalos vazios são descartados.
+    """
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+    if len(starts) == 0: return starts, ends
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], ends[order]
+    running_end = np.maximum.accumulate(ends)
+    if join_touching:
+        new_group = starts[1:] > running_end[:-1]
+    else:
+        new_group = starts[1:] >= running_end[:-1]
+    first = np.concatenate(([0], np.flatnonzero(new_group) + 1))
+    return starts[first], np.maximum.reduceat(ends, first)
+
+
+def pad(starts, ends, before, after, lo=None, hi=None):
+    """Expande cada intervalo (before no início, after no fim), limitado a [lo, hi]."""
+    starts, ends = starts - before, ends + after
+    if lo is not None: starts = np.maximum(starts, lo)
+    if hi is not None: ends = np.minimum(ends, hi)
+    return starts, ends
+
+
+def complement(starts, ends, lo, hi):
+    """Lacunas de um conjunto já unido (merge) dentro de [lo, hi]."""
+    gap_starts = np.concatenate(([lo], ends))
+    gap_ends = np.concatenate((starts, [hi]))
+    gap_starts, gap_ends = np.maximum(gap_starts, lo), np.minimum(gap_ends, hi)
+    keep = gap_ends > gap_starts
+    return gap_starts[keep], gap_ends[keep]
+
+
+def intersect(a_starts, a_ends, b_starts, b_ends):
+    """Interseção de dois conjuntos já unidos (ordenados e disjuntos)."""
+    first_b = np.searchsorted(b_ends, a_starts, side="right")
+    last_b = np.searchsorted(b_starts, a_ends, side="left")
+    counts = np.maximum(last_b - first_b, 0)
+    a_index = np.repeat(np.arange(len(a_starts)), counts)
+    # Índices de b para cada par: first_b do intervalo de a + deslocamento dentro do grupo
+    group_offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    b_index = np.repeat(first_b, counts) + group_offsets
+    starts = np.maximum(a_starts[a_index], b_starts[b_index])
+    ends = np.minimum(a_ends[a_index], b_ends[b_index])
+    keep = ends > starts
+    return starts[keep], ends[keep]
+
+
+def covers(starts, ends, points):
+    """Para cada ponto, True se ele cai em algum intervalo [start, end) de um conjunto já unido."""
+    index = np.searchsorted(starts, points, side="right") - 1
+    inside = index >= 0
+    inside[inside] = points[inside] < ends[index[inside]]
+    return inside
+
+
+def filter_min_length(starts, ends, min_length):
+    """Mantém só os intervalos com duração >= min_length."""
+    keep = (ends - starts) >= min_length
+    return starts[keep], ends[keep]
+
+
+def _sorted_unique(values):
+    # Equivale a np.unique, mas só com sort + diff (np.unique é bem mais lento em arrays grandes).
+    values = np.sort(values)
+    return values[np.concatenate(([True], values[1:] != values[:-1]))] if len(values) else values
+
+
+def union_labeled(layers, default_label, lo=None, hi=None, merge_adjacent=True):
+    """
+    Partição rotulada a partir de camadas [(starts, ends, rótulo), ...] em ordem de prioridade
+    (a primeira que cobre um trecho define o rótulo; trechos sem cobertura recebem default_label).
+    Cobre [lo, hi] (padrão: do menor ao maior limite). Com merge_adjacent=False, cada trecho
+    entre limites consecutivos é mantido, como nos scripts de EDL.
+    Retorna (starts, ends, labels), com labels também como array NumPy.
+    """
+    all_bounds = [np.asarray(s) for s, _, _ in layers] + [np.asarray(e) for _, e, _ in layers]
+    if lo is not None: all_bounds.append(np.asarray([lo]))
+    if hi is not None: all_bounds.append(np.asarray([hi]))
+    bounds = _sorted_unique(np.concatenate(all_bounds)) if all_bounds else np.zeros(0)
+    if lo is not None: bounds = bounds[bounds >= lo]
+    if hi is not None: bounds = bounds[bounds <= hi]
+    starts, ends = bounds[:-1], bounds[1:]
+
+    label_index = np.full(len(starts), len(layers))
+    for index in range(len(layers) - 1, -1, -1): # Da menor para a maior prioridade
+        layer_starts, layer_ends = merge(np.asarray(layers[index][0]), np.asarray(layers[index][1]))
+        # Nenhum limite cai dentro de um trecho elementar: cobrir o início é cobrir o trecho todo.
+        label_index[covers(layer_starts, layer_ends, starts)] = index
+
+    if merge_adjacent and len(starts) > 1:
+        change = label_index[1:] != label_index[:-1]
+        starts = starts[np.concatenate(([True], change))]
+        ends = ends[np.concatenate((change, [True]))]
+        label_index = label_index[np.concatenate(([True], change))]
+    label_names = np.asarray([label for _, _, label in layers] + [default_label])
+    return starts, ends, label_names[label_index]
+
+
+if __name__ == "__main__":
+    # Autoteste contra implementações diretas (laços em Python) com conjuntos aleatórios.
+    print("--- Testando pv_intervals.py diretamente ---")
+    rng = np.random.default_rng(0)
+
+    def random_set(n, span):
+        starts = np.sort(rng.integers(0, span, n))
+        return starts, starts + rng.integers(0, span // max(n, 1) + 5, n)
+
+    def naive_mask(starts, ends, span):
+        mask = np.zeros(span + 200, dtype=bool)
+        for s, e in zip(starts, ends): mask[s:e] = True
+        return mask
+
+    for _ in range(300):
+        span = int(rng.integers(50, 2000))
+        a_s, a_e = random_set(int(rng.integers(0, 30)), span)
+        b_s, b_e = random_set(int(rng.integers(0, 30)), span)
+        ma_s, ma_e = merge(a_s, a_e, join_touching=True)
+        mb_s, mb_e = merge(b_s, b_e, join_touching=True)
+        assert (naive_mask(ma_s, ma_e, span) == naive_mask(a_s, a_e, span)).all()
+        assert all(e1 < s2 for e1, s2 in zip(ma_e[:-1], ma_s[1:]))
+        i_s, i_e = intersect(ma_s, ma_e, mb_s, mb_e)
+        assert (naive_mask(i_s, i_e, span) == (naive_mask(a_s, a_e, span) & naive_mask(b_s, b_e, span))).all()
+        c_s, c_e = complement(ma_s, ma_e, 0, span)
+        assert (naive_mask(c_s, c_e, span)[:span] == ~naive_mask(a_s, a_e, span)[:span]).all()
+        u_s, u_e, labels = union_labeled([(a_s, a_e, "a"), (b_s, b_e, "b")], "-", 0, span)
+        assert u_s[0] == 0 and u_e[-1] == span and (u_s[1:] == u_e[:-1]).all()
+        for s, e, label in zip(u_s, u_e, labels):
+            expected = "a" if naive_mask(a_s, a_e, span)[s] else ("b" if naive_mask(b_s, b_e, span)[s] else "-")
+            assert label == expected
+
+    import time
+    big_s, big_e = random_set(200000, 10**9)
+    started = time.perf_counter()
+    m_s, m_e = merge(big_s, big_e)
+    complement(m_s, m_e, 0, 10**9)
+    intersect(m_s, m_e, *merge(*random_set(200000, 10**9)))
+    union_labeled([(big_s, big_e, "speech")], "silent", 0, 10**9)
+    print(f"  200k intervalos (merge + complement + intersect + union): {(time.perf_counter() - started) * 1000:.0f}ms")
+    print("OK")
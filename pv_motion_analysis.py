@@ -0,0 +1,154 @@
+# pv_motion_analysis.py
+import os
+import numpy as np
+import pv_intervals
+import pv_ffmpeg_runner
+
+# Vídeo reduzido usado na análise: poucos quadros por segundo, imagem minúscula em tons de cinza.
+# Basta para perceber uma tela que muda (digitação, rolagem, cursor) e é barato de decodificar/transferir.
+MOTION_FPS = 5
+MOTION_WIDTH, MOTION_HEIGHT = 64, 36
+# Diferença mínima (0-255) para um pixel contar como alterado; abaixo disso é ruído de compressão.
+PIXEL_DIFF_THRESHOLD = 6
+# Fração de pixels alterados entre dois quadros para o intervalo contar como "ativo".
+DEFAULT_MOTION_THRESHOLD = 0.002
+# Pausas de atividade mais curtas que isso são unidas (evita picotar um trecho de digitação).
+MOTION_MERGE_GAP_MS = 1000
+# Leitura do pipe em blocos de quadros para manter a memória constante.
+READ_BLOCK_FRAMES = 50
+
+
+def read_motion_activity(video_path, fps=MOTION_FPS, width=MOTION_WIDTH, height=MOTION_HEIGHT):
+    """
+    Decodifica o vídeo via FFmpeg (reduzido, cinza, rawvideo em stdout) em streaming e calcula,
+    para cada par de quadros consecutivos, a fração de pixels que mudou.
+    Retorna um array float32: activity[i] é a mudança entre os quadros i e i+1 (tempo i/fps).
+    Levanta RuntimeError se o FFmpeg falhar ou não houver vídeo.
+    """
+    command = ['ffmpeg', '-v', 'error', '-nostdin', '-i', video_path, '-an',
+               '-vf', f"fps={fps},scale={width}:{height},format=gray", '-f', 'rawvideo', '-']
+    frame_bytes = width * height
+    activity_parts = []
+
+    def read_frames(stream):
+        previous_frame = None
+        pending = b""
+        while True:
+            data = stream.read(frame_bytes * READ_BLOCK_FRAMES)
+            if not data: break
+            pending += data
+            usable = (len(pending) // frame_bytes) * frame_bytes
+            if usable == 0: continue
+            frames = np.frombuffer(pending[:usable], dtype=np.uint8).reshape(-1, frame_bytes).astype(np.int16)
+            pending = pending[usable:]
+            if previous_frame is not None: frames = np.vstack([previous_frame, frames])
+            if len(frames) > 1:
+                changed = np.abs(np.diff(frames, axis=0)) >= PIXEL_DIFF_THRESHOLD
+                activity_parts.append(np.mean(changed, axis=1).astype(np.float32))
+            previous_frame = frames[-1:]
+        return previous_frame
+
+    result = pv_ffmpeg_runner.run(command, label="movimento", stdout_handler=read_frames)
+    if result["returncode"] != 0:
+        raise RuntimeError(f"FFmpeg falhou ao decodificar o vídeo (código {result['returncode']}): {result['stderr_tail'][-400:]}")
+    if result["stdout_result"] is None:
+        raise RuntimeError("Nenhum quadro de vídeo decodificado.")
+    return np.concatenate(activity_parts) if activity_parts else np.zeros(0, dtype=np.float32)
+
+
+def active_ranges_ms(activity, fps=MOTION_FPS, motion_threshold=DEFAULT_MOTION_THRESHOLD,
+                     merge_gap_ms=MOTION_MERGE_GAP_MS):
+    """Converte a atividade por intervalo de quadros em trechos [início, fim] (ms) com a tela mudando."""
+    active = np.concatenate(([False], np.asarray(activity) >= motion_threshold, [False]))
+    edges = np.flatnonzero(np.diff(active.astype(np.int8)))
+    ranges = []
+    for start_frame, end_frame in zip(edges[0::2], edges[1::2]):
+        start_ms, end_ms = int(start_frame * 1000 / fps), int((end_frame + 1) * 1000 / fps)
+        if ranges and start_ms - ranges[-1][1] < merge_gap_ms:
+            ranges[-1][1] = end_ms
+        else:
+            ranges.append([start_ms, end_ms])
+    return ranges
+
+
+def analyze_source_motion(video_path, motion_threshold=DEFAULT_MOTION_THRESHOLD, cache_dir=None):
+    """
+    Análise de movimento feita uma única vez por fonte (roda em paralelo com a de áudio).
+    Se cache_dir for informado, a atividade é salva/reaproveitada ali (o limiar é reaplicado).
+    Retorna um dicionário com fps, activity e active_ranges_ms.
+    """
+    print(f"--- Análise de movimento da fonte '{os.path.basename(video_path)}' ---")
+    cache_path = None
+    if cache_dir:
+        base = os.path.splitext(os.path.basename(video_path))[0]
+        cache_path = os.path.join(cache_dir, f"motion_activity_{base}_{os.stat(video_path).st_size}_{MOTION_FPS}fps.npy")
+
+    if cache_path and os.path.isfile(cache_path):
+        print(f"  Atividade de vídeo já existe: {os.path.basename(cache_path)}. Reaproveitando.")
+        activity = np.load(cache_path)
+    else:
+        print(f"  Decodificando vídeo reduzido ({MOTION_WIDTH}x{MOTION_HEIGHT}, {MOTION_FPS}fps, cinza)...")
+        activity = read_motion_activity(video_path)
+        if cache_path:
+            os.makedirs(cache_dir, exist_ok=True)
+            np.save(cache_path, activity)
+
+    ranges = active_ranges_ms(activity, MOTION_FPS, motion_threshold)
+    print(f"  {len(ranges)} trechos com movimento em {len(activity) / MOTION_FPS:.1f}s de vídeo.")
+    return {"fps": MOTION_FPS, "activity": activity, "active_ranges_ms": ranges}
+
+
+def slice_motion(analysis, start_s, end_s):
+    """Recorta a análise de movimento para [start_s, end_s) de um chunk (tempos relativos ao chunk)."""
+    start_ms, end_ms = int(round(start_s * 1000)), int(round(end_s * 1000))
+    active_starts, active_ends = pv_intervals.intersect(*pv_intervals.as_arrays(analysis["active_ranges_ms"]),
+                                                       np.array([start_ms]), np.array([end_ms]))
+    ranges = pv_intervals.to_ranges(active_starts - start_ms, active_ends - start_ms)
+    first_frame, last_frame = int(start_s * analysis["fps"]), int(end_s * analysis["fps"])
+    return {"fps": analysis["fps"], "activity": analysis["activity"][first_frame:last_frame], "active_ranges_ms": ranges}
+
+
+def split_silent_by_motion(segments, active_ranges, min_piece_ms=MOTION_MERGE_GAP_MS):
+    """
+    Classifica os segmentos "silent" pelo movimento: os trechos em que a tela muda viram "code"
+    (silêncio com atividade, ex.: digitação) e o resto continua "silent" (silêncio parado).
+    Trechos "code" mais curtos que min_piece_ms são ignorados, e sobras de silêncio mais curtas
+    que isso nas bordas do segmento são absorvidas pelo "code" vizinho.
+    Retorna uma nova lista de segmentos, ordenada.
+    """
+    if not active_ranges or not any(seg["type"] == "silent" for seg in segments):
+        return [seg.copy() for seg in segments]
+    silent_starts, silent_ends = pv_intervals.as_arrays([[seg["start_ms"], seg["end_ms"]] for seg in segments if seg["type"] == "silent"])
+    active_starts, active_ends = pv_intervals.merge(*pv_intervals.as_arrays(active_ranges), join_touching=True)
+
+    code_starts, code_ends = pv_intervals.filter_min_length(
+        *pv_intervals.intersect(silent_starts, silent_ends, active_starts, active_ends), min_piece_ms)
+    # Segmento silencioso de cada trecho "code", para encostar o trecho nas bordas próximas
+    parent = np.searchsorted(silent_starts, code_starts, side="right") - 1
+    code_starts = np.where(code_starts - silent_starts[parent] < min_piece_ms, silent_starts[parent], code_starts)
+    code_ends = np.where(silent_ends[parent] - code_ends < min_piece_ms, silent_ends[parent], code_ends)
+
+    rest_starts, rest_ends = pv_intervals.intersect(
+        silent_starts, silent_ends, *pv_intervals.complement(code_starts, code_ends, silent_starts[0], silent_ends[-1]))
+    result = [seg.copy() for seg in segments if seg["type"] != "silent"]
+    result += [{"start_ms": s, "end_ms": e, "type": "code"} for s, e in pv_intervals.to_ranges(code_starts, code_ends)]
+    result += [{"start_ms": s, "end_ms": e, "type": "silent"} for s, e in pv_intervals.to_ranges(rest_starts, rest_ends)]
+    result.sort(key=lambda seg: seg["start_ms"])
+    return result
+
+
+if __name__ == "__main__":
+    # Autoteste com quadros sintéticos (não precisa de FFmpeg): tela parada, depois "digitação".
+    print("--- Testando pv_motion_analysis.py diretamente ---")
+    frames = np.zeros((50, MOTION_WIDTH * MOTION_HEIGHT), dtype=np.int16)
+    for i in range(20, 35): frames[i:, i * 10:(i * 10) + 8] = 200 # Um "caractere" novo por quadro
+    activity = np.mean(np.abs(np.diff(frames, axis=0)) >= PIXEL_DIFF_THRESHOLD, axis=1)
+    ranges = active_ranges_ms(activity)
+    print(f"  Trechos ativos: {ranges}")
+    assert ranges == [[3800, 7000]], ranges
+    segments = [{"start_ms": 0, "end_ms": 2000, "type": "speech"}, {"start_ms": 2000, "end_ms": 10000, "type": "silent"}]
+    split = split_silent_by_motion(segments, ranges)
+    print(f"  Segmentos: {[(s['start_ms'], s['end_ms'], s['type']) for s in split]}")
+    assert [s["type"] for s in split] == ["speech", "silent", "code", "silent"]
+    assert all(a["end_ms"] == b["start_ms"] for a, b in zip(split, split[1:]))
+    print("OK")
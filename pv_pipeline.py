@@ -0,0 +1,711 @@
+# pv_pipeline.py
+"""
+Motor do processamento (Etapas 0 a 3) como API Python, usado por pv-process.py e pv_gui.py e
+embutível em outros programas:
+
+    config = pv_pipeline.PipelineConfig(source_files=["aula.mp4"], destination="aula_rapida.mp4")
+    result = pv_pipeline.Pipeline(config, on_event=..., on_progress=..., cancel_token=token).run()
+
+on_event(evento, dados) recebe cada evento do diário da execução (pv_run_journal) assim que ele é
+gravado; on_progress(progresso) recebe as barras de progresso ({stage, done, total, detail,
+overall}) no lugar das linhas ##PROGRESS## (--progress-json); cancel_token (CancelToken) pausa, retoma
+ou cancela a execução (os FFmpeg em andamento recebem o sinal). run() retorna o resumo final
+(o "final_output_summary" do log).
+A configuração do pv_ffmpeg_runner, as estatísticas dele e o destino do progresso são do
+processo: rode um Pipeline por vez em cada processo (a GUI usa um processo por trabalho).
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import signal
+import argparse
+import datetime
+import threading
+import dataclasses
+from dataclasses import dataclass, field
+from typing import List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+
+import pv_utils
+import pv_audio_analysis
+import pv_motion_analysis
+import pv_encoder_profiles
+import pv_ffmpeg_runner
+import pv_temp_storage
+import pv_speed_map
+import pv_segment_index
+import pv_run_journal
+import pv_resource_sampler
+import pv_step_00_divide_in_chunks as step0
+import pv_step_01_audio_segment as step1
+import pv_step_02_silent_accelerator as step2
+import pv_step_03_segment_join as step3
+
+
+@dataclass
+class PipelineConfig:
+    """Parâmetros de uma execução: os mesmos campos (e padrões) das opções de pv-process.py."""
+    source_files: List[str] = field(default_factory=list)
+    destination: Optional[str] = None
+    chunk_size: Union[int, str] = 500 # MB, 0 (sem divisão) ou step0.AUTO_CHUNK_SIZE
+    chunk_memory: int = 0
+    chunk_cut_tolerance: float = 30.0
+    analysis_jobs: int = 0
+    min_silence_len: int = 2000
+    silence_thresh: int = -35
+    detector: str = "envelope"
+    exact_silence_detection: bool = False
+    motion: bool = False
+    motion_threshold: float = pv_motion_analysis.DEFAULT_MOTION_THRESHOLD
+    speech_padding_start: int = 500
+    speech_padding_end: int = 500
+    fade: bool = False
+    fade_duration: int = 20
+    min_silent_speedup_duration: int = 1500
+    speedup_factor: int = 4
+    speed_map: Optional[str] = None
+    jobs: Optional[int] = None
+    threads: Optional[int] = None
+    cut_profile: str = pv_encoder_profiles.DEFAULT_STAGE_PROFILES["cut"]
+    accel_profile: str = pv_encoder_profiles.DEFAULT_STAGE_PROFILES["accelerate"]
+    proxy: bool = False
+    proxy_keyframes_only: bool = False
+    join_only: bool = False
+    keep_temp_dirs: bool = False
+    temp_root: Optional[str] = None
+    temp_budget: int = 0
+    clean_start: bool = False
+    ffmpeg_timeout: int = 0
+    ffmpeg_retries: int = 1
+    resource_interval: float = pv_resource_sampler.DEFAULT_INTERVAL_S
+
+
+def chunk_size_arg(text):
+    """Tipo argparse de --chunk-size: inteiro (MB) ou 'auto'."""
+    if text == step0.AUTO_CHUNK_SIZE: return text
+    try: return int(text)
+    except ValueError: raise argparse.ArgumentTypeError(f"use um número de MB ou '{step0.AUTO_CHUNK_SIZE}': {text!r}")
+
+
+def build_arg_parser():
+    """Parser das opções de linha de comando (pv-process.py); os padrões vêm de PipelineConfig."""
+    d = PipelineConfig
+    parser = argparse.ArgumentParser(
+        description="Processa e une vídeos, acelerando partes silenciosas.",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("-d", "--destination", type=str, help="Caminho do arquivo de vídeo final.")
+    parser.add_argument("-s", "--source-files", nargs='+', required=True, help="Um ou mais arquivos de vídeo de origem.")
+    parser.add_argument("--chunk-size", type=chunk_size_arg, default=d.chunk_size, help="Tamanho máx. do chunk em MB. 0 para desativar. 'auto' escolhe o número e a duração dos chunks pela resolução/bitrate da fonte, pelos workers e pela memória.")
+    parser.add_argument("--chunk-memory", type=int, default=d.chunk_memory, help="Orçamento de memória (MB) do --chunk-size auto. 0 = metade da memória livre.")
+    parser.add_argument("--chunk-cut-tolerance", type=float, default=d.chunk_cut_tolerance, help="Distância máx. (s) para mover um corte de chunk até um silêncio.")
+    parser.add_argument("--analysis-jobs", type=int, default=d.analysis_jobs, help="Faixas de áudio decodificadas em paralelo na análise. 0 = nº de CPUs.")
+    parser.add_argument("-m", "--min-silence-len", type=int, default=d.min_silence_len, help="Duração mínima do silêncio em ms.")
+    parser.add_argument("-t", "--silence-thresh", type=int, default=d.silence_thresh, help="Limiar de silêncio em dBFS.")
+    parser.add_argument("--detector", choices=["envelope", "ffmpeg", "pydub"], default=d.detector, help="Detector de silêncio: envelope (NumPy, uma vez por fonte), ffmpeg (silencedetect em streaming, memória constante) ou pydub (por chunk, WAV em memória).")
+    parser.add_argument("--exact-silence-detection", action="store_true", help="Avalia todas as posições de 1ms na detecção de silêncio (sem a passada grossa).")
+    parser.add_argument("--motion", action="store_true", help="Analisa o movimento da tela junto com o áudio: silêncios com a tela mudando viram 'code' e não são acelerados.")
+    parser.add_argument("--motion-threshold", type=float, default=d.motion_threshold, help="Fração de pixels alterados entre quadros para contar como movimento.")
+    parser.add_argument("-p", "--speech-padding-start", type=int, default=d.speech_padding_start, help="Padding em ms para o INÍCIO da fala.")
+    parser.add_argument("--speech-padding-end", type=int, default=d.speech_padding_end, help="Padding em ms para o FIM da fala.")
+    parser.add_argument("--fade", action='store_true', help="Aplicar fades de áudio nos segmentos.")
+    parser.add_argument("--fade-duration", type=int, default=d.fade_duration, help="Duração de cada fade (in e out) em ms.")
+    parser.add_argument("-k", "--min-silent-speedup-duration", type=int, default=d.min_silent_speedup_duration, help="Duração mínima do silêncio (ms) para acelerar.")
+    parser.add_argument("-v", "--speedup-factor", type=int, default=d.speedup_factor, help="Fator de aceleração.")
+    parser.add_argument("--speed-map", type=str, default=d.speed_map, help="Fator por classe de segmento, ex.: 'speech=1,code=8,silent=0' (0 descarta o trecho). Classes omitidas: speech=1, code=1, silent=--speedup-factor.")
+    parser.add_argument("--jobs", type=int, default=d.jobs, help="Acelerações (Etapa 2) executadas em paralelo com os cortes da Etapa 1. Padrão: resultado do --autotune ou 2.")
+    parser.add_argument("--threads", type=int, default=d.threads, help="Threads por processo FFmpeg de codificação. Padrão: resultado do --autotune ou o do perfil.")
+    parser.add_argument("--cut-profile", choices=sorted(pv_encoder_profiles.ENCODER_PROFILES), default=d.cut_profile, help="Perfil de codificação dos cortes (Etapa 1).")
+    parser.add_argument("--accel-profile", choices=sorted(pv_encoder_profiles.ENCODER_PROFILES), default=d.accel_profile, help="Perfil de codificação das acelerações (Etapa 2).")
+    parser.add_argument("--proxy", action="store_true", help="Gera só uma prévia leve (perfil 'proxy': 360p/15fps) em '<destino>_proxy', com os mesmos cortes e velocidades, reaproveitando as análises da pasta temporária do destino.")
+    parser.add_argument("--proxy-keyframes-only", action="store_true", help="Com --proxy, decodifica só os keyframes da fonte nos cortes (mais rápido, movimento aos saltos).")
+    parser.add_argument("--progress-json", action="store_true", help=f"Imprime o progresso como linhas '{pv_utils.PROGRESS_PREFIX.strip()} {{json}}' (para outro programa ler da saída). Também: {pv_utils.PROGRESS_JSON_ENV}=1.")
+    parser.add_argument("--autotune", action="store_true", help="Mede a melhor divisão jobs x threads com uma amostra do primeiro arquivo de origem, salva para este host e sai.")
+    parser.add_argument("-j", "--join-only", action="store_true", help="Modo apenas junção.")
+    parser.add_argument("--keep-temp-dirs", action="store_true", help="Não apaga diretórios temporários (nem os intermediários já consumidos durante a execução).")
+    parser.add_argument("--temp-root", type=str, default=d.temp_root, help="Diretório onde criar a pasta temporária (ex.: tmpfs ou SSD). Padrão: pasta do destino.")
+    parser.add_argument("--temp-budget", type=int, default=d.temp_budget, help="Espaço máx. em MB da pasta temporária; trabalho novo espera enquanto estiver acima. 0 = ilimitado.")
+    parser.add_argument("--clean-start", action="store_true", help="Força uma execução limpa.")
+    parser.add_argument("--ffmpeg-timeout", type=int, default=d.ffmpeg_timeout, help="Tempo máx. (s) de cada chamada FFmpeg/FFprobe; ao estourar, o processo é encerrado e repetido. 0 = sem limite.")
+    parser.add_argument("--ffmpeg-retries", type=int, default=d.ffmpeg_retries, help="Novas tentativas de uma chamada FFmpeg após tempo esgotado ou erro transitório.")
+    parser.add_argument("--resource-interval", type=float, default=d.resource_interval, help="Intervalo (s) da amostragem de CPU, memória e disco do processo e dos FFmpeg (/proc, só Linux), registrada no log. 0 = desativada.")
+    return parser
+
+
+def config_from_args(args):
+    """PipelineConfig a partir do Namespace de build_arg_parser (opções que não são da execução, como --autotune, ficam de fora)."""
+    return PipelineConfig(**{f.name: getattr(args, f.name) for f in dataclasses.fields(PipelineConfig)})
+
+
+def parse_config(argv):
+    """PipelineConfig a partir de uma lista de argumentos de linha de comando. Levanta ValueError se inválida."""
+    def raise_error(message): raise ValueError(message) # No lugar do sys.exit do argparse (uso embutido)
+    parser = build_arg_parser()
+    parser.error = raise_error
+    return config_from_args(parser.parse_args(argv))
+
+
+def format_time_delta(total_seconds):
+    if total_seconds is None: total_seconds = 0
+    total_seconds = int(round(total_seconds))
+    hours, remainder = divmod(total_seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def generate_default_output_filename(num_source_files, now_dt):
+    timestamp_str = now_dt.strftime("%d.%m.%Y.%H.%M.%S")
+    num_files_str = f"{num_source_files:02d}"
+    return f"video-join-{num_files_str}-{timestamp_str}.mp4"
+
+
+class PipelineCancelled(Exception):
+    """Levantada nos pontos de verificação (CancelToken.checkpoint) depois de um cancelamento."""
+
+
+class CancelToken:
+    """
+    Pausa, retoma e cancela um Pipeline de outra thread. O trabalho novo para nos pontos de
+    verificação (antes de cada chunk, corte e aceleração); os FFmpeg em andamento deste processo
+    recebem SIGSTOP/SIGCONT (pausa, fora do Windows) ou são encerrados (cancelamento).
+    """
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self.resume() # Um FFmpeg parado não trata o término
+        pv_ffmpeg_runner.signal_active_processes(signal.SIGTERM)
+
+    def pause(self):
+        self._running.clear()
+        if hasattr(signal, "SIGSTOP"): pv_ffmpeg_runner.signal_active_processes(signal.SIGSTOP)
+
+    def resume(self):
+        if hasattr(signal, "SIGCONT"): pv_ffmpeg_runner.signal_active_processes(signal.SIGCONT)
+        self._running.set()
+
+    def checkpoint(self):
+        """Bloqueia enquanto pausado; levanta PipelineCancelled se cancelado."""
+        self._running.wait()
+        if self._cancelled.is_set(): raise PipelineCancelled()
+
+
+class Pipeline:
+    """Uma execução completa (Etapas 0 a 3, ou só a junção) para a configuração dada."""
+
+    def __init__(self, config, on_event=None, on_progress=None, cancel_token=None):
+        self.config = dataclasses.replace(config, source_files=list(config.source_files)) # run() completa a cópia (destino, jobs...)
+        self.on_event = on_event
+        self.on_progress = on_progress
+        self.cancel_token = cancel_token or CancelToken()
+        self.journal = None
+        self.sampler = None
+        # Levanta ValueError já na criação, antes de qualquer trabalho
+        self.speed_map = pv_speed_map.parse_speed_map(self.config.speed_map, pv_speed_map.default_speed_map(self.config.speedup_factor))
+        if not self.config.source_files: raise ValueError("Nenhum arquivo de origem informado.")
+
+    def run(self):
+        """Executa tudo e retorna o resumo final (status, destino, tamanhos, durações e economias)."""
+        previous_listener = pv_utils.set_progress_listener(self.on_progress) if self.on_progress else None
+        try:
+            self._prepare()
+            try:
+                if self.config.join_only: self._collect_join_only_sources()
+                else: self._process_sources()
+                self._join()
+            except PipelineCancelled:
+                print("\n--- Execução cancelada ---")
+                self.final_status = "CANCELADO"
+            return self._finish()
+        finally:
+            if self.sampler: self.sampler.stop()
+            if self.journal: self.journal.close()
+            if self.on_progress: pv_utils.set_progress_listener(previous_listener)
+
+    def _prepare(self):
+        config = self.config
+        pv_ffmpeg_runner.configure(timeout_s=config.ffmpeg_timeout, retries=config.ffmpeg_retries)
+        pv_ffmpeg_runner.reset_stats()
+
+        tuned = pv_encoder_profiles.load_autotune_result(config.accel_profile)
+        if config.jobs is None: config.jobs = tuned["jobs"] if tuned else 2
+        if config.threads is None and tuned: config.threads = tuned["threads"]
+        if config.proxy: # Mesmo plano, outra codificação: os perfis escolhidos dão lugar ao de prévia
+            config.cut_profile = config.accel_profile = "proxy"
+        self.cut_profile = pv_encoder_profiles.get_profile(config.cut_profile, config.threads)
+        self.accel_profile = pv_encoder_profiles.get_profile(config.accel_profile, config.threads)
+        if config.proxy and config.proxy_keyframes_only: self.cut_profile["keyframes_only"] = True
+        print(f"Codificação: cortes '{config.cut_profile}', acelerações '{config.accel_profile}', {config.jobs} jobs x {config.threads or 'auto'} threads" +
+              (" (autotune)" if tuned else "") + (" (só keyframes da fonte)" if self.cut_profile.get("keyframes_only") else ""))
+        print(f"Velocidades por classe: {pv_speed_map.format_speed_map(self.speed_map)}")
+        self.processing_start_dt = datetime.datetime.now()
+        self.start_time_perf = time.perf_counter()
+
+        if not config.destination:
+            config.destination = generate_default_output_filename(len(config.source_files), self.processing_start_dt)
+        config.destination = os.path.abspath(config.destination)
+        os.makedirs(os.path.dirname(config.destination), exist_ok=True)
+        # A pasta temporária é sempre a do destino completo: a prévia e o render final dividem
+        # as análises e os chunks; só os segmentos codificados ficam em pastas separadas.
+        self.plan_destination = config.destination
+        self.segment_dir_prefix = "segments_"
+        if config.proxy:
+            dest_root, dest_ext = os.path.splitext(config.destination)
+            config.destination = f"{dest_root}_proxy{dest_ext}"
+            self.segment_dir_prefix = "segments_proxy_"
+        print(f"Arquivo de destino final: {config.destination}" + (" (prévia)" if config.proxy else ""))
+
+        # Cada evento vai para o diário JSONL na hora; o _processing_log.json é gerado dele no final.
+        self.journal = pv_run_journal.RunJournal(pv_run_journal.journal_path_for(config.destination), fresh=config.clean_start,
+                                                 on_event=self.on_event)
+        finished_before = [c for c in self.journal.previous["chunks"].values() if c.get("status") == "Sucesso"]
+        if finished_before:
+            print(f"INFO: O diário da execução anterior registra {len(finished_before)} chunks concluídos ({self.journal.path}).")
+        self.journal.append("run_start", parameters_used=dataclasses.asdict(config), processing_start_datetime=self.processing_start_dt.isoformat())
+        self.final_status = "NÃO INICIADO"
+        self.temp_storage_stats = None
+        self.join_paths = []
+        self.expected_join_duration_s = 0.0 # Duração prevista da saída, para o percentual da junção
+        self.main_temp_dir = None
+        if config.resource_interval > 0 and pv_resource_sampler.available():
+            self.sampler = pv_resource_sampler.ResourceSampler(config.resource_interval).start()
+
+    def _collect_join_only_sources(self):
+        print("INFO: Modo --join-only ativado. Unindo arquivos de origem diretamente...")
+        for src_path in self.config.source_files:
+            abs_path = os.path.abspath(src_path)
+            if os.path.isfile(abs_path):
+                self.join_paths.append(abs_path)
+            else:
+                print(f"AVISO: Arquivo para junção direta não encontrado: {abs_path}. Pulando.")
+
+    def _remove_chunk_segments(self, chunk_path):
+        """Apaga os segmentos (índice, "_silent" e "_faster") cortados de um chunk, da prévia e do render completo."""
+        chunk_base = os.path.splitext(os.path.basename(chunk_path))[0]
+        for prefix in ("segments_", "segments_proxy_"):
+            segment_dir = os.path.join(self.main_temp_dir, f"{prefix}{chunk_base}")
+            if os.path.isdir(segment_dir):
+                print(f"  Removendo segmentos de um plano de chunks anterior: {os.path.basename(segment_dir)}")
+                shutil.rmtree(segment_dir)
+
+    def _process_sources(self):
+        config, journal, token = self.config, self.journal, self.cancel_token
+        speed_map, cut_profile, accel_profile = self.speed_map, self.cut_profile, self.accel_profile
+        dest_basename = os.path.splitext(os.path.basename(self.plan_destination))[0]
+        temp_parent_dir = os.path.abspath(config.temp_root) if config.temp_root else os.path.dirname(self.plan_destination)
+        main_temp_dir = self.main_temp_dir = os.path.join(temp_parent_dir, f"{dest_basename}_temp_files")
+
+        if config.clean_start and os.path.exists(main_temp_dir):
+            print(f"INFO: --clean-start usado. Removendo diretório temporário: {main_temp_dir}")
+            try: shutil.rmtree(main_temp_dir)
+            except Exception as e: print(f"AVISO: Falha ao remover diretório temporário antigo: {e}")
+
+        os.makedirs(main_temp_dir, exist_ok=True)
+        print(f"Usando diretório temporário persistente: {main_temp_dir}")
+        # Intermediários consumidos (chunks já segmentados, "_silent" já acelerados) são apagados na hora.
+        temp_storage = pv_temp_storage.TempStorage(main_temp_dir, config.temp_budget, eager_cleanup=not config.keep_temp_dirs)
+        if config.temp_budget: print(f"Orçamento da pasta temporária: {config.temp_budget}MB")
+        partial_count = temp_storage.remove_partial_files(pv_ffmpeg_runner.PARTIAL_SUFFIX + ".")
+        if partial_count: print(f"INFO: {partial_count} saídas incompletas de uma execução interrompida foram apagadas.")
+
+        all_chunks_to_process = []
+        original_source_map = {}
+        chunk_plan = {}
+        chunk_audio_analysis = {}
+        chunk_motion_analysis = {}
+        motion_executor = ThreadPoolExecutor(max_workers=1) if config.motion else None
+
+        for source_video_path in config.source_files:
+            token.checkpoint()
+            abs_source_path = os.path.abspath(source_video_path)
+            source_info = pv_utils.get_extended_video_info(abs_source_path)
+            token.checkpoint() # Um ffprobe/análise interrompido pelo cancelamento não vira erro da fonte
+            source_file_log_entry = {"source_filepath": abs_source_path, "original_video_info": source_info}
+
+            if not source_info.get("exists"):
+                journal.append("source", error="Arquivo de origem não encontrado.", **source_file_log_entry)
+                print(f"ERRO: Arquivo de origem '{abs_source_path}' não encontrado. Pulando."); continue
+
+            # Análise de áudio feita uma vez por fonte; as Etapas 0 e 1 recebem só os recortes.
+            # A de movimento (vídeo) roda ao mesmo tempo, em outra thread.
+            motion_future = motion_executor.submit(pv_motion_analysis.analyze_source_motion, abs_source_path,
+                                                   config.motion_threshold, main_temp_dir) if motion_executor else None
+            source_analysis = None
+            if config.detector != "pydub":
+                try:
+                    source_analysis = pv_audio_analysis.analyze_source_audio(
+                        abs_source_path, config.min_silence_len, config.silence_thresh, cache_dir=main_temp_dir,
+                        jobs=config.analysis_jobs or os.cpu_count() or 1, duration_s=source_info.get("duration_s"),
+                        coarse_hop_ms=None if config.exact_silence_detection else pv_audio_analysis.DEFAULT_COARSE_HOP_MS,
+                        detector=config.detector)
+                except Exception as e:
+                    print(f"AVISO: Análise de áudio da fonte falhou ({e}). Cada chunk fará sua própria análise.")
+            source_file_log_entry["audio_analysis"] = {"silent_ranges_count": len(source_analysis["silent_ranges_ms"])} if source_analysis else None
+            source_motion = None
+            if motion_future:
+                try: source_motion = motion_future.result()
+                except Exception as e: print(f"AVISO: Análise de movimento da fonte falhou ({e}). Silêncios não serão separados por movimento.")
+                source_file_log_entry["motion_analysis"] = {"active_ranges_count": len(source_motion["active_ranges_ms"])} if source_motion else None
+            token.checkpoint()
+            journal.append("source", **source_file_log_entry)
+
+            # Etapa 0 só planeja aqui; cada chunk é criado logo antes de ser processado (ver create_chunk).
+            if config.chunk_size == step0.AUTO_CHUNK_SIZE or config.chunk_size > 0:
+                chunk_output_dir = os.path.join(main_temp_dir, f"chunks_{os.path.splitext(os.path.basename(abs_source_path))[0]}")
+                chunk_entries = step0.plan_chunks(abs_source_path, chunk_output_dir, config.chunk_size,
+                                                  silent_ranges_ms=source_analysis["silent_ranges_ms"] if source_analysis else None,
+                                                  cut_tolerance_s=config.chunk_cut_tolerance,
+                                                  workers=min(config.jobs, os.cpu_count() or 1), memory_budget_mb=config.chunk_memory,
+                                                  invalidate_chunk=self._remove_chunk_segments)
+            else:
+                chunk_entries = [{"path": abs_source_path, "start_s": 0.0, "end_s": source_info.get("duration_s", 0.0)}]
+
+            if chunk_entries:
+                for chunk_index, chunk in enumerate(chunk_entries):
+                    chunk_path = chunk["path"]
+                    all_chunks_to_process.append(chunk_path)
+                    original_source_map[chunk_path] = abs_source_path
+                    chunk_plan[chunk_path] = (chunk, chunk_index == len(chunk_entries) - 1)
+                    if source_analysis:
+                        chunk_audio_analysis[chunk_path] = pv_audio_analysis.slice_analysis(source_analysis, chunk["start_s"], chunk["end_s"])
+                    if source_motion:
+                        chunk_motion_analysis[chunk_path] = pv_motion_analysis.slice_motion(source_motion, chunk["start_s"], chunk["end_s"])
+                    journal.append("chunk_planned", source_filepath=abs_source_path, chunk_path=chunk_path)
+            else:
+                journal.append("source", source_filepath=abs_source_path, error="Falha na Etapa 0 (divisão em chunks).")
+        if motion_executor: motion_executor.shutdown()
+
+        # Etapa 2 em um pool próprio: cada segmento silencioso é acelerado assim que a Etapa 1 o corta,
+        # e os cortes do próximo chunk continuam enquanto as acelerações do anterior terminam.
+        accel_executor = ThreadPoolExecutor(max_workers=max(1, config.jobs))
+        pending_chunks = []
+
+        def accelerate_and_release(seg_data, segment_dir, fps):
+            token.checkpoint()
+            status, output_path = step2.accelerate_segment(
+                seg_data, segment_dir, config.min_silent_speedup_duration / 1000.0, config.speedup_factor, fps, accel_profile, speed_map)
+            # O "_silent" só é apagado depois que o "_faster" correspondente é lido com duração válida.
+            silent_path = os.path.join(segment_dir, seg_data["file"]) if seg_data.get("file") else None
+            if status == "processed": temp_storage.add_written(output_path)
+            if (temp_storage.eager_cleanup and status in ("processed", "already_exists") and silent_path and os.path.isfile(silent_path)
+                    and pv_utils.get_extended_video_info(output_path).get("duration_s", 0) > 0):
+                temp_storage.release(silent_path, f"substituído por '{os.path.basename(output_path)}'")
+            return status, output_path
+
+        def wait_before_cut():
+            token.checkpoint()
+            temp_storage.wait_for_budget()
+
+        def acceleration_submitter(segment_dir, fps, futures):
+            # on_segment_ready da Etapa 1 (ou carga do índice numa retomada): cada segmento segue para a Etapa 2.
+            # Sem fps (chunk ainda não criado ou já apagado), vale o fps gravado no segmento.
+            def submit(seg_data):
+                futures.append((seg_data, temp_storage.track(accel_executor.submit(
+                    accelerate_and_release, seg_data, segment_dir, fps or seg_data.get("fps") or 60.0))))
+            return submit
+
+        def segment_chunk(video_chunk_path, segment_dir, on_segment_ready):
+            """Etapas 0 e 1 de um chunk. Retorna o índice colunar, ou None se falhar (já registrado no diário)."""
+            chunk, is_last_chunk = chunk_plan[video_chunk_path]
+            temp_storage.wait_for_budget()
+            original_source = original_source_map.get(video_chunk_path, video_chunk_path)
+            if not step0.create_chunk(original_source, chunk, is_last_chunk):
+                journal.append("chunk_failed", chunk_path=video_chunk_path, error="Falha na Etapa 0 (criação do chunk).")
+                return None
+            if video_chunk_path != original_source: temp_storage.add_written(video_chunk_path)
+
+            def on_cut(seg_data): # Cada corte gravado conta para o orçamento antes da próxima espera
+                if seg_data.get("file"): temp_storage.add_written(os.path.join(segment_dir, seg_data["file"]))
+                on_segment_ready(seg_data)
+            try:
+                segmentation = step1.segment_video(
+                    video_path_param=video_chunk_path, output_dir=segment_dir,
+                    json_file_name="sound_index.json",
+                    min_silence_len_ms=config.min_silence_len,
+                    silence_thresh_dbfs=config.silence_thresh,
+                    speech_start_padding_ms=config.speech_padding_start,
+                    speech_end_padding_ms=config.speech_padding_end,
+                    apply_fade=config.fade,
+                    fade_duration_ms=config.fade_duration,
+                    audio_analysis=chunk_audio_analysis.get(video_chunk_path),
+                    motion_analysis=chunk_motion_analysis.get(video_chunk_path),
+                    min_silent_speedup_ms=config.min_silent_speedup_duration,
+                    on_segment_ready=on_cut,
+                    wait_for_resources=wait_before_cut,
+                    speed_map=speed_map,
+                    detector="ffmpeg" if config.detector == "ffmpeg" else "pydub",
+                    encoder_profile=cut_profile
+                )
+                if segmentation is None: raise Exception("Falha na Etapa 1 (segmentação).")
+                return pv_segment_index.read_index(segment_dir) # Colunar (mmap) no lugar da lista
+            except PipelineCancelled:
+                raise
+            except Exception as e:
+                print(f"ERRO ao processar chunk '{os.path.basename(video_chunk_path)}': {e}")
+                journal.append("chunk_failed", chunk_path=video_chunk_path, error=str(e))
+                return None
+
+        def record_segmented(video_chunk_path, segment_dir, segments_s1):
+            journal.append("chunk_segmented", chunk_path=video_chunk_path, segment_count=len(segments_s1[0]),
+                           segment_index=os.path.join(segment_dir, pv_segment_index.SEGMENT_TABLE_NAME),
+                           segmentation_summary=pv_segment_index.summarize(segments_s1[0]))
+            if video_chunk_path != original_source_map.get(video_chunk_path, video_chunk_path): # Todos os segmentos do chunk já foram cortados
+                temp_storage.release(video_chunk_path, "segmentado")
+
+        def missing_sources(results):
+            # "missing" de um segmento com arquivo: nem o "_faster" válido nem o "_silent" de origem existem mais.
+            return [seg_data["file"] for seg_data, status, _ in results if status == "missing" and seg_data.get("file")]
+
+        completed = False
+        try:
+            for i, video_chunk_path in enumerate(all_chunks_to_process):
+                token.checkpoint()
+                print(f"\n--- Processando Chunk {i+1}/{len(all_chunks_to_process)}: {os.path.basename(video_chunk_path)} ---")
+                pv_utils.print_progress("Chunks", i, len(all_chunks_to_process), os.path.basename(video_chunk_path), overall=True)
+
+                current_chunk_segment_dir = os.path.join(main_temp_dir, f"{self.segment_dir_prefix}{os.path.splitext(os.path.basename(video_chunk_path))[0]}")
+
+                expected_json_path_s1 = os.path.join(current_chunk_segment_dir, "sound_index.json")
+                segments_s1 = None
+                accel_futures = []
+                # Em uma retomada o chunk pode já ter sido apagado; nesse caso vale o fps gravado no índice.
+                fps_para_aceleracao = pv_utils.get_extended_video_info(video_chunk_path).get("fps") if os.path.isfile(video_chunk_path) else None
+                submit_acceleration = acceleration_submitter(current_chunk_segment_dir, fps_para_aceleracao, accel_futures)
+
+                if not config.clean_start and (pv_segment_index.has_index(current_chunk_segment_dir) or os.path.isfile(expected_json_path_s1)):
+                    print(f"  Etapa 1: Índice já existe para este chunk. Carregando segmentos existentes.")
+                    try:
+                        segments_s1 = pv_segment_index.read_index(current_chunk_segment_dir)
+                        for seg_data in pv_segment_index.iter_records(*segments_s1): submit_acceleration(seg_data)
+                    except Exception as e:
+                        print(f"  AVISO: Falha ao carregar JSON existente. Re-executando a segmentação. Erro: {e}")
+                        segments_s1 = None
+
+                if segments_s1 is None:
+                    segments_s1 = segment_chunk(video_chunk_path, current_chunk_segment_dir, submit_acceleration)
+                    if segments_s1 is None: continue
+
+                chunk_audio_analysis.pop(video_chunk_path, None) # Libera o recorte do envelope deste chunk
+                chunk_motion_analysis.pop(video_chunk_path, None)
+                record_segmented(video_chunk_path, current_chunk_segment_dir, segments_s1)
+                pending_chunks.append((video_chunk_path, current_chunk_segment_dir, segments_s1, accel_futures))
+
+            # Coleta os resultados da Etapa 2 na ordem dos chunks para montar a lista de junção.
+            pv_utils.print_progress("Chunks", len(all_chunks_to_process), len(all_chunks_to_process), "aguardando acelerações", overall=True)
+            for chunk_number, (video_chunk_path, current_chunk_segment_dir, segments_s1, accel_futures) in enumerate(pending_chunks, 1):
+                pv_utils.print_progress("Etapa 2: acelerações", chunk_number - 1, len(pending_chunks), os.path.basename(video_chunk_path))
+                results = [(seg_data, *future.result()) for seg_data, future in accel_futures]
+                # Numa retomada, um "_faster" inválido cujo "_silent" já foi apagado pela limpeza antecipada não
+                # tem como ser refeito: o chunk é segmentado de novo, em vez de mandar um arquivo inexistente para a junção.
+                if missing_sources(results):
+                    print(f"  AVISO: {len(missing_sources(results))} segmento(s) de '{os.path.basename(video_chunk_path)}' sem arquivo de origem. "
+                          "Segmentando o chunk novamente.")
+                    shutil.rmtree(current_chunk_segment_dir, ignore_errors=True)
+                    accel_futures = []
+                    segments_s1 = segment_chunk(video_chunk_path, current_chunk_segment_dir,
+                                                acceleration_submitter(current_chunk_segment_dir, None, accel_futures))
+                    if segments_s1 is None: continue
+                    record_segmented(video_chunk_path, current_chunk_segment_dir, segments_s1)
+                    results = [(seg_data, *future.result()) for seg_data, future in accel_futures]
+                    if missing_sources(results):
+                        journal.append("chunk_failed", chunk_path=video_chunk_path,
+                                       error=f"Segmentos sem arquivo após nova segmentação: {', '.join(missing_sources(results)[:5])}")
+                        continue
+                accel_summary_s2 = step2.new_result_summary()
+                for result in results:
+                    step2.add_to_summary(accel_summary_s2, *result)
+                print(f"\nChunk '{os.path.basename(video_chunk_path)}':")
+                step2.print_summary(accel_summary_s2)
+
+                for seg_data in pv_segment_index.iter_records(*segments_s1):
+                    original_file = seg_data["file"]
+                    if not original_file: continue # Descartado pelo mapa de velocidades
+                    file_to_add = original_file
+                    if accel_summary_s2["created_files_map"].get(original_file):
+                        file_to_add = os.path.basename(accel_summary_s2["created_files_map"][original_file])
+                    self.join_paths.append(os.path.join(current_chunk_segment_dir, file_to_add))
+                self.expected_join_duration_s += journal.chunk(video_chunk_path)["segmentation_summary"]["output_duration_s"]
+                # O mapa de arquivos criados fica só na memória desta etapa; o diário guarda as contagens.
+                journal.append("chunk_done", chunk_path=video_chunk_path,
+                               acceleration_summary={k: v for k, v in accel_summary_s2.items() if k != "created_files_map"})
+            completed = True
+        finally:
+            # Num cancelamento ou erro, as acelerações ainda na fila nem começam; as que já estão rodando
+            # terminam antes de o erro seguir adiante (nada continua gravando na pasta depois da falha).
+            accel_executor.shutdown(wait=True, cancel_futures=token.cancelled or not completed)
+            self.temp_storage_stats = temp_storage.stats()
+        print(f"\nPasta temporária: {self.temp_storage_stats['final_usage_bytes'] / (1024*1024):.0f}MB ao final, "
+              f"{temp_storage.freed_files} intermediários apagados ({temp_storage.freed_bytes / (1024*1024):.0f}MB liberados).")
+
+    def _join(self):
+        destination = self.config.destination
+        if not self.join_paths:
+            print("Nenhum segmento para a junção final."); self.final_status = "NENHUM_SEGMENTO"
+            return
+        self.cancel_token.checkpoint()
+        print(f"\n--- Etapa Final: Juntando {len(self.join_paths)} segmentos totais ---")
+        pv_utils.print_progress("Etapa 3: junção", 0, 1, os.path.basename(destination), overall=True)
+        def report_join_progress(progress):
+            if progress["percent"] is not None:
+                pv_utils.print_progress("Etapa 3: junção", int(progress["percent"]), 100, os.path.basename(destination), overall=True)
+        join_success = step3.join_segments_from_list(self.join_paths, destination, self.expected_join_duration_s or None, report_join_progress)
+        self.cancel_token.checkpoint() # Uma junção interrompida pelo cancelamento não é uma falha
+        self.final_status = "SUCESSO" if join_success else "FALHA_JUNCAO"
+
+    def _finish(self):
+        """Estatísticas finais, evento run_end, _processing_log.json (do diário) e _summary.txt."""
+        config, journal = self.config, self.journal
+        processing_end_dt = datetime.datetime.now()
+        total_elapsed_seconds = time.perf_counter() - self.start_time_perf
+
+        total_src_bytes, total_src_duration, total_src_frames = 0, 0.0, 0
+        source_details = list(journal.view["sources"].values())
+        for d in source_details:
+            if not d.get("processing_skipped_join_only") and d.get("original_video_info"):
+                total_src_bytes += d["original_video_info"].get("size_bytes", 0)
+                total_src_duration += d["original_video_info"].get("duration_s", 0)
+                total_src_frames += d["original_video_info"].get("total_frames", 0)
+
+        dest_stats = pv_utils.get_extended_video_info(config.destination) if self.final_status == "SUCESSO" else {}
+        total_dest_bytes = dest_stats.get("size_bytes", 0)
+        total_dest_duration = dest_stats.get("duration_s", 0)
+        total_dest_frames = dest_stats.get("total_frames", 0)
+
+        final_summary = {"status": self.final_status, "destination_filepath": config.destination}
+        final_summary["source_files_processed_count"] = len([d for d in source_details if not d.get("processing_skipped_join_only") and not d.get("error")])
+        final_summary["source_total_size_bytes"], final_summary["source_total_duration_s"], final_summary["source_total_frames"] = total_src_bytes, round(total_src_duration, 3), total_src_frames
+        final_summary["destination_size_bytes"], final_summary["destination_duration_s"], final_summary["destination_total_frames"] = total_dest_bytes, round(total_dest_duration, 3), total_dest_frames
+
+        if total_src_bytes > 0 and dest_stats.get("exists"):
+            final_summary["size_economy_bytes"] = total_src_bytes - dest_stats["size_bytes"]
+            final_summary["size_economy_percentage"] = round(((total_src_bytes - dest_stats["size_bytes"]) / total_src_bytes) * 100, 2) if total_src_bytes > 0 else 0
+        if total_src_duration > 0 and dest_stats.get("exists"):
+            final_summary["time_economy_seconds"] = round(total_src_duration - total_dest_duration, 3)
+            final_summary["time_economy_percentage"] = round(((total_src_duration - total_dest_duration) / total_src_duration) * 100, 2) if total_src_duration > 0 else 0
+        if total_src_frames > 0 and dest_stats.get("exists"):
+            final_summary["frame_economy_frames"] = total_src_frames - total_dest_frames
+            final_summary["frame_economy_percentage"] = round(((total_src_frames - total_dest_frames) / total_src_frames) * 100, 2) if total_src_frames > 0 else 0
+
+        final_summary["concatenated_segment_count"] = len(self.join_paths)
+
+        resource_usage = None
+        if self.sampler:
+            self.sampler.stop()
+            resource_usage = self.sampler.summary()
+        journal.append("run_end", processing_end_datetime=processing_end_dt.isoformat(), temp_storage=self.temp_storage_stats,
+                       ffmpeg_stats=pv_ffmpeg_runner.stats_summary(), resource_usage=resource_usage, final_output_summary=final_summary)
+        journal.close()
+        print(f"Diário da execução (JSONL) salvo em: {journal.path}")
+        master_log_data = pv_run_journal.to_processing_log(pv_run_journal.replay(journal.path))
+
+        json_log_path = os.path.splitext(config.destination)[0] + "_processing_log.json"
+        try:
+            with open(json_log_path, 'w', encoding='utf-8') as f_json_log: json.dump(master_log_data, f_json_log, indent=2, ensure_ascii=False)
+            print(f"Log JSON detalhado salvo em: {json_log_path}")
+        except Exception as e: print(f"Erro ao salvar log JSON: {e}")
+
+        txt_summary_path = os.path.splitext(config.destination)[0] + "_summary.txt"
+        try:
+            with open(txt_summary_path, 'w', encoding='utf-8') as f_txt:
+                f_txt.write(f"START   : {self.processing_start_dt.strftime('%d/%m/%Y %H:%M:%S')}\n")
+                f_txt.write(f"END     : {processing_end_dt.strftime('%d/%m/%Y %H:%M:%S')}\n")
+                f_txt.write(f"ELAPSED : {format_time_delta(total_elapsed_seconds)} ({total_elapsed_seconds:.0f} segundos)\n")
+                f_txt.write(f"STATUS  : {final_summary.get('status', 'DESCONHECIDO')}\n")
+                f_txt.write("-" * 20 + " TAMANHO " + "-" * 20 + "\n")
+                f_txt.write(f"SIZE START: {total_src_bytes / (1024*1024):.1f}MB ({total_src_bytes} bytes)\n")
+                f_txt.write(f"SIZE END  : {total_dest_bytes / (1024*1024):.1f}MB ({total_dest_bytes} bytes)\n")
+                if "size_economy_bytes" in final_summary and final_summary["size_economy_bytes"] is not None:
+                    f_txt.write(f"SIZE ECO  : {(final_summary['size_economy_bytes']) / (1024*1024):.1f}MB ({final_summary['size_economy_bytes']} bytes, {final_summary.get('size_economy_percentage', 0)}%)\n")
+                f_txt.write("-" * 20 + " DURAÇÃO " + "-" * 20 + "\n")
+                f_txt.write(f"TIME START: {format_time_delta(total_src_duration)} ({total_src_duration:.0f} segundos)\n")
+                f_txt.write(f"TIME END  : {format_time_delta(total_dest_duration)} ({total_dest_duration:.0f} segundos)\n")
+                if "time_economy_seconds" in final_summary and final_summary['time_economy_seconds'] is not None:
+                     f_txt.write(f"TIME ECO  : {format_time_delta(final_summary['time_economy_seconds'])} ({final_summary['time_economy_seconds']:.0f} segundos, {final_summary.get('time_economy_percentage', 0)}%)\n")
+                f_txt.write("-" * 20 + " FRAMES " + "-" * 20 + "\n")
+                f_txt.write(f"FRAME START: {total_src_frames} frames\n")
+                f_txt.write(f"FRAME END  : {total_dest_frames} frames\n")
+                if "frame_economy_frames" in final_summary and final_summary['frame_economy_frames'] is not None:
+                     f_txt.write(f"FRAME ECO : {final_summary['frame_economy_frames']} frames ({final_summary.get('frame_economy_percentage', 0)}%)\n")
+
+                f_txt.write("-" * 20 + " FFMPEG " + "-" * 20 + "\n")
+                for line in pv_ffmpeg_runner.format_stats_lines(master_log_data["ffmpeg_stats"]): f_txt.write(line + "\n")
+
+                if resource_usage:
+                    f_txt.write("-" * 20 + " RECURSOS " + "-" * 20 + "\n")
+                    for line in pv_resource_sampler.format_summary_lines(resource_usage): f_txt.write(line + "\n")
+
+                f_txt.write("-" * 20 + " ARQUIVOS " + "-" * 20 + "\n")
+                f_txt.write(f"FILE DEST : {config.destination}\n")
+                f_txt.write("FILE SRC  :\n")
+                for src_detail in master_log_data["source_file_details"]: f_txt.write(f"            {src_detail['source_filepath']}\n")
+            print(f"Sumário TXT salvo em: {txt_summary_path}")
+        except Exception as e:
+            print(f"Erro ao salvar sumário TXT: {e}")
+
+        main_temp_dir = self.main_temp_dir
+        if not config.join_only and not config.keep_temp_dirs and main_temp_dir and os.path.exists(main_temp_dir):
+            print(f"Processamento concluído. Diretório temporário '{main_temp_dir}' foi mantido para possível retomada.")
+            print("Use a flag --clean-start para forçar uma execução limpa na próxima vez, ou apague a pasta manualmente.")
+        elif not config.keep_temp_dirs and main_temp_dir and not config.join_only:
+            try:
+                shutil.rmtree(main_temp_dir)
+                print(f"Diretório temporário principal '{main_temp_dir}' removido.")
+            except Exception as e:
+                print(f"AVISO: Não foi possível remover o diretório temporário principal '{main_temp_dir}': {e}")
+        pv_utils.print_progress("Concluído", 1, 1, overall=True)
+        print("\n--- Processamento Geral Concluído ---")
+        return final_summary
+
+
+class _QueueWriter:
+    """stdout/stderr de um processo de trabalho: cada linha completa vira ("log", linha) na fila."""
+
+    def __init__(self, message_queue):
+        self.message_queue = message_queue
+        self._buffer = ""
+        self._lock = threading.Lock()
+
+    def write(self, text):
+        with self._lock:
+            self._buffer += text
+            *lines, self._buffer = self._buffer.split("\n")
+        for line in lines: self.message_queue.put(("log", line + "\n"))
+        return len(text)
+
+    def flush(self):
+        with self._lock: text, self._buffer = self._buffer, ""
+        if text: self.message_queue.put(("log", text))
+
+
+def run_in_worker_process(config, message_queue):
+    """
+    Alvo de multiprocessing.Process (um Pipeline por processo). Envia à fila ("log", linha),
+    ("progress", progresso) e, no fim, ("result", resumo) ou ("error", mensagem). O processo
+    abre um grupo próprio (fora do Windows): pausar/cancelar o grupo alcança também os FFmpeg;
+    o SIGTERM cancela a execução pelos pontos de verificação, que ainda gravam o log e o resumo.
+    """
+    if hasattr(os, "setsid"): os.setsid()
+    token = CancelToken()
+    signal.signal(signal.SIGTERM, lambda signal_number, frame: token._cancelled.set()) # Os FFmpeg do grupo já receberam o sinal
+    sys.stdout = sys.stderr = _QueueWriter(message_queue)
+    try:
+        summary = Pipeline(config, on_progress=lambda progress: message_queue.put(("progress", progress)), cancel_token=token).run()
+        sys.stdout.flush()
+        message_queue.put(("result", summary))
+    except Exception as e:
+        sys.stdout.flush()
+        message_queue.put(("error", f"{type(e).__name__}: {e}"))
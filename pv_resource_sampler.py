@@ -0,0 +1,174 @@
+# pv_resource_sampler.py
+"""
+Amostrador de recursos da execução, sem dependências: lê /proc (Linux) a cada intervalo para o
+próprio processo Python e para cada FFmpeg/FFprobe em execução (pv_ffmpeg_runner.active_processes).
+Cada amostra soma, por rótulo (o label da chamada pv_ffmpeg_runner.run, como "corte" ou
+"aceleração", e não a Etapa do pipeline; SELF_LABEL para o processo Python), CPU% (100 = um
+núcleo), RSS e bytes lidos/gravados no disco no intervalo (read_bytes/write_bytes do /proc/<pid>/io).
+Um processo que termina entre duas amostras perde só o último intervalo.
+Sem /proc (macOS, Windows), available() é False e o pv_pipeline não inicia o amostrador.
+"""
+import os
+import time
+import threading
+
+import pv_ffmpeg_runner
+
+DEFAULT_INTERVAL_S = 1.0
+SELF_LABEL = "python"
+# Pontos máximos por série no log: séries maiores são reduzidas em blocos (média da CPU, máximo do RSS, soma do I/O).
+SERIES_MAX_POINTS = 300
+MB = 1024 * 1024
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100 # Unidade de utime/stime do /proc/<pid>/stat
+
+
+def available():
+    return os.path.isfile(f"/proc/{os.getpid()}/stat")
+
+
+def _read_io(path, usage):
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ("read_bytes", "write_bytes"): usage[key] += int(value)
+    except (OSError, ValueError):
+        pass # /proc/<pid>/io pode não existir (kernel sem contabilidade de I/O) ou não ser legível
+
+
+def read_process(pid, own_io_only=False):
+    """
+    {cpu_s, rss_bytes, read_bytes, write_bytes} de /proc/<pid>; None se o processo já terminou.
+    O io do processo inclui o dos filhos já terminados: com own_io_only (o processo Python, que
+    espera pelos FFmpeg), o I/O é a soma das threads vivas, sem os filhos.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", 'r') as f: stat = f.read()
+        # O nome do comando (2º campo) pode ter espaços e parênteses: os campos seguem o último ')'.
+        fields = stat.rsplit(')', 1)[1].split()
+        usage = {"cpu_s": (int(fields[11]) + int(fields[12])) / CLOCK_TICKS, "rss_bytes": 0, "read_bytes": 0, "write_bytes": 0}
+        with open(f"/proc/{pid}/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmRSS:"): usage["rss_bytes"] = int(line.split()[1]) * 1024; break
+    except (OSError, IndexError, ValueError):
+        return None
+    if own_io_only:
+        try: thread_ids = os.listdir(f"/proc/{pid}/task")
+        except OSError: thread_ids = []
+        for thread_id in thread_ids: _read_io(f"/proc/{pid}/task/{thread_id}/io", usage)
+    else:
+        _read_io(f"/proc/{pid}/io", usage)
+    return usage
+
+
+class ResourceSampler:
+    """Thread que amostra os recursos a cada interval_s, de start() até stop(); summary() monta o resultado."""
+
+    def __init__(self, interval_s=DEFAULT_INTERVAL_S):
+        self.interval_s = interval_s
+        self.labels = {} # rótulo -> lista de (t_s, cpu_percent, rss_bytes, read_bytes, write_bytes, processos)
+        self.totals = [] # (t_s, cpu_percent, rss_bytes) somando todos os rótulos
+        self._previous = {} # pid -> (cpu_s, read_bytes, write_bytes) da amostra anterior
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._started = self._last_sample = time.perf_counter()
+        own = read_process(os.getpid(), own_io_only=True) # O que o processo Python fez antes não entra na primeira amostra
+        if own: self._previous[os.getpid()] = (own["cpu_s"], own["read_bytes"], own["write_bytes"])
+        self._thread = threading.Thread(target=self._loop, name="pv-resource-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread: self._thread.join()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_s):
+            self.sample()
+
+    def sample(self):
+        now = time.perf_counter()
+        elapsed = max(now - self._last_sample, 1e-6)
+        self._last_sample = now
+        processes = [(os.getpid(), SELF_LABEL)] + pv_ffmpeg_runner.active_processes()
+        by_label, current = {}, {}
+        for pid, label in processes:
+            usage = read_process(pid, own_io_only=(label == SELF_LABEL))
+            if usage is None: continue
+            previous_cpu_s, previous_read, previous_write = self._previous.get(pid, (0.0, 0, 0)) # Processo novo: desde o início dele
+            current[pid] = (usage["cpu_s"], usage["read_bytes"], usage["write_bytes"])
+            entry = by_label.setdefault(label, [0.0, 0, 0, 0, 0])
+            entry[0] += 100.0 * (usage["cpu_s"] - previous_cpu_s) / elapsed
+            entry[1] += usage["rss_bytes"]
+            entry[2] += max(0, usage["read_bytes"] - previous_read) # Uma thread que terminou some da soma
+            entry[3] += max(0, usage["write_bytes"] - previous_write)
+            entry[4] += 1
+        self._previous = current
+        t_s = round(now - self._started, 1)
+        for label, (cpu, rss, read, write, count) in by_label.items():
+            self.labels.setdefault(label, []).append((t_s, cpu, rss, read, write, count))
+        self.totals.append((t_s, sum(e[0] for e in by_label.values()), sum(e[1] for e in by_label.values())))
+
+    def summary(self):
+        """Picos e totais por rótulo e da execução inteira, com as séries (colunares) de cada rótulo."""
+        labels = {}
+        for label, samples in self.labels.items():
+            labels[label] = {"samples": len(samples),
+                             "peak_cpu_percent": round(max(s[1] for s in samples), 1),
+                             "peak_rss_mb": round(max(s[2] for s in samples) / MB, 1),
+                             "peak_processes": max(s[5] for s in samples),
+                             "read_mb": round(sum(s[3] for s in samples) / MB, 1),
+                             "write_mb": round(sum(s[4] for s in samples) / MB, 1),
+                             "series": _compact_series(samples)}
+        return {"interval_s": self.interval_s, "cpu_count": os.cpu_count(),
+                "peak_cpu_percent": round(max((t[1] for t in self.totals), default=0.0), 1),
+                "peak_rss_mb": round(max((t[2] for t in self.totals), default=0) / MB, 1),
+                "labels": labels}
+
+
+def _compact_series(samples):
+    """Série colunar {t_s, cpu_percent, rss_mb, read_mb, write_mb} com no máximo SERIES_MAX_POINTS pontos."""
+    block = -(-len(samples) // SERIES_MAX_POINTS)
+    series = {"t_s": [], "cpu_percent": [], "rss_mb": [], "read_mb": [], "write_mb": []}
+    for start in range(0, len(samples), block):
+        chunk = samples[start:start + block]
+        series["t_s"].append(chunk[0][0])
+        series["cpu_percent"].append(round(sum(s[1] for s in chunk) / len(chunk), 1))
+        series["rss_mb"].append(round(max(s[2] for s in chunk) / MB, 1))
+        series["read_mb"].append(round(sum(s[3] for s in chunk) / MB, 2))
+        series["write_mb"].append(round(sum(s[4] for s in chunk) / MB, 2))
+    return series
+
+
+def format_summary_lines(summary):
+    """Linhas do _summary.txt: picos da execução e de cada rótulo de chamada FFmpeg."""
+    lines = [f"PEAK CPU  : {summary['peak_cpu_percent']:.0f}% ({summary['cpu_count']} CPUs = {100 * (summary['cpu_count'] or 1)}%)",
+             f"PEAK RSS  : {summary['peak_rss_mb']:.0f}MB"]
+    for label, entry in sorted(summary["labels"].items(), key=lambda item: -item[1]["peak_cpu_percent"]):
+        lines.append(f"{label:<20}: CPU máx. {entry['peak_cpu_percent']:.0f}%, RSS máx. {entry['peak_rss_mb']:.0f}MB, "
+                     f"{entry['read_mb']:.0f}MB lidos, {entry['write_mb']:.0f}MB gravados, até {entry['peak_processes']} processo(s)")
+    return lines
+
+
+if __name__ == "__main__":
+    # Autoteste: um processo que grava alguns MB e depois ocupa a CPU aparece no seu rótulo. Ele
+    # continua vivo depois do fsync para que uma amostra pegue a gravação.
+    import sys, tempfile
+    print("--- Testando pv_resource_sampler.py diretamente ---")
+    if not available():
+        print("Sem /proc neste sistema; nada a testar."); sys.exit(0)
+    sampler = ResourceSampler(interval_s=0.1).start()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        busy = ("import os, time\nwith open(os.path.join(%r, 'x'), 'wb') as f:\n"
+                "    f.write(b'0' * (8 * 1048576)); f.flush(); os.fsync(f.fileno())\n"
+                "end = time.time() + 0.5\nwhile time.time() < end: pass") % temp_dir
+        pv_ffmpeg_runner.run([sys.executable, "-c", busy], label="teste")
+    sampler.stop()
+    summary = sampler.summary()
+    for line in format_summary_lines(summary): print("  " + line)
+    assert summary["labels"]["teste"]["peak_cpu_percent"] > 10, summary["labels"]["teste"]
+    assert summary["labels"]["teste"]["write_mb"] > 0, summary["labels"]["teste"]
+    assert SELF_LABEL in summary["labels"]
+    print("OK")
@@ -0,0 +1,142 @@
+# pv_run_journal.py
+"""
+Diário da execução em JSONL (uma linha JSON por evento, gravada no momento em que acontece).
+Se o processo cair, o arquivo diz exatamente o que terminou. A visão em memória guarda
+apenas resumos, indexados por fonte e por chunk (sem buscas lineares). O _processing_log.json
+final é gerado relendo o diário (replay).
+
+Eventos (campo "event"):
+  run_start      parameters_used, processing_start_datetime
+  source         source_filepath, original_video_info, audio_analysis, motion_analysis, error
+  chunk_planned  source_filepath, chunk_path
+  chunk_segmented chunk_path, segment_count, segment_index, segmentation_summary, kf_re_encode_details
+  chunk_done     chunk_path, acceleration_summary (só as contagens)
+  chunk_failed   chunk_path, error
+  run_end        processing_end_datetime, temp_storage, ffmpeg_stats, resource_usage, final_output_summary
+"""
+import os
+import json
+import datetime
+import threading
+
+JOURNAL_SUFFIX = "_journal.jsonl"
+
+
+def journal_path_for(destination):
+    return os.path.splitext(destination)[0] + JOURNAL_SUFFIX
+
+
+def new_view():
+    return {"run": {}, "sources": {}, "chunks": {}}
+
+
+def apply_event(view, entry):
+    """Aplica um evento à visão: run (parâmetros, fim), sources e chunks (dicts por caminho)."""
+    event = entry.get("event")
+    data = {k: v for k, v in entry.items() if k not in ("event", "time")}
+    if event == "run_start":
+        view.clear(); view.update(new_view()) # Cada execução recomeça a visão
+        view["run"].update(data)
+    elif event == "source":
+        view["sources"].setdefault(data["source_filepath"], {"chunks_processed": []}).update(data)
+    elif event == "chunk_planned":
+        if data["chunk_path"] not in view["chunks"]:
+            chunk = view["chunks"][data["chunk_path"]] = {"chunk_path": data["chunk_path"], "status": "Pendente"}
+            source = view["sources"].setdefault(data["source_filepath"], {"source_filepath": data["source_filepath"], "chunks_processed": []})
+            source["chunks_processed"].append(chunk)
+    elif event in ("chunk_segmented", "chunk_done", "chunk_failed"):
+        chunk = view["chunks"].setdefault(data["chunk_path"], {"chunk_path": data["chunk_path"]})
+        chunk.update(data)
+        chunk["status"] = {"chunk_segmented": "Segmentado", "chunk_done": "Sucesso", "chunk_failed": "Falha"}[event]
+    elif event == "run_end":
+        view["run"].update(data)
+    return view
+
+
+def replay(path):
+    """Relê o diário e devolve a visão da última execução registrada (linha final truncada é ignorada)."""
+    view = new_view()
+    if not os.path.isfile(path): return view
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try: entry = json.loads(line)
+            except json.JSONDecodeError: continue # Última linha cortada por uma queda
+            apply_event(view, entry)
+    return view
+
+
+def to_processing_log(view):
+    """Monta, a partir da visão, o dicionário no formato do _processing_log.json."""
+    log = dict(view["run"])
+    log["source_file_details"] = list(view["sources"].values())
+    log.setdefault("final_output_summary", {"status": "NÃO INICIADO"})
+    return log
+
+
+class RunJournal:
+    """
+    Diário de uma execução: append() grava o evento no arquivo, atualiza a visão em memória e
+    repassa o evento a on_event (se informado).
+    """
+
+    def __init__(self, path, fresh=False, on_event=None):
+        self.path = path
+        self.on_event = on_event # on_event(evento, dados), chamado depois de cada gravação
+        # Visão da execução anterior (o que já tinha terminado), antes de começar a nova.
+        self.previous = new_view() if fresh else replay(path)
+        self.view = new_view()
+        self._lock = threading.Lock()
+        self._file = open(path, 'w' if fresh else 'a', encoding='utf-8')
+        if not fresh and self._file.tell() > 0 and not self._ends_with_newline():
+            self._file.write("\n") # Fecha a linha cortada por uma queda antes de continuar
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def append(self, event, **data):
+        entry = {"event": event, "time": datetime.datetime.now().isoformat(), **data}
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush() # Visível para quem ler o arquivo (e para uma retomada) mesmo se o processo cair
+            apply_event(self.view, entry)
+        if self.on_event: self.on_event(event, data)
+
+    def source(self, source_filepath):
+        return self.view["sources"].get(source_filepath, {})
+
+    def chunk(self, chunk_path):
+        return self.view["chunks"].get(chunk_path, {})
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed: self._file.close()
+
+
+if __name__ == "__main__":
+    # Autoteste: a visão ao vivo e a relida do arquivo coincidem; uma linha final cortada é ignorada.
+    import tempfile
+    print("--- Testando pv_run_journal.py diretamente ---")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = journal_path_for(os.path.join(temp_dir, "saida.mp4"))
+        journal = RunJournal(path, fresh=True)
+        journal.append("run_start", parameters_used={"jobs": 2}, processing_start_datetime="2025-01-01T00:00:00")
+        journal.append("source", source_filepath="/v/a.mp4", original_video_info={"duration_s": 10.0})
+        for n in range(3): journal.append("chunk_planned", source_filepath="/v/a.mp4", chunk_path=f"/t/c{n}.mp4")
+        journal.append("chunk_segmented", chunk_path="/t/c0.mp4", segment_count=4)
+        journal.append("chunk_done", chunk_path="/t/c0.mp4", acceleration_summary={"processed_count": 2})
+        journal.append("chunk_failed", chunk_path="/t/c1.mp4", error="falhou")
+        journal.close()
+        with open(path, 'a', encoding='utf-8') as f: f.write('{"event": "chunk_done", "chunk_pa')
+        replayed = replay(path)
+        assert replayed == journal.view, "visão relida diferente da visão ao vivo"
+        statuses = [c["status"] for c in to_processing_log(replayed)["source_file_details"][0]["chunks_processed"]]
+        assert statuses == ["Sucesso", "Falha", "Pendente"], statuses
+        resumed = RunJournal(path)
+        assert resumed.previous["chunks"]["/t/c0.mp4"]["status"] == "Sucesso"
+        resumed.append("run_start", parameters_used={}, processing_start_datetime="2025-01-02T00:00:00")
+        resumed.close()
+        assert replay(path)["run"]["processing_start_datetime"] == "2025-01-02T00:00:00"
+    print("OK")
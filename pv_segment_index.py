@@ -0,0 +1,152 @@
+# pv_segment_index.py
+"""
+Índice de segmentos da Etapa 1 em formato colunar: um array NumPy estruturado (uma coluna
+tipada por campo) em SEGMENT_TABLE_NAME e a tabela de nomes de arquivo em SEGMENT_NAMES_NAME,
+ambos .npy lidos via mmap. O sound_index.json continua sendo exportado para compatibilidade
+(mesmos campos e formatos de sempre), mas as etapas leem o colunar.
+"""
+import os
+import json
+import numpy as np
+
+SEGMENT_TABLE_NAME = "sound_index.npy"
+SEGMENT_NAMES_NAME = "sound_index_files.npy"
+# Ordem das classes no campo "class" (mesma de pv_speed_map.SEGMENT_CLASSES).
+SEGMENT_CLASSES = ("speech", "code", "silent")
+SEGMENT_DTYPE = np.dtype([
+    ("index", "<i4"), ("file_id", "<i4"), # file_id: posição na tabela de nomes; -1 = sem arquivo (descartado)
+    ("time_start", "<f8"), ("time_end", "<f8"),
+    ("frame_start", "<i8"), ("frame_end", "<i8"),
+    ("fps", "<f4"), ("db_min", "<f4"), ("db_max", "<f4"), # dB ausente ("n/a") = NaN
+    ("speed", "<f8"), # NaN = sem fator gravado (índices sem mapa de velocidades)
+    ("class", "u1"),
+])
+
+
+def _db_value(text):
+    try: return round(float(text), 1)
+    except (TypeError, ValueError): return np.nan
+
+
+def build_table(records):
+    """Converte a lista de metadados da Etapa 1 (dicts do sound_index.json) em (tabela, nomes)."""
+    table = np.zeros(len(records), dtype=SEGMENT_DTYPE)
+    names = []
+    for row, record in enumerate(records):
+        file_id = -1
+        if record.get("file"):
+            file_id = len(names)
+            names.append(record["file"].encode("utf-8"))
+        speed = record.get("speed")
+        table[row] = (record["index"], file_id, record["time_start"], record["time_end"],
+                      record["frame_start"], record["frame_end"], record["fps"],
+                      _db_value(record.get("db_min")), _db_value(record.get("db_max")),
+                      np.nan if speed is None else speed, SEGMENT_CLASSES.index(record["result"]))
+    return table, np.array(names, dtype=bytes) if names else np.zeros(0, dtype="S1")
+
+
+def record_at(table, names, row):
+    """Linha da tabela no formato dos dicts do sound_index.json."""
+    entry = table[row]
+    file_id = int(entry["file_id"])
+    record = {"index": int(entry["index"]), "file": names[file_id].decode("utf-8") if file_id >= 0 else None,
+              "frame_start": int(entry["frame_start"]), "frame_end": int(entry["frame_end"]),
+              "time_start": round(float(entry["time_start"]), 3), "time_end": round(float(entry["time_end"]), 3),
+              "fps": round(float(entry["fps"]), 2),
+              "db_min": "n/a" if np.isnan(entry["db_min"]) else f"{float(entry['db_min']):.1f}",
+              "db_max": "n/a" if np.isnan(entry["db_max"]) else f"{float(entry['db_max']):.1f}",
+              "result": SEGMENT_CLASSES[int(entry["class"])]}
+    if not np.isnan(entry["speed"]): record["speed"] = float(entry["speed"])
+    return record
+
+
+def iter_records(table, names):
+    """Percorre a tabela como dicts, um por vez (sem materializar a lista inteira)."""
+    for row in range(len(table)): yield record_at(table, names, row)
+
+
+def _save_atomic(path, array):
+    temp_path = f"{path}.{os.getpid()}.tmp.npy"
+    np.save(temp_path, array)
+    os.replace(temp_path, path)
+
+
+def write_index(output_dir, records, json_file_name=None):
+    """
+    Grava o índice colunar de records em output_dir (os nomes primeiro; a tabela, por último,
+    marca o índice como completo). Com json_file_name, exporta também o JSON de compatibilidade.
+    Retorna (tabela, nomes).
+    """
+    table, names = build_table(records)
+    _save_atomic(os.path.join(output_dir, SEGMENT_NAMES_NAME), names)
+    _save_atomic(os.path.join(output_dir, SEGMENT_TABLE_NAME), table)
+    if json_file_name:
+        with open(os.path.join(output_dir, json_file_name), 'w') as f: json.dump(records, f, indent=2)
+    return table, names
+
+
+def has_index(output_dir):
+    return (os.path.isfile(os.path.join(output_dir, SEGMENT_TABLE_NAME))
+            and os.path.isfile(os.path.join(output_dir, SEGMENT_NAMES_NAME)))
+
+
+def read_index(output_dir, json_file_name="sound_index.json"):
+    """
+    Lê (tabela, nomes) de output_dir via mmap. Diretórios de execuções antigas, só com o JSON,
+    são convertidos (e o colunar é gravado para as próximas leituras).
+    Levanta FileNotFoundError se não houver índice algum.
+    """
+    if has_index(output_dir):
+        return (np.load(os.path.join(output_dir, SEGMENT_TABLE_NAME), mmap_mode='r'),
+                np.load(os.path.join(output_dir, SEGMENT_NAMES_NAME), mmap_mode='r'))
+    json_path = os.path.join(output_dir, json_file_name)
+    with open(json_path, 'r') as f: records = json.load(f)
+    return write_index(output_dir, records)
+
+
+def summarize(table):
+    """Resumo para o log: contagem, duração por classe e duração prevista após as velocidades."""
+    durations = table["time_end"] - table["time_start"]
+    speeds = np.where(np.isnan(table["speed"]), 1.0, table["speed"]).astype(np.float64)
+    kept = (table["file_id"] >= 0) & (speeds > 0)
+    by_class = {}
+    for class_id, name in enumerate(SEGMENT_CLASSES):
+        mask = table["class"] == class_id
+        if mask.any(): by_class[name] = {"count": int(mask.sum()), "duration_s": round(float(durations[mask].sum()), 3)}
+    return {"segment_count": int(len(table)), "by_class": by_class,
+            "output_duration_s": round(float((durations[kept] / speeds[kept]).sum()), 3)}
+
+
+if __name__ == "__main__":
+    # Autoteste: ida e volta JSON -> colunar -> JSON idêntica, e tamanho/tempo com um índice grande.
+    import time, tempfile
+    print("--- Testando pv_segment_index.py diretamente ---")
+    sample_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "partial-scripts", "sound_index.json")
+    with open(sample_path, 'r') as f: sample = json.load(f)
+    sample.append({"index": len(sample), "file": None, "frame_start": 0, "frame_end": 10, "time_start": 1.0,
+                   "time_end": 2.0, "fps": 59.94, "db_min": "n/a", "db_max": "n/a", "result": "code", "speed": 0.0})
+    sample[0]["speed"] = 2.7
+    with tempfile.TemporaryDirectory() as temp_dir:
+        write_index(temp_dir, sample)
+        table, names = read_index(temp_dir)
+        assert list(iter_records(table, names)) == sample, "ida e volta diferente"
+        big = [{"index": i, "file": f"{i:06d}_silent.mp4", "frame_start": i * 60, "frame_end": i * 60 + 59,
+                "time_start": float(i), "time_end": i + 1.0, "fps": 60.0, "db_min": "-40.2", "db_max": "-20.0",
+                "result": "silent", "speed": 4.0} for i in range(50000)]
+        started = time.perf_counter()
+        write_index(temp_dir, big, "sound_index.json")
+        write_s = time.perf_counter() - started
+        json_size = os.path.getsize(os.path.join(temp_dir, "sound_index.json"))
+        columnar_size = sum(os.path.getsize(os.path.join(temp_dir, n)) for n in (SEGMENT_TABLE_NAME, SEGMENT_NAMES_NAME))
+        started = time.perf_counter()
+        with open(os.path.join(temp_dir, "sound_index.json"), 'r') as f: json.load(f)
+        json_s = time.perf_counter() - started
+        started = time.perf_counter()
+        table, names = read_index(temp_dir)
+        summary = summarize(table)
+        columnar_s = time.perf_counter() - started
+        assert summary["output_duration_s"] == 12500.0, summary
+        print(f"  50k segmentos: JSON {json_size / 1024:.0f}KB (leitura {json_s * 1000:.0f}ms), "
+              f"colunar {columnar_size / 1024:.0f}KB (leitura + resumo {columnar_s * 1000:.1f}ms), gravação {write_s * 1000:.0f}ms")
+        del table, names # Solta o mmap antes de apagar o diretório (Windows)
+    print("OK")
@@ -0,0 +1,59 @@
+# pv_speed_map.py
+import math
+
+# Classes de segmento produzidas pela Etapa 1 ("code" só aparece com --motion).
+SEGMENT_CLASSES = ("speech", "code", "silent")
+
+
+def default_speed_map(speedup_factor):
+    """Mapa equivalente ao comportamento antigo: só o silêncio é acelerado."""
+    return {"speech": 1.0, "code": 1.0, "silent": float(speedup_factor)}
+
+
+def parse_speed_map(text, base_map):
+    """
+    Lê um mapa "classe=fator,..." (ex.: "speech=1,code=8,silent=0") sobre base_map.
+    Fator 1 mantém, maior que 1 acelera, 0 descarta o trecho. Levanta ValueError se inválido.
+    """
+    speed_map = dict(base_map)
+    if not text: return speed_map
+    for item in text.split(","):
+        name, sep, value = item.partition("=")
+        name = name.strip()
+        if not sep or name not in SEGMENT_CLASSES:
+            raise ValueError(f"Item inválido no mapa de velocidades: '{item}'. Use classe=fator com classes {', '.join(SEGMENT_CLASSES)}.")
+        try:
+            factor = float(value)
+        except ValueError:
+            raise ValueError(f"Fator inválido para '{name}': '{value}'.")
+        if factor < 0 or math.isinf(factor) or math.isnan(factor):
+            raise ValueError(f"Fator para '{name}' deve ser >= 0 (0 descarta o trecho).")
+        speed_map[name] = factor
+    return speed_map
+
+
+def format_speed_map(speed_map):
+    return ",".join(f"{name}={speed_map[name]:g}" for name in SEGMENT_CLASSES if name in speed_map)
+
+
+def segment_speed(segment_type, duration_ms, speed_map, min_speedup_ms=0):
+    """
+    Fator de um segmento. Trechos mais curtos que min_speedup_ms não são acelerados nem
+    descartados (tocam em 1x), como os silêncios curtos sempre foram.
+    """
+    factor = speed_map.get(segment_type, 1.0)
+    if factor != 1.0 and min_speedup_ms and duration_ms < min_speedup_ms:
+        return 1.0
+    return factor
+
+
+def atempo_chain(factor):
+    """Filtro de áudio para mudar o andamento por factor, encadeando atempo dentro de [0.5, 2.0]."""
+    filters = []
+    while factor > 2.0:
+        filters.append("atempo=2"); factor /= 2.0
+    while factor < 0.5:
+        filters.append("atempo=0.5"); factor /= 0.5
+    if abs(factor - 1.0) > 1e-9 or not filters:
+        filters.append(f"atempo={factor:.6g}")
+    return ",".join(filters)
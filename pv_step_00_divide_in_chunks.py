@@ -1,21 +1,137 @@
 # pv_step_00_divide_in_chunks.py
 import os
+import json
 import math
-import subprocess
+import hashlib
+import bisect
 import sys
 
 try:
     import pv_utils
+    import pv_ffmpeg_runner
 except ImportError:
     print("ERRO: O arquivo pv_utils.py não foi encontrado.")
     sys.exit(1)
 
-def divide_in_chunks(video_path, output_dir, chunk_size_mb=500):
+CHUNK_MANIFEST_NAME = "chunks_manifest.json"
+# Folga (s) na duração de um chunk existente: o corte com -c copy começa no keyframe anterior.
+CHUNK_DURATION_TOLERANCE_S = 15.0
+# --chunk-size auto: duração alvo de um chunk de uma fonte 1080p30 a ~8Mb/s; fontes mais caras de
+# decodificar por segundo (mais pixels/s ou bitrate) ganham chunks proporcionalmente mais curtos.
+AUTO_CHUNK_SIZE = "auto"
+AUTO_CHUNK_REFERENCE_S = 600.0
+AUTO_CHUNK_REFERENCE_PIXEL_RATE = 1920 * 1080 * 30
+AUTO_CHUNK_REFERENCE_BITRATE = 8_000_000
+AUTO_CHUNK_MIN_COST = 0.25 # Fontes leves não passam de AUTO_CHUNK_REFERENCE_S / AUTO_CHUNK_MIN_COST por chunk
+AUTO_CHUNK_MIN_S = 120.0 # Abaixo disto o custo fixo de cada chunk (cópia, ffprobe, keyframes das bordas) pesa demais
+AUTO_CHUNK_AUDIO_BYTES_PER_S = 48000 * 2 * 2 # PCM 16 bits estéreo: a Etapa 1 pode carregar o áudio do chunk inteiro (pydub)
+AUTO_CHUNK_MEMORY_FRACTION = 0.5 # Parte da memória livre usada como orçamento, se nenhum for informado
+AUTO_CHUNK_DEFAULT_MEMORY_MB = 2048 # Orçamento quando a memória livre não pode ser consultada (ex.: Windows)
+
+
+def choose_silence_aligned_cuts(duration_s, num_chunks, silent_runs, tolerance_s, keyframes=None):
     """
-    Divide um vídeo em chunks de aproximadamente chunk_size_mb.
-    Verifica se os chunks já existem antes de criá-los.
-    Usa -c copy para ser rápido e sem perdas.
-    Retorna a lista de caminhos dos chunks criados.
+    Calcula os pontos de corte entre chunks. Cada corte ideal (divisão em partes iguais)
+    é movido para o silêncio longo mais próximo dentro de +-tolerance_s.
+    Se keyframes for fornecido, o corte cai sobre um keyframe dentro do silêncio, para que
+    o '-c copy' comece o chunk exatamente no ponto escolhido.
+    Retorna a lista de cortes internos (em segundos), estritamente crescente.
+    """
+    use_keyframes = bool(keyframes) and len(keyframes) > 1
+    cuts = []
+    for i in range(1, num_chunks):
+        ideal = duration_s * i / num_chunks
+        window_start, window_end = ideal - tolerance_s, ideal + tolerance_s
+        best = None
+        for run_start, run_end in silent_runs:
+            lo, hi = max(run_start, window_start), min(run_end, window_end)
+            if lo >= hi: continue
+            target = min(max((run_start + run_end) / 2.0, lo), hi)
+            if use_keyframes:
+                inside = keyframes[bisect.bisect_left(keyframes, lo):bisect.bisect_right(keyframes, hi)]
+                if not inside: continue
+                target = min(inside, key=lambda kf: abs(kf - target))
+            if best is None or abs(target - ideal) < abs(best - ideal):
+                best = target
+        if best is None:
+            print(f"  Aviso: nenhum silêncio longo a menos de {tolerance_s}s de {ideal:.1f}s. Cortando no ponto ideal.")
+            best = pv_utils.find_kf_before_or_at(ideal, keyframes) if use_keyframes else ideal
+        if 0 < best < duration_s and (not cuts or best > cuts[-1]):
+            cuts.append(round(best, 3))
+    return cuts
+
+
+def find_silence_aligned_cuts(video_path, duration_s, num_chunks, silent_ranges_ms, tolerance_s):
+    """Alinha os cortes aos silêncios já detectados na fonte (análise de áudio feita pelo orquestrador)."""
+    print(f"  Alinhando cortes a {len(silent_ranges_ms)} silêncios detectados (tolerância: {tolerance_s}s)...")
+    silent_runs = [(start_ms / 1000.0, end_ms / 1000.0) for start_ms, end_ms in silent_ranges_ms]
+    try:
+        keyframes = pv_utils.get_video_keyframes(video_path)
+    except Exception as e:
+        print(f"  Aviso: não foi possível mapear keyframes ({e}). Cortes não serão alinhados a keyframes.")
+        keyframes = None
+    return choose_silence_aligned_cuts(duration_s, num_chunks, silent_runs, tolerance_s, keyframes)
+
+
+def available_memory_mb():
+    """Memória física livre em MB; None se o sistema não informar (os.sysconf indisponível)."""
+    try: return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (AttributeError, ValueError, OSError): return None
+
+
+def auto_chunk_count(video_info, workers, memory_budget_mb=0):
+    """
+    Número de chunks para --chunk-size auto, a partir da fonte sondada (video_info de
+    pv_utils.get_extended_video_info), do número de workers e de um orçamento de memória em MB
+    (0 = AUTO_CHUNK_MEMORY_FRACTION da memória livre).
+    A duração alvo cai com o custo de decodificação por segundo (pixels/s e bitrate) e fica dentro
+    da memória de cada worker (áudio decodificado + vídeo comprimido do chunk); há ao menos um chunk
+    por worker, sem nenhum chunk mais curto que AUTO_CHUNK_MIN_S.
+    Retorna (num_chunks, descrição para o log).
+    """
+    duration_s = video_info.get("duration_s", 0)
+    if duration_s <= 0: return 1, "duração desconhecida"
+    workers = max(1, workers)
+    bitrate = video_info.get("size_bytes", 0) * 8 / duration_s
+    pixel_rate = video_info.get("width", 0) * video_info.get("height", 0) * video_info.get("fps", 0) or AUTO_CHUNK_REFERENCE_PIXEL_RATE
+    cost = max(pixel_rate / AUTO_CHUNK_REFERENCE_PIXEL_RATE, bitrate / AUTO_CHUNK_REFERENCE_BITRATE, AUTO_CHUNK_MIN_COST)
+    if not memory_budget_mb:
+        free_mb = available_memory_mb()
+        memory_budget_mb = free_mb * AUTO_CHUNK_MEMORY_FRACTION if free_mb else AUTO_CHUNK_DEFAULT_MEMORY_MB
+    memory_limit_s = memory_budget_mb * 1024 * 1024 / workers / (AUTO_CHUNK_AUDIO_BYTES_PER_S + bitrate / 8)
+    target_s = max(min(AUTO_CHUNK_REFERENCE_S / cost, memory_limit_s), AUTO_CHUNK_MIN_S)
+    num_chunks = max(math.ceil(duration_s / target_s), min(workers, int(duration_s // AUTO_CHUNK_MIN_S)), 1)
+    return num_chunks, (f"{num_chunks} chunk(s) de ~{duration_s / num_chunks:.0f}s: {video_info.get('width', 0)}x{video_info.get('height', 0)}"
+                        f"@{video_info.get('fps', 0):.0f}fps, {bitrate / 1e6:.1f}Mb/s, {workers} worker(s), {memory_budget_mb:.0f}MB de memória")
+
+
+def load_chunk_manifest(output_dir):
+    """Lê o manifesto de chunks (caminhos e tempos de início/fim na fonte). Retorna None se não existir."""
+    manifest_path = os.path.join(output_dir, CHUNK_MANIFEST_NAME)
+    if not os.path.isfile(manifest_path): return None
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f: return json.load(f)
+    except Exception as e:
+        print(f"  Aviso: manifesto de chunks inválido '{manifest_path}': {e}")
+        return None
+
+
+def plan_chunks(video_path, output_dir, chunk_size_mb=500, silent_ranges_ms=None, cut_tolerance_s=30.0,
+                workers=1, memory_budget_mb=0, invalidate_chunk=None):
+    """
+    Planeja a divisão de um vídeo em chunks de aproximadamente chunk_size_mb, sem criar arquivos.
+    Com chunk_size_mb = AUTO_CHUNK_SIZE, o número de chunks vem de auto_chunk_count (workers e
+    memory_budget_mb só valem nesse modo).
+    Se silent_ranges_ms (silêncios da fonte, em ms) for informado, cada corte é deslocado para
+    o silêncio mais próximo, dentro de cut_tolerance_s, para que os chunks possam ser
+    processados de forma independente, sem cortar frases ao meio.
+    Grava (ou reaproveita) um manifesto com o início/fim de cada chunk na fonte, inclusive quando a
+    divisão não é necessária; o plano gravado vale enquanto a fonte, o chunk_size_mb, o
+    cut_tolerance_s e os silêncios forem os mesmos. Ao gravar um plano novo, os arquivos dos chunks
+    do plano anterior e do atual são apagados e invalidate_chunk(caminho), se informado, é chamado
+    para cada um (para apagar o que foi produzido a partir deles).
+    Retorna a lista de entradas {"path", "start_s", "end_s"}; se a divisão não for necessária,
+    uma única entrada com o próprio vídeo. Retorna None em caso de erro.
     """
     print(f"--- Iniciando Etapa 0: Divisão em Chunks para '{os.path.basename(video_path)}' ---")
     os.makedirs(output_dir, exist_ok=True)
@@ -30,75 +146,128 @@ def divide_in_chunks(video_path, output_dir, chunk_size_mb=500):
 
     original_size_mb = video_info.get("size_bytes", 0) / (1024 * 1024)
     duration_s = video_info.get("duration_s", 0)
-    
+
+    # Reaproveita os cortes de uma execução anterior, se o manifesto for da mesma fonte e das mesmas
+    # entradas. Vem antes do cálculo do plano: no modo auto ele depende da memória livre, que muda de
+    # uma execução para outra.
+    plan_inputs = {"source_size_bytes": video_info.get("size_bytes"), "chunk_size_mb": chunk_size_mb,
+                   "cut_tolerance_s": cut_tolerance_s, "silent_ranges_sha1": _silent_ranges_digest(silent_ranges_ms)}
+    manifest = load_chunk_manifest(output_dir)
+    if manifest and all(manifest.get(key) == value for key, value in plan_inputs.items()):
+        # Sem divisão, a entrada é a própria fonte (que pode ter sido aberta por outro caminho).
+        chunk_entries = [dict(c, path=video_path) if c["path"] == manifest.get("source_filepath") else c for c in manifest["chunks"]]
+        if len(chunk_entries) == 1 and chunk_entries[0]["path"] == video_path:
+            print("  Divisão não necessária (plano do manifesto existente).")
+        else:
+            print(f"  Reaproveitando o plano de {len(chunk_entries)} chunks do manifesto existente.")
+            print(f"  Vídeo de {original_size_mb:.2f}MB será dividido em {len(chunk_entries)} chunks: " +
+                  ", ".join(f"{c['end_s'] - c['start_s']:.0f}s" for c in chunk_entries))
+        return chunk_entries
+    stale_chunk_paths = [c["path"] for c in manifest["chunks"]] if manifest else []
+
+    if chunk_size_mb == AUTO_CHUNK_SIZE:
+        num_chunks, reason = auto_chunk_count(video_info, workers, memory_budget_mb)
+        print(f"  Tamanho automático: {reason}.")
+        if num_chunks == 1: print("  Divisão não necessária.")
     # Se o vídeo já for menor que o tamanho alvo + uma margem de 10%, não divide.
-    if original_size_mb <= (chunk_size_mb * 1.1):
+    elif original_size_mb <= (chunk_size_mb * 1.1):
         print(f"  Vídeo de {original_size_mb:.1f}MB já está dentro do limite de tamanho ({chunk_size_mb}MB). Divisão não necessária.")
-        return [video_path] # Retorna o caminho original em uma lista
+        num_chunks = 1
+    else:
+        num_chunks = math.ceil(original_size_mb / chunk_size_mb)
 
-    if duration_s <= 0:
+    if num_chunks == 1:
+        chunk_entries = [{"path": video_path, "start_s": 0.0, "end_s": duration_s}]
+    elif duration_s <= 0:
         print("  Erro: Duração do vídeo é zero. Não é possível dividir.")
         return None
+    else:
+        base, ext = os.path.splitext(os.path.basename(video_path))
+        if silent_ranges_ms:
+            cuts = find_silence_aligned_cuts(video_path, duration_s, num_chunks, silent_ranges_ms, cut_tolerance_s)
+        else:
+            cuts = [round(duration_s * i / num_chunks, 3) for i in range(1, num_chunks)]
+        bounds = [0.0] + cuts + [duration_s]
+        chunk_entries = [{"path": os.path.join(output_dir, f"{base}_chunk_{i+1:02d}{ext}"),
+                          "start_s": bounds[i], "end_s": bounds[i + 1]} for i in range(len(bounds) - 1)]
 
-    num_chunks = math.ceil(original_size_mb / chunk_size_mb)
-    chunk_duration_s = math.ceil(duration_s / num_chunks)
-    
-    base, ext = os.path.splitext(os.path.basename(video_path))
-    # Gera a lista de nomes de arquivo que esperamos criar
-    expected_chunk_paths = [os.path.join(output_dir, f"{base}_chunk_{i+1:02d}{ext}") for i in range(num_chunks)]
-
-    # === NOVA LÓGICA DE VERIFICAÇÃO ===
-    # Verifica se TODOS os chunks esperados já existem
-    all_chunks_exist = all(os.path.isfile(p) for p in expected_chunk_paths)
-    if all_chunks_exist:
-        print(f"  Todos os {num_chunks} chunks esperados já existem. Pulando a etapa de criação.")
-        print("--- Etapa 0 Concluída (Arquivos existentes utilizados) ---")
-        return expected_chunk_paths
-    # ==============================
-
-    print(f"  Vídeo de {original_size_mb:.2f}MB será dividido em {num_chunks} chunks de ~{chunk_duration_s} segundos cada.")
-    
-    created_chunk_paths = []
-    start_time = 0
-    
-    for i in range(num_chunks):
-        if start_time >= duration_s:
-            break
-
-        output_path = expected_chunk_paths[i]
-        created_chunk_paths.append(output_path)
-
-        # === VERIFICAÇÃO INDIVIDUAL DE CADA CHUNK ===
-        if os.path.isfile(output_path):
-            print(f"  Chunk {i+1}/{num_chunks}: '{os.path.basename(output_path)}' já existe. Pulando criação.")
-            start_time += chunk_duration_s
-            continue
-        # ============================================
-        
-        ffmpeg_command = [
-            'ffmpeg', '-y',
-            '-ss', str(start_time),
-            '-i', video_path,
-            '-t', str(chunk_duration_s),
-            '-c', 'copy',
-            output_path
-        ]
-        
-        print(f"  Criando chunk {i+1}/{num_chunks}: {os.path.basename(output_path)}")
-        
-        try:
-            result = subprocess.run(ffmpeg_command, capture_output=True, text=True, check=False)
-            if result.returncode != 0:
-                print(f"  !! Erro ao criar chunk {i+1}. Stderr: {result.stderr}")
-                return None # Para o processo se um chunk falhar
-        except Exception as e:
-            print(f"  !! Exceção ao criar chunk {i+1}: {e}")
-            return None
-            
-        start_time += chunk_duration_s
-
-    print(f"--- Etapa 0 Concluída: Criados/Verificados {len(created_chunk_paths)} chunks. ---")
-    return created_chunk_paths
+    # Chunks sem manifesto (ou de outro plano) podem ter limites diferentes; nem eles nem o que
+    # foi produzido a partir deles são reaproveitados. A fonte (sem divisão) não depende do plano.
+    for chunk_path in dict.fromkeys(stale_chunk_paths + [c["path"] for c in chunk_entries]):
+        if chunk_path in (video_path, manifest and manifest.get("source_filepath")): continue
+        if os.path.isfile(chunk_path):
+            print(f"  Removendo chunk antigo fora do plano atual: {os.path.basename(chunk_path)}")
+            os.remove(chunk_path)
+        if invalidate_chunk: invalidate_chunk(chunk_path)
+    manifest = {"source_filepath": video_path, **plan_inputs, "num_chunks": len(chunk_entries), "chunks": chunk_entries}
+    with open(os.path.join(output_dir, CHUNK_MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    if len(chunk_entries) > 1:
+        print(f"  Vídeo de {original_size_mb:.2f}MB será dividido em {len(chunk_entries)} chunks: " +
+              ", ".join(f"{c['end_s'] - c['start_s']:.0f}s" for c in chunk_entries))
+    return chunk_entries
+
+
+def _silent_ranges_digest(silent_ranges_ms):
+    """Impressão digital dos silêncios usados para alinhar os cortes (None sem silêncios), para o manifesto."""
+    if not silent_ranges_ms: return None
+    ranges = json.dumps([[int(start_ms), int(end_ms)] for start_ms, end_ms in silent_ranges_ms])
+    return hashlib.sha1(ranges.encode("ascii")).hexdigest()
+
+
+def create_chunk(video_path, chunk, is_last):
+    """
+    Cria o arquivo de um chunk planejado por plan_chunks (-c copy, rápido e sem perdas).
+    Não faz nada se o chunk for o próprio vídeo ou se o arquivo já existir com a duração do plano
+    (pv_utils.check_artifact); um chunk que não confere é apagado e refeito.
+    Retorna True se o chunk estiver disponível.
+    """
+    output_path = chunk["path"]
+    # === VERIFICAÇÃO INDIVIDUAL DE CADA CHUNK ===
+    if output_path == video_path:
+        return True
+    if os.path.isfile(output_path):
+        # -c copy começa no keyframe anterior ao corte: a duração pode passar da planejada em até um GOP.
+        valid, reason = pv_utils.check_artifact(output_path, chunk["end_s"] - chunk["start_s"], CHUNK_DURATION_TOLERANCE_S)
+        if valid: return True
+        print(f"  Chunk existente '{os.path.basename(output_path)}' inválido ({reason}). Recriando.")
+        os.remove(output_path)
+    # ============================================
+
+    ffmpeg_command = ['ffmpeg', '-y', '-ss', str(chunk["start_s"]), '-i', video_path]
+    if not is_last: # O último chunk vai até o fim da fonte
+        ffmpeg_command.extend(['-t', f"{chunk['end_s'] - chunk['start_s']:.3f}"])
+    ffmpeg_command.extend(['-c', 'copy', output_path])
+
+    print(f"  Criando chunk: {os.path.basename(output_path)} ({chunk['start_s']:.2f}s -> {chunk['end_s']:.2f}s)")
+    try:
+        result = pv_ffmpeg_runner.run(ffmpeg_command, label="chunk", expected_duration_s=chunk['end_s'] - chunk['start_s'])
+        if result["returncode"] != 0:
+            print(f"  !! Erro ao criar chunk '{os.path.basename(output_path)}'. Stderr: {result['stderr_tail']}")
+            return False
+    except Exception as e:
+        print(f"  !! Exceção ao criar chunk '{os.path.basename(output_path)}': {e}")
+        return False
+    return True
+
+
+def divide_in_chunks(video_path, output_dir, chunk_size_mb=500, silent_ranges_ms=None, cut_tolerance_s=30.0,
+                     workers=1, memory_budget_mb=0):
+    """
+    Planeja (plan_chunks) e cria todos os chunks de uma vez.
+    Verifica se os chunks já existem antes de criá-los.
+    Retorna a lista de caminhos dos chunks criados.
+    """
+    chunk_entries = plan_chunks(video_path, output_dir, chunk_size_mb, silent_ranges_ms, cut_tolerance_s, workers, memory_budget_mb)
+    if chunk_entries is None: return None
+
+    for i, chunk in enumerate(chunk_entries):
+        if not create_chunk(video_path, chunk, is_last=(i == len(chunk_entries) - 1)):
+            return None # Para o processo se um chunk falhar
+
+    print(f"--- Etapa 0 Concluída: Criados/Verificados {len(chunk_entries)} chunks. ---")
+    return [c["path"] for c in chunk_entries]
 
 # O bloco if __name__ == "__main__" não é estritamente necessário para este módulo,
-# pois ele será chamado pelo pv-process.py, mas pode ser útil para testes isolados.
\ No newline at end of file
+# pois ele será chamado pelo pv-process.py, mas pode ser útil para testes isolados.
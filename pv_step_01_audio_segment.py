@@ -6,18 +6,26 @@ import math
 import subprocess
 import shutil 
 import argparse 
-from moviepy.editor import VideoFileClip
-from pydub import AudioSegment
-from pydub.silence import detect_silence
 
 try:
     import pv_utils
 except ImportError:
     print("AVISO: pv_utils.py não encontrado.")
     pv_utils = None
+import numpy as np
+import pv_audio_analysis
+import pv_intervals
+import pv_speed_map
+import pv_motion_analysis
+import pv_encoder_profiles
+import pv_ffmpeg_runner
+import pv_segment_index
+
+PLAN_FILE_NAME = "segment_plan.json"
 
 def extract_audio_direct_ffmpeg(video_path, temp_audio_path):
-    """Usa uma chamada FFmpeg direta para extrair áudio, mostrando o progresso."""
+    """Usa uma chamada FFmpeg direta para extrair áudio e o carrega com o Pydub."""
+    from pydub import AudioSegment # Backend opcional: só o detector "pydub" o carrega
     print(f"  Extraindo áudio para '{os.path.basename(temp_audio_path)}' com FFmpeg direto...")
     # command = [
     #     'ffmpeg', '-y', # Sobrescreve o arquivo temporário se ele existir
@@ -44,10 +52,9 @@ def extract_audio_direct_ffmpeg(video_path, temp_audio_path):
     ]
 
     try:
-        # Executa o comando e deixa o FFmpeg imprimir seu progresso/erros no terminal
-        # A saída de erro do FFmpeg (stderr) contém os logs de progresso.
-        # Ao não capturar stdout/stderr, eles são passados para o console.
-        subprocess.run(command, check=True, capture_output=False) # check=True lançará erro se FFmpeg falhar
+        result = pv_ffmpeg_runner.run(command, label="extração de áudio")
+        if result["returncode"] != 0:
+            raise subprocess.CalledProcessError(result["returncode"], command, stderr=result["stderr_tail"])
         
         # Carrega o arquivo WAV criado com o Pydub
         audio_segment = AudioSegment.from_wav(temp_audio_path)
@@ -55,7 +62,7 @@ def extract_audio_direct_ffmpeg(video_path, temp_audio_path):
         return audio_segment
     except subprocess.CalledProcessError as e:
         print(f"  !! Erro FFmpeg ao extrair áudio. O processo pode ter sido interrompido ou o arquivo é inválido.")
-        # O stderr do FFmpeg já terá sido impresso no console.
+        print(f"     Stderr: {e.stderr}")
         raise # Levanta a exceção para que a função principal saiba que falhou
     except FileNotFoundError:
         print("!! ERRO CRÍTICO: 'ffmpeg' não encontrado."); raise
@@ -63,6 +70,56 @@ def extract_audio_direct_ffmpeg(video_path, temp_audio_path):
         print(f"  !! Erro ao carregar o arquivo WAV com Pydub: {e}"); raise
 
 
+def plan_segments(silent_chunks_ms, duration_ms, speech_start_padding_ms, speech_end_padding_ms):
+    """
+    Plano contíguo de segmentos cobrindo [0, duration_ms]: as falas (lacunas entre os silêncios)
+    recebem o padding, limitado à duração, e são unidas quando se sobrepõem (falas que só se
+    encostam continuam separadas); o que sobra entre elas é silêncio.
+    Retorna uma lista ordenada de {"start_ms", "end_ms", "type"}.
+    """
+    if duration_ms <= 0: return []
+    silent_starts, silent_ends = pv_intervals.merge(*pv_intervals.as_arrays(silent_chunks_ms), join_touching=True)
+    speech_starts, speech_ends = pv_intervals.complement(silent_starts, silent_ends, 0, duration_ms)
+    speech_starts, speech_ends = pv_intervals.merge(*pv_intervals.pad(
+        speech_starts, speech_ends, speech_start_padding_ms, speech_end_padding_ms, 0, duration_ms))
+    silent_starts, silent_ends = pv_intervals.complement(speech_starts, speech_ends, 0, duration_ms)
+
+    starts = np.concatenate((speech_starts, silent_starts))
+    ends = np.concatenate((speech_ends, silent_ends))
+    types = ["speech"] * len(speech_starts) + ["silent"] * len(silent_starts)
+    order = np.argsort(starts, kind="stable").tolist()
+    starts, ends = starts.tolist(), ends.tolist()
+    return [{"start_ms": starts[i], "end_ms": ends[i], "type": types[i]} for i in order]
+
+
+def coalesce_segments(segments, min_silent_speedup_ms, apply_fade=False):
+    """
+    Passada de planejamento: une segmentos vizinhos quando mantê-los separados não muda o vídeo final.
+    Silêncios mais curtos que min_silent_speedup_ms não serão acelerados na Etapa 2, então tocam em
+    1x como a fala (e como os trechos "code"); trechos vizinhos em 1x viram um único segmento (e um
+    único FFmpeg), com o tipo mais "forte" entre eles (speech > code > silent). Se os segmentos
+    tiverem "speed" (mapa de velocidades), vale o fator gravado neles.
+    Com fades, cada segmento de fala recebe fade nas bordas, então nada é unido.
+    Retorna uma nova lista de segmentos.
+    """
+    if min_silent_speedup_ms is None or apply_fade:
+        return [seg.copy() for seg in segments]
+
+    def plays_at_normal_speed(seg):
+        if "speed" in seg: return seg["speed"] == 1
+        return seg["type"] in ("speech", "code") or (seg["end_ms"] - seg["start_ms"]) < min_silent_speedup_ms
+
+    type_rank = {"silent": 0, "code": 1, "speech": 2}
+    coalesced = []
+    for seg in segments:
+        if coalesced and plays_at_normal_speed(seg) and plays_at_normal_speed(coalesced[-1]):
+            coalesced[-1]["end_ms"] = seg["end_ms"]
+            if type_rank[seg["type"]] > type_rank[coalesced[-1]["type"]]: coalesced[-1]["type"] = seg["type"]
+        else:
+            coalesced.append(seg.copy())
+    return coalesced
+
+
 def segment_video(video_path_param, 
                   output_dir, 
                   json_file_name, 
@@ -71,8 +128,37 @@ def segment_video(video_path_param,
                   speech_start_padding_ms,
                   speech_end_padding_ms,
                   apply_fade=False,
-                  fade_duration_ms=20):
-    
+                  fade_duration_ms=20,
+                  audio_analysis=None,
+                  motion_analysis=None,
+                  min_silent_speedup_ms=None,
+                  on_segment_ready=None,
+                  wait_for_resources=None,
+                  speed_map=None,
+                  detector="pydub",
+                  encoder_profile=pv_encoder_profiles.DEFAULT_STAGE_PROFILES["cut"]):
+    """
+    Corta o vídeo em segmentos de fala/silêncio e grava o índice JSON.
+    Se audio_analysis (recorte da análise da fonte, ver pv_audio_analysis.slice_analysis) for
+    informado, os silêncios e níveis vêm dele e o áudio do vídeo não é decodificado aqui;
+    caso contrário o áudio é analisado aqui, pelo detector escolhido: "pydub" (extrai o WAV e
+    carrega na memória) ou "ffmpeg" (silencedetect em streaming; sem níveis de dBFS).
+    Se motion_analysis (recorte de pv_motion_analysis.slice_motion) for informado, os silêncios
+    com a tela mudando viram segmentos "code", que a Etapa 2 não acelera.
+    Se min_silent_speedup_ms for informado, silêncios curtos demais para serem acelerados são
+    incorporados aos segmentos de fala vizinhos (ver coalesce_segments). O plano final é salvo em
+    PLAN_FILE_NAME no output_dir.
+    Se on_segment_ready for informado, é chamado com os metadados de cada segmento assim que o
+    arquivo dele é gravado, para que a Etapa 2 comece sem esperar o índice completo.
+    Se wait_for_resources for informado, é chamado antes de cada corte e pode bloquear (por
+    exemplo, enquanto o orçamento de disco temporário estiver estourado).
+    Se speed_map (pv_speed_map) for informado, cada segmento recebe o fator da sua classe
+    (campo "speed" no plano e no índice); segmentos com fator 0 entram no índice sem arquivo
+    ("file": null) e não são cortados.
+    encoder_profile: nome ou dict de perfil (pv_encoder_profiles) usado para codificar os cortes.
+    Retorna {"video_path", "index_path" (o JSON), "segments" (lista de metadados)} ou None em
+    caso de falha (o motivo é impresso).
+    """
     os.makedirs(output_dir, exist_ok=True) 
     output_json_path = os.path.join(output_dir, json_file_name)
     print(f"--- Iniciando Etapa 1: Segmentação para '{os.path.basename(video_path_param)}' ---")
@@ -87,6 +173,7 @@ def segment_video(video_path_param,
             if video_info.get("error"): raise ValueError(f"Falha via pv_utils: {video_info.get('error')}")
             duration_s, fps = video_info["duration_s"], video_info["fps"]
         else: # Fallback
+            from moviepy.editor import VideoFileClip
             with VideoFileClip(video_path_param) as clip:
                 duration_s, fps = clip.duration, clip.fps
 
@@ -96,82 +183,78 @@ def segment_video(video_path_param,
         print(f"Processando vídeo: {os.path.basename(video_path_param)}, Duração: {duration_s:.2f}s, FPS: {fps:.2f}")
     except Exception as e:
         print(f"Falha crítica ao carregar info do vídeo: {e}")
-        return None, None, None, None
+        return None
 
-    # Extração de Áudio usando a nova função robusta
-    temp_audio_path = os.path.join(output_dir, f"temp_audio_{os.path.splitext(os.path.basename(video_path_param))[0]}.wav")
-    try:
-        full_audio_segment = extract_audio_direct_ffmpeg(video_path_param, temp_audio_path)
-    except Exception as e:
-        print(f"Não foi possível extrair o áudio do vídeo. Abortando esta etapa. Erro: {e}")
-        return video_path_param, None, None, None
-    finally:
-        if os.path.exists(temp_audio_path): os.remove(temp_audio_path)
-    
-    print(f"Detectando silêncio (min_len: {min_silence_len_ms}ms, threshold: {silence_thresh_dbfs}dBFS)...")
-    silent_chunks_ms = detect_silence(full_audio_segment, min_silence_len_ms, silence_thresh_dbfs, 1)
-    
-    # ... (O restante da lógica para gerar segmentos com padding, cortar com FFmpeg,
-    #      e criar o JSON permanece o mesmo da versão anterior que você me passou,
-    #      pois essa parte estava funcionando bem.)
-    # (Vou colar o resto para garantir que o arquivo esteja completo)
-    
-    # 1. Gerar lista inicial de segmentos contíguos
-    initial_segments = []
-    current_time_ms = 0
-    if duration_ms > 0:
-        if not silent_chunks_ms:
-            initial_segments.append({"start_ms": 0, "end_ms": duration_ms, "type": "speech"})
-        else:
-            for silent_start, silent_end in silent_chunks_ms:
-                if silent_start > current_time_ms: initial_segments.append({"start_ms": current_time_ms, "end_ms": silent_start, "type": "speech"})
-                if silent_end > silent_start: initial_segments.append({"start_ms": silent_start, "end_ms": silent_end, "type": "silent"})
-                current_time_ms = silent_end
-            if current_time_ms < duration_ms: initial_segments.append({"start_ms": current_time_ms, "end_ms": duration_ms, "type": "speech"})
-        initial_segments = [s for s in initial_segments if s["end_ms"] > s["start_ms"]]
-        if not initial_segments: initial_segments.append({"start_ms": 0, "end_ms": duration_ms, "type": "speech"})
-    
-    # 2. Aplicar padding e criar a lista final de segmentos
-    final_segments_props = []
-    if initial_segments:
-        expanded_speech = []
-        for seg in initial_segments:
-            if seg['type'] == "speech":
-                expanded_start = max(0, seg['start_ms'] - speech_start_padding_ms)
-                expanded_end = min(duration_ms, seg['end_ms'] + speech_end_padding_ms)
-                expanded_speech.append({"start_ms": expanded_start, "end_ms": expanded_end, "type": "speech"})
-        
-        if expanded_speech:
-            merged_speech = [expanded_speech[0].copy()]
-            for i in range(1, len(expanded_speech)):
-                if expanded_speech[i]['start_ms'] < merged_speech[-1]['end_ms']:
-                    merged_speech[-1]['end_ms'] = max(merged_speech[-1]['end_ms'], expanded_speech[i]['end_ms'])
-                else:
-                    merged_speech.append(expanded_speech[i].copy())
-        else: merged_speech = []
-
-        last_end_time_ms = 0
-        for speech_seg in merged_speech:
-            if speech_seg['start_ms'] > last_end_time_ms:
-                final_segments_props.append({"start_ms": last_end_time_ms, "end_ms": speech_seg['start_ms'], "type": "silent"})
-            final_segments_props.append(speech_seg)
-            last_end_time_ms = speech_seg['end_ms']
-        if last_end_time_ms < duration_ms:
-            final_segments_props.append({"start_ms": last_end_time_ms, "end_ms": duration_ms, "type": "silent"})
-        if not final_segments_props and duration_ms > 0:
-            final_segments_props.append({"start_ms": 0, "end_ms": duration_ms, "type": "silent" if not speech_segments else "speech"})
+    full_audio_segment = None
+    if audio_analysis is not None:
+        silent_chunks_ms = audio_analysis["silent_ranges_ms"]
+        print(f"Usando análise de áudio da fonte: {len(silent_chunks_ms)} trechos de silêncio neste intervalo.")
+    elif detector == "ffmpeg":
+        print(f"Detectando silêncio com FFmpeg silencedetect (min_len: {min_silence_len_ms}ms, threshold: {silence_thresh_dbfs}dBFS)...")
+        try:
+            silent_chunks_ms = pv_audio_analysis.detect_silence_ffmpeg(video_path_param, min_silence_len_ms, silence_thresh_dbfs, duration_ms)
+        except Exception as e:
+            print(f"Não foi possível detectar os silêncios do vídeo. Abortando esta etapa. Erro: {e}")
+            return None
+    else:
+        # Extração de Áudio usando a nova função robusta
+        temp_audio_path = os.path.join(output_dir, f"temp_audio_{os.path.splitext(os.path.basename(video_path_param))[0]}.wav")
+        try:
+            full_audio_segment = extract_audio_direct_ffmpeg(video_path_param, temp_audio_path)
+        except Exception as e:
+            print(f"Não foi possível extrair o áudio do vídeo. Abortando esta etapa. Erro: {e}")
+            return None
+        finally:
+            if os.path.exists(temp_audio_path): os.remove(temp_audio_path)
+
+        print(f"Detectando silêncio (min_len: {min_silence_len_ms}ms, threshold: {silence_thresh_dbfs}dBFS)...")
+        from pydub.silence import detect_silence
+        silent_chunks_ms = detect_silence(full_audio_segment, min_silence_len_ms, silence_thresh_dbfs, 1)
+
+    # 1 e 2. Falas (lacunas entre silêncios) com padding, unidas; o resto vira silêncio
+    final_segments_props = plan_segments(silent_chunks_ms, duration_ms, speech_start_padding_ms, speech_end_padding_ms)
     
     print(f"Gerados {len(final_segments_props)} segmentos finais com padding.")
+
+    if motion_analysis is not None:
+        final_segments_props = pv_motion_analysis.split_silent_by_motion(final_segments_props, motion_analysis["active_ranges_ms"])
+        code_count = sum(1 for seg in final_segments_props if seg["type"] == "code")
+        print(f"Movimento: {code_count} trechos de silêncio com a tela mudando classificados como 'code'.")
+
+    if speed_map is not None:
+        for seg in final_segments_props:
+            seg["speed"] = pv_speed_map.segment_speed(seg["type"], seg["end_ms"] - seg["start_ms"], speed_map, min_silent_speedup_ms or 0)
+        dropped = [seg for seg in final_segments_props if seg["speed"] == 0]
+        if dropped:
+            print(f"Mapa de velocidades: {len(dropped)} segmentos ({sum(s['end_ms'] - s['start_ms'] for s in dropped) / 1000.0:.1f}s) serão descartados sem corte.")
+
+    planned_count = len(final_segments_props)
+    final_segments_props = coalesce_segments(final_segments_props, min_silent_speedup_ms, apply_fade)
+    if len(final_segments_props) != planned_count:
+        print(f"Plano: {len(final_segments_props)} segmentos após unir {planned_count - len(final_segments_props)} vizinhos que tocam na mesma velocidade.")
+    try:
+        with open(os.path.join(output_dir, PLAN_FILE_NAME), 'w') as f:
+            json.dump({"segment_count": len(final_segments_props), "segment_count_before_coalescing": planned_count,
+                       "segments": final_segments_props}, f, indent=2)
+    except Exception as e:
+        print(f"Aviso: não foi possível salvar o plano de segmentos: {e}")
     
     for seg in final_segments_props:
         start_ms, end_ms = seg['start_ms'], seg['end_ms']
         chunk_start, chunk_end = max(0, min(start_ms, duration_ms)), max(0, min(end_ms, duration_ms))
-        seg['audio_chunk'] = full_audio_segment[chunk_start:chunk_end] if chunk_end > chunk_start else AudioSegment.empty()
+        if audio_analysis is not None:
+            seg['levels_dbfs'] = pv_audio_analysis.segment_levels_dbfs(audio_analysis, chunk_start, chunk_end)
+        elif full_audio_segment is None: # silencedetect: o áudio não foi carregado
+            seg['levels_dbfs'] = (None, None)
+        else:
+            audio_chunk = full_audio_segment[chunk_start:max(chunk_start, chunk_end)]
+            seg['levels_dbfs'] = (audio_chunk.dBFS, audio_chunk.max_dBFS) if audio_chunk.duration_seconds > 0.001 else (-999.0, -999.0)
 
     # 3. Loop de criação de vídeos com FFmpeg
     sound_index_content = []
     for seg_prop_index, seg_info in enumerate(final_segments_props):
-        start_ms, end_ms, segment_type, pydub_audio_chunk = seg_info.values()
+        start_ms, end_ms, segment_type = seg_info['start_ms'], seg_info['end_ms'], seg_info['type']
+        db_mean, db_peak = seg_info['levels_dbfs']
         start_time_s = start_ms / 1000.0; actual_end_time_s = min(end_ms / 1000.0, duration_s)
         duration_of_segment_s = actual_end_time_s - start_time_s
         if duration_of_segment_s <= 0.001: continue
@@ -179,47 +262,69 @@ def segment_video(video_path_param,
         actual_segment_index = len(sound_index_content)
         filename = f"{actual_segment_index:06d}_{segment_type}.mp4"
         output_path = os.path.join(output_dir, filename)
+        metadata = {
+            "index": actual_segment_index, "file": filename, "frame_start": math.floor(start_time_s * fps), 
+            "frame_end": math.floor(actual_end_time_s * fps) -1, "time_start": round(start_time_s, 3), 
+            "time_end": round(actual_end_time_s, 3), "fps": round(float(fps), 2),
+            "db_min": f"{db_mean:.1f}" if db_mean is not None else "n/a",
+            "db_max": f"{db_peak:.1f}" if db_peak is not None else "n/a",
+            "result": segment_type}
+        if "speed" in seg_info: metadata["speed"] = seg_info["speed"]
+        if seg_info.get("speed") == 0:
+            # Descartado pelo mapa de velocidades: fica no índice, mas não é decodificado nem codificado
+            metadata["file"] = None
+            sound_index_content.append(metadata)
+            if on_segment_ready: on_segment_ready(metadata)
+            continue
         print(f"  Processando segmento {seg_prop_index+1}/{len(final_segments_props)}: {filename} ({duration_of_segment_s:.3f}s)")
+        if pv_utils: pv_utils.print_progress("Etapa 1: cortes", seg_prop_index + 1, len(final_segments_props), os.path.basename(video_path_param))
+        if wait_for_resources: wait_for_resources()
         
+        keyframe_decoder_args = pv_encoder_profiles.decoder_args(encoder_profile)
+        if keyframe_decoder_args:
+            # Só keyframes decodificados: busca na entrada, a partir do keyframe anterior ao início (ver
+            # keyframe_fill_filters); o áudio, que também começa nele, é aparado em t=0.
+            input_args = ['-ss', str(start_time_s), '-noaccurate_seek', *keyframe_decoder_args, '-i', video_path_param]
+            profile_filters = pv_encoder_profiles.keyframe_fill_filters(encoder_profile, fps, duration_of_segment_s)
+            audio_filters = ["atrim=start=0"]
+        else:
+            input_args = ['-i', video_path_param, '-ss', str(start_time_s)]
+            profile_filters = pv_encoder_profiles.video_filters(encoder_profile)
+            audio_filters = []
         ffmpeg_command = [
-            'ffmpeg', '-y', '-i', video_path_param, '-ss', str(start_time_s),
+            'ffmpeg', '-y', *input_args,
             '-t', str(duration_of_segment_s), '-map', '0:v:0?', '-map', '0:a:0?', 
-            '-c:v', 'libx264', '-preset', 'ultrafast', '-force_key_frames', "expr:eq(n,0)", 
+            *pv_encoder_profiles.video_encoder_args(encoder_profile), '-force_key_frames', "expr:eq(n,0)", 
             '-c:a', 'aac', '-b:a', '192k', '-ar', '48000', '-ac', '2',
         ]
+        if profile_filters: ffmpeg_command.extend(['-vf', ",".join(profile_filters)])
         if apply_fade and seg_info['type'] == 'speech':
             fade_duration_s = fade_duration_ms / 1000.0
             if duration_of_segment_s > (2 * fade_duration_s):
                 fade_out_start = duration_of_segment_s - fade_duration_s
-                audio_filter = f"afade=t=in:st=0:d={fade_duration_s},afade=t=out:st={fade_out_start:.3f}:d={fade_duration_s}"
-                ffmpeg_command.extend(['-af', audio_filter])
+                audio_filters.append(f"afade=t=in:st=0:d={fade_duration_s},afade=t=out:st={fade_out_start:.3f}:d={fade_duration_s}")
+        if audio_filters: ffmpeg_command.extend(['-af', ",".join(audio_filters)])
         
         ffmpeg_command.append(output_path)
         
         try:
-            result = subprocess.run(ffmpeg_command, capture_output=True, text=True, check=False)
-            if result.returncode == 0:
-                metadata = {
-                    "index": actual_segment_index, "file": filename, "frame_start": math.floor(start_time_s * fps), 
-                    "frame_end": math.floor(actual_end_time_s * fps) -1, "time_start": round(start_time_s, 3), 
-                    "time_end": round(actual_end_time_s, 3), "fps": round(float(fps), 2),
-                    "db_min": f"{pydub_audio_chunk.dBFS if pydub_audio_chunk.duration_seconds > 0.001 else -999.0:.1f}", 
-                    "db_max": f"{pydub_audio_chunk.max_dBFS if pydub_audio_chunk.duration_seconds > 0.001 else -999.0:.1f}",
-                    "result": seg_info['type']}
+            result = pv_ffmpeg_runner.run(ffmpeg_command, label="corte", expected_duration_s=duration_of_segment_s)
+            if result["returncode"] == 0:
                 sound_index_content.append(metadata)
+                if on_segment_ready: on_segment_ready(metadata)
             else:
-                print(f"  !! Erro FFmpeg para {filename} (cód: {result.returncode}): {result.stderr[:500]}...")
+                print(f"  !! Erro FFmpeg para {filename} (cód: {result['returncode']}): {result['stderr_tail'][-500:]}")
         except Exception as e:
             print(f"  !! Erro subprocesso com FFmpeg para {filename}: {e}")
 
-    if video_clip_obj: video_clip_obj.close()
     try:
-        with open(output_json_path, 'w') as f: json.dump(sound_index_content, f, indent=2)
-        print(f"Etapa 1 concluída. Índice salvo em '{output_json_path}'.")
+        # Colunar (lido pelas etapas seguintes) + JSON de compatibilidade, gravado por último
+        pv_segment_index.write_index(output_dir, sound_index_content, json_file_name)
+        print(f"Etapa 1 concluída. Índice salvo em '{output_json_path}' (colunar: {pv_segment_index.SEGMENT_TABLE_NAME}).")
     except Exception as e:
-        print(f"Erro ao escrever JSON '{output_json_path}': {e}")
-        return video_path_param, None, None, sound_index_content
+        print(f"Erro ao escrever o índice '{output_json_path}': {e}")
+        return None
 
-    return video_path_param, output_json_path, None, sound_index_content
+    return {"video_path": video_path_param, "index_path": output_json_path, "segments": sound_index_content}
 
 # if __name__ == "__main__": (bloco de teste)
\ No newline at end of file
@@ -1,126 +1,191 @@
 # pv_step_02_silent_accelerator.py
 import os
 import json
-import subprocess
 import sys
+import pv_encoder_profiles
+import pv_ffmpeg_runner
+import pv_segment_index
+import pv_speed_map
+import pv_utils
+
+# As informações de cada segmento (duração, fps) vêm do índice gerado pela Etapa 1 ou são passadas
+# como parâmetros; pv_utils só confere os "_faster" já existentes numa retomada (check_artifact).
+
+def new_result_summary():
+    """Dicionário de resumo da Etapa 2 (contagens e mapa dos arquivos acelerados)."""
+    return {"processed_count": 0, "skipped_count": 0, "already_exists_count": 0, "dropped_count": 0, "created_files_map": {}}
+
+
+def add_to_summary(result_summary, segment_info, status, output_filepath):
+    """Acumula no resumo o resultado de accelerate_segment para um segmento."""
+    original_filename = segment_info.get("file")
+    if status == "processed":
+        result_summary["processed_count"] += 1
+    elif status == "already_exists":
+        result_summary["already_exists_count"] += 1
+    elif status == "skipped":
+        result_summary["skipped_count"] += 1
+    elif status == "dropped":
+        result_summary["dropped_count"] += 1
+    if status in ("processed", "already_exists"):
+        # Adiciona ao mapa mesmo se já existia, para que o processo principal saiba que ele existe
+        result_summary["created_files_map"][original_filename] = output_filepath
+
+
+def print_summary(result_summary):
+    print(f"--- Etapa 2 Concluída ---")
+    print(f"  {result_summary['processed_count']} segmentos silenciosos foram criados/acelerados.")
+    print(f"  {result_summary['already_exists_count']} segmentos acelerados já existiam e foram pulados.")
+    print(f"  {result_summary['skipped_count']} segmentos silenciosos eram curtos demais e foram ignorados.")
+    if result_summary.get("dropped_count"):
+        print(f"  {result_summary['dropped_count']} segmentos foram descartados pelo mapa de velocidades.")
+
+
+def accelerate_segment(segment_info, segments_dir, min_original_silent_duration_s, speedup_factor, video_fps,
+                       encoder_profile=pv_encoder_profiles.DEFAULT_STAGE_PROFILES["accelerate"], speed_map=None):
+    """
+    Acelera um único segmento do índice pelo fator da sua classe.
+    O fator vem do campo "speed" do índice (gravado pela Etapa 1) ou, em índices antigos, de
+    speed_map (pv_speed_map; padrão: só "silent", por speedup_factor). Segmentos mais curtos que
+    min_original_silent_duration_s tocam em 1x.
+    Pode ser chamado assim que o segmento é cortado pela Etapa 1 (sem esperar o índice completo).
+    encoder_profile: nome ou dict de perfil (pv_encoder_profiles) usado na codificação.
+    Retorna (status, caminho_de_saida). status: "not_silent", "missing", "skipped", "dropped",
+    "already_exists", "processed" ou "failed".
+    """
+    segment_type = segment_info.get("result")
+    factor = segment_info.get("speed")
+    if factor is None:
+        # Calcula a duração do segmento original a partir do JSON
+        original_duration_s = segment_info.get("time_end", 0.0) - segment_info.get("time_start", 0.0)
+        factor = pv_speed_map.segment_speed(segment_type, original_duration_s * 1000, speed_map or pv_speed_map.default_speed_map(speedup_factor),
+                                            min_original_silent_duration_s * 1000)
+    if factor == 0:
+        return "dropped", None # Nem foi cortado pela Etapa 1
+    if factor == 1:
+        # Silêncio em 1x: curto demais para acelerar
+        return ("skipped" if segment_type == "silent" else "not_silent"), None
+
+    original_filename = segment_info.get("file")
+    if not original_filename:
+        print(f"  Aviso Etapa 2: Segmento com índice {segment_info.get('index')} sem nome de arquivo. Pulando.")
+        return "missing", None
+
+    # Constrói o nome do arquivo de saída e verifica se ele já existe
+    base_name_part = original_filename.split('_')[0]
+    output_filename = f"{base_name_part}_faster.mp4"
+    output_filepath = os.path.join(segments_dir, output_filename)
+
+    # === LÓGICA DE VERIFICAÇÃO PARA RETOMADA DO PROCESSO ===
+    expected_duration_s = (segment_info.get("time_end", 0.0) - segment_info.get("time_start", 0.0)) / factor
+    if os.path.isfile(output_filepath):
+        # Só a duração no contêiner é conferida (sem decodificar): um arquivo de versões antigas,
+        # gravado sem o rename atômico, pode ter sido cortado por uma interrupção.
+        valid, reason = pv_utils.check_artifact(output_filepath, expected_duration_s)
+        if valid:
+            print(f"  Segmento acelerado '{output_filename}' já existe. Pulando criação.")
+            return "already_exists", output_filepath
+        print(f"  Segmento acelerado '{output_filename}' existente é inválido ({reason}). Refazendo.")
+        os.remove(output_filepath)
+    # ========================================================
+
+    # Verificado depois da saída: com a limpeza antecipada, o "_silent" some assim que o "_faster" fica pronto.
+    input_filepath = os.path.join(segments_dir, original_filename)
+    if not os.path.isfile(input_filepath):
+        print(f"  Aviso Etapa 2: Arquivo '{input_filepath}' não encontrado. Pulando.")
+        return "missing", None
+    
+    print(f"  Processando '{original_filename}' -> '{output_filename}' ({factor:g}x)")
+
+    pts_factor = 1.0 / factor
+    # Filtros do perfil (ex.: 360p/15fps do --proxy) depois do setpts
+    profile_filters = "".join("," + f for f in pv_encoder_profiles.video_filters(encoder_profile))
+    if segment_type == "silent":
+        # Silêncio: o áudio original é descartado e substituído por uma trilha silenciosa
+        audio_args = ['-f', 'lavfi', '-i', 'anullsrc=channel_layout=stereo:sample_rate=48000']
+        map_args = ['-vf', f'setpts={pts_factor:.3f}*PTS{profile_filters}', '-map', '0:v:0', '-map', '1:a:0']
+        audio_codec_args = ['-c:a', 'aac', '-b:a', '16k'] # Bitrate baixo para áudio silencioso
+    else:
+        # Fala/código acelerados: o áudio acompanha o vídeo (atempo)
+        audio_args = []
+        map_args = ['-filter_complex', f"[0:v:0]setpts={pts_factor:.6f}*PTS{profile_filters}[v];[0:a:0]{pv_speed_map.atempo_chain(factor)}[a]",
+                    '-map', '[v]', '-map', '[a]']
+        audio_codec_args = ['-c:a', 'aac', '-b:a', '192k', '-ar', '48000', '-ac', '2']
+    profile_fps = encoder_profile.get("fps") if isinstance(encoder_profile, dict) else pv_encoder_profiles.get_profile(encoder_profile).get("fps")
+    ffmpeg_command = [
+        'ffmpeg', '-y',
+        '-i', input_filepath,
+        *audio_args,
+        *map_args,
+        '-r', str(profile_fps or video_fps), # Força o FPS de saída para consistência (o do perfil, se houver)
+        *pv_encoder_profiles.video_encoder_args(encoder_profile),
+        *audio_codec_args,
+        '-shortest',        # Termina com o stream mais curto (o vídeo)
+        output_filepath
+    ]
+    
+    try:
+        ff_result = pv_ffmpeg_runner.run(ffmpeg_command, label="aceleração", expected_duration_s=expected_duration_s)
+        
+        if ff_result["returncode"] == 0:
+            return "processed", output_filepath
+        print(f"  !! Erro Etapa 2 ao processar '{original_filename}' com FFmpeg (código: {ff_result['returncode']}).")
+        if ff_result["stderr_tail"]: print(f"     Stderr: {ff_result['stderr_tail'][-400:]}") # Mostra o final do erro
+    except FileNotFoundError:
+        print("!! ERRO CRÍTICO Etapa 2: 'ffmpeg' não encontrado.")
+    except Exception as e:
+        print(f"!! Erro Etapa 2 inesperado ao processar '{original_filename}': {e}")
+    return "failed", None
 
-# Este script agora não precisa de pv_utils.py, pois as informações necessárias (duração, fps)
-# vêm do JSON gerado pela Etapa 1 ou são passadas como parâmetros.
 
 def accelerate_silent_segments(segments_dir, index_json_path, 
                                min_original_silent_duration_s, 
                                speedup_factor,
-                               video_fps):
+                               video_fps,
+                               encoder_profile=pv_encoder_profiles.DEFAULT_STAGE_PROFILES["accelerate"],
+                               speed_map=None):
     """
-    Processa os segmentos de vídeo marcados como "silent" no arquivo JSON:
+    Processa os segmentos do índice da Etapa 1 (ver accelerate_segment), lido do formato colunar
+    (pv_segment_index) no diretório de index_json_path (índices antigos, só em JSON, são convertidos):
     - Verifica se a versão acelerada já existe antes de criar.
-    - Acelera o vídeo pelo speedup_factor.
-    - Adiciona uma trilha de áudio silenciosa.
+    - Acelera o vídeo pelo fator da classe (speed_map; padrão: só "silent", por speedup_factor).
+    - Nos silêncios, troca o áudio por uma trilha silenciosa.
     - Salva como "_faster.mp4".
     Retorna um dicionário com contagens e um mapa dos arquivos criados.
     """
     
     # Inicializa o dicionário de resumo com o novo contador
-    result_summary = {"processed_count": 0, "skipped_count": 0, "already_exists_count": 0, "created_files_map": {}}
+    result_summary = new_result_summary()
 
     if not os.path.isdir(segments_dir):
         print(f"  ETAPA 2 ERRO: Diretório de segmentos '{segments_dir}' não encontrado.")
         return result_summary
-    if not os.path.isfile(index_json_path):
+    index_dir = os.path.dirname(index_json_path) or segments_dir
+    if not pv_segment_index.has_index(index_dir) and not os.path.isfile(index_json_path):
         print(f"  ETAPA 2 ERRO: Arquivo de índice '{index_json_path}' não encontrado.")
         return result_summary
 
     try:
-        with open(index_json_path, 'r') as f:
-            segment_data_list = json.load(f)
+        segment_table, segment_names = pv_segment_index.read_index(index_dir, os.path.basename(index_json_path))
     except Exception as e:
-        print(f"  ETAPA 2 ERRO: Falha ao ler ou parsear '{index_json_path}': {e}")
+        print(f"  ETAPA 2 ERRO: Falha ao ler o índice em '{index_dir}': {e}")
         return result_summary
 
-    if not segment_data_list:
+    if len(segment_table) == 0:
         print("  ETAPA 2: Nenhum segmento no índice para processar.")
         return result_summary
 
     print(f"--- Iniciando Etapa 2: Aceleração de Segmentos Silenciosos ---")
-    print(f"  Verificando {len(segment_data_list)} segmentos do índice: {os.path.basename(index_json_path)}")
-    print(f"  Acelerando por {speedup_factor}x os segmentos 'silent' com duração >= {min_original_silent_duration_s:.2f}s.")
+    print(f"  Verificando {len(segment_table)} segmentos do índice: {pv_segment_index.SEGMENT_TABLE_NAME}")
+    print(f"  Velocidades ({pv_speed_map.format_speed_map(speed_map or pv_speed_map.default_speed_map(speedup_factor))}) "
+          f"para segmentos com duração >= {min_original_silent_duration_s:.2f}s.")
     
-    for segment_info in segment_data_list:
-        if segment_info.get("result") == "silent":
-            original_filename = segment_info.get("file")
-            if not original_filename:
-                print(f"  Aviso Etapa 2: Segmento com índice {segment_info.get('index')} sem nome de arquivo. Pulando.")
-                continue
-
-            input_filepath = os.path.join(segments_dir, original_filename)
-            if not os.path.isfile(input_filepath):
-                print(f"  Aviso Etapa 2: Arquivo '{input_filepath}' não encontrado. Pulando.")
-                continue
-
-            # Calcula a duração do segmento silencioso original a partir do JSON
-            time_start = segment_info.get("time_start", 0.0)
-            time_end = segment_info.get("time_end", 0.0)
-            original_duration_s = time_end - time_start
-
-            # Pula se for muito curto para acelerar
-            if original_duration_s < min_original_silent_duration_s:
-                # print(f"  Segmento silencioso '{original_filename}' (duração: {original_duration_s:.3f}s) muito curto. Não será acelerado.")
-                result_summary["skipped_count"] += 1
-                continue
-            
-            # Constrói o nome do arquivo de saída e verifica se ele já existe
-            base_name_part = original_filename.split('_')[0]
-            output_filename = f"{base_name_part}_faster.mp4"
-            output_filepath = os.path.join(segments_dir, output_filename)
-
-            # === LÓGICA DE VERIFICAÇÃO PARA RETOMADA DO PROCESSO ===
-            if os.path.isfile(output_filepath):
-                print(f"  Segmento acelerado '{output_filename}' já existe. Pulando criação.")
-                result_summary["already_exists_count"] += 1
-                # Adiciona ao mapa mesmo assim, para que o processo principal saiba que ele existe
-                result_summary["created_files_map"][original_filename] = output_filepath
-                continue
-            # ========================================================
-            
-            print(f"  Processando '{original_filename}' -> '{output_filename}'")
-
-            pts_factor = 1.0 / speedup_factor
-            ffmpeg_command = [
-                'ffmpeg', '-y',
-                '-i', input_filepath,
-                '-f', 'lavfi',
-                '-i', 'anullsrc=channel_layout=stereo:sample_rate=48000',
-                '-vf', f'setpts={pts_factor:.3f}*PTS', 
-                '-map', '0:v:0', 
-                '-map', '1:a:0',
-                '-r', str(video_fps), # Força o FPS de saída para consistência
-                '-c:v', 'libx264', 
-                '-preset', 'ultrafast',
-                '-c:a', 'aac', 
-                '-b:a', '16k',      # Bitrate baixo para áudio silencioso
-                '-shortest',        # Termina com o stream mais curto (o vídeo)
-                output_filepath
-            ]
-            
-            try:
-                ff_result = subprocess.run(ffmpeg_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=False)
-                
-                if ff_result.returncode == 0:
-                    result_summary["created_files_map"][original_filename] = output_filepath
-                    result_summary["processed_count"] += 1
-                else:
-                    print(f"  !! Erro Etapa 2 ao processar '{original_filename}' com FFmpeg (código: {ff_result.returncode}).")
-                    if ff_result.stderr: print(f"     Stderr: {ff_result.stderr[:400]}...") # Mostra parte do erro
-            
-            except FileNotFoundError:
-                print("!! ERRO CRÍTICO Etapa 2: 'ffmpeg' não encontrado."); return result_summary
-            except Exception as e:
-                print(f"!! Erro Etapa 2 inesperado ao processar '{original_filename}': {e}")
+    for segment_info in pv_segment_index.iter_records(segment_table, segment_names):
+        status, output_filepath = accelerate_segment(segment_info, segments_dir, min_original_silent_duration_s,
+                                                     speedup_factor, video_fps, encoder_profile, speed_map)
+        add_to_summary(result_summary, segment_info, status, output_filepath)
         
-    print(f"--- Etapa 2 Concluída ---")
-    print(f"  {result_summary['processed_count']} segmentos silenciosos foram criados/acelerados.")
-    print(f"  {result_summary['already_exists_count']} segmentos acelerados já existiam e foram pulados.")
-    print(f"  {result_summary['skipped_count']} segmentos silenciosos eram curtos demais e foram ignorados.")
+    print_summary(result_summary)
     return result_summary
 
 
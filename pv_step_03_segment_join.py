@@ -1,14 +1,21 @@
 # pv_step_03_segment_join.py
 import os
-import subprocess
 import sys
 import tempfile # Para criar o filelist.txt de forma segura e limpa
 
-def join_segments_from_list(list_of_segment_filepaths, final_output_filepath):
+try:
+    import pv_ffmpeg_runner
+except ImportError:
+    print("ERRO: O arquivo pv_ffmpeg_runner.py não foi encontrado.")
+    sys.exit(1)
+
+def join_segments_from_list(list_of_segment_filepaths, final_output_filepath, expected_duration_s=None, on_progress=None):
     """
     Junta uma lista de arquivos de segmento em um único arquivo de saída.
     Usa o demuxer concat do FFmpeg.
     Espera uma lista de caminhos de arquivo (idealmente absolutos).
+    on_progress(snapshot) recebe o progresso do FFmpeg (ver pv_ffmpeg_runner.run); com
+    expected_duration_s (duração prevista da saída) o snapshot traz o percentual.
     Retorna True se bem-sucedido, False caso contrário.
     """
     if not list_of_segment_filepaths:
@@ -50,22 +57,19 @@ def join_segments_from_list(list_of_segment_filepaths, final_output_filepath):
         # A execução não precisa de um diretório de trabalho (cwd) específico
         # pois usamos caminhos absolutos (garantido pelo pv-process.py) ou
         # caminhos que são resolvidos corretamente pelo sistema.
-        result = subprocess.run(ffmpeg_command, 
-                                stdout=subprocess.PIPE, 
-                                stderr=subprocess.PIPE,
-                                text=True, check=False)
+        result = pv_ffmpeg_runner.run(ffmpeg_command, label="junção", expected_duration_s=expected_duration_s,
+                                      on_progress=on_progress)
 
-        # Imprime a saída do FFmpeg para diagnóstico
+        # Imprime o final da saída do FFmpeg para diagnóstico (só as últimas linhas são guardadas)
         print(f"  --- Saída FFmpeg para junção ({os.path.basename(final_output_filepath)}) ---")
-        if result.stdout: print("  FFmpeg STDOUT:\n" + result.stdout.strip())
-        if result.stderr: print("  FFmpeg STDERR:\n" + result.stderr.strip())
-        print(f"  --- Fim da saída FFmpeg (código de retorno: {result.returncode}) ---")
+        if result["stderr_tail"]: print("  FFmpeg STDERR (final):\n" + result["stderr_tail"].strip())
+        print(f"  --- Fim da saída FFmpeg (código de retorno: {result['returncode']}, {result['wall_s']:.1f}s) ---")
 
-        if result.returncode == 0:
+        if result["returncode"] == 0:
             print(f"  Junção concluída com sucesso: '{final_output_filepath}'")
             return True
         else:
-            print(f"  !! Erro Etapa 3 ao juntar segmentos com FFmpeg (código: {result.returncode}).")
+            print(f"  !! Erro Etapa 3 ao juntar segmentos com FFmpeg (código: {result['returncode']}).")
             return False
 
     except FileNotFoundError:
@@ -0,0 +1,129 @@
+# pv_temp_storage.py
+import os
+import time
+import threading
+from concurrent.futures import wait, FIRST_COMPLETED
+
+# Intervalo máximo (s) entre medições do uso de disco enquanto se espera o orçamento.
+BUDGET_POLL_INTERVAL_S = 5.0
+
+
+class TempStorage:
+    """
+    Controla o diretório temporário de uma execução: mede o uso de disco, apaga
+    intermediários que nenhuma etapa seguinte vai usar e segura trabalho novo enquanto
+    o orçamento (budget_mb, 0 = ilimitado) estiver estourado.
+    """
+
+    def __init__(self, root_dir, budget_mb=0, eager_cleanup=True):
+        self.root_dir = root_dir
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.eager_cleanup = eager_cleanup
+        self.freed_bytes = 0
+        self.freed_files = 0
+        self.peak_bytes = 0
+        self.wait_seconds = 0.0
+        self._pending = set()
+        self._last_check = None # [instante, uso] da última medição abaixo do orçamento, mais o que foi gravado/apagado desde então
+        self._lock = threading.Lock()
+
+    def usage_bytes(self):
+        """Soma o tamanho dos arquivos sob root_dir (e atualiza o pico observado)."""
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root_dir):
+            for name in filenames:
+                try: total += os.path.getsize(os.path.join(dirpath, name))
+                except OSError: pass # Arquivo apagado durante a varredura
+        with self._lock:
+            self.peak_bytes = max(self.peak_bytes, total)
+        return total
+
+    def track(self, future):
+        """Registra um trabalho em andamento cuja conclusão pode liberar espaço."""
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._untrack)
+        return future
+
+    def _untrack(self, future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def add_written(self, path):
+        """
+        Soma um intermediário recém-gravado (chunk, corte, aceleração) ao uso da última medição, para que
+        o intervalo sem nova medição de wait_for_budget não deixe passar um arquivo grande gravado nele.
+        """
+        try: size = os.path.getsize(path)
+        except OSError: return
+        with self._lock:
+            if self._last_check: self._last_check[1] += size
+
+    def wait_for_budget(self):
+        """
+        Bloqueia enquanto o uso estiver acima do orçamento e houver trabalho pendente que
+        possa liberar espaço. Sem trabalho pendente, avisa e segue (esperar não adiantaria).
+        """
+        if not self.budget_bytes: return
+        # Medir é uma varredura do diretório; abaixo do orçamento, mede no máximo uma vez por intervalo e,
+        # entre as medições, confia na última mais os arquivos informados por add_written/release.
+        with self._lock:
+            last_check = list(self._last_check) if self._last_check else None
+        if (last_check and time.perf_counter() - last_check[0] < BUDGET_POLL_INTERVAL_S
+                and last_check[1] <= self.budget_bytes): return
+        warned = False
+        while True:
+            usage = self.usage_bytes()
+            if usage <= self.budget_bytes:
+                with self._lock:
+                    self._last_check = [time.perf_counter(), usage]
+                return
+            with self._lock:
+                pending = list(self._pending)
+            if not pending:
+                print(f"  AVISO: Uso temporário ({usage / (1024*1024):.0f}MB) acima do orçamento "
+                      f"({self.budget_bytes / (1024*1024):.0f}MB), sem trabalho pendente para liberar espaço. Continuando.")
+                return
+            if not warned:
+                print(f"  Orçamento temporário estourado ({usage / (1024*1024):.0f}MB de {self.budget_bytes / (1024*1024):.0f}MB). "
+                      f"Aguardando {len(pending)} tarefa(s) pendente(s)...")
+                warned = True
+            wait_start = time.perf_counter()
+            wait(pending, timeout=BUDGET_POLL_INTERVAL_S, return_when=FIRST_COMPLETED)
+            self.wait_seconds += time.perf_counter() - wait_start
+
+    def release(self, path, reason=""):
+        """Apaga um intermediário consumido (se a limpeza antecipada estiver ativa)."""
+        if not self.eager_cleanup or not path or not os.path.isfile(path): return False
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError as e:
+            print(f"  AVISO: Não foi possível apagar '{os.path.basename(path)}': {e}")
+            return False
+        with self._lock:
+            self.freed_bytes += size
+            self.freed_files += 1
+            if self._last_check: self._last_check[1] = max(0, self._last_check[1] - size)
+        print(f"  Removido intermediário '{os.path.basename(path)}'" + (f" ({reason})" if reason else ""))
+        return True
+
+    def remove_partial_files(self, marker=".partial."):
+        """
+        Apaga saídas incompletas deixadas por um FFmpeg morto à força (nome com marker, ver
+        pv_ffmpeg_runner.partial_path). Retorna quantos arquivos foram apagados.
+        """
+        removed = 0
+        for dirpath, _, filenames in os.walk(self.root_dir):
+            for name in filenames:
+                if marker not in name: continue
+                try: os.remove(os.path.join(dirpath, name)); removed += 1
+                except OSError: pass
+        return removed
+
+    def stats(self):
+        """Resumo para o log da execução (o pico só é medido quando há orçamento)."""
+        final_usage = self.usage_bytes()
+        return {"root_dir": self.root_dir, "budget_bytes": self.budget_bytes, "eager_cleanup": self.eager_cleanup,
+                "final_usage_bytes": final_usage, "peak_usage_bytes": self.peak_bytes, "freed_bytes": self.freed_bytes,
+                "freed_files": self.freed_files, "budget_wait_seconds": round(self.wait_seconds, 1)}
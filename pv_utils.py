@@ -3,26 +3,69 @@ import os
 import json
 import subprocess
 import bisect
-from moviepy.editor import VideoFileClip # Usado como fallback se ffprobe falhar
+import mmap
+from array import array
+import pv_encoder_profiles
+import pv_ffmpeg_runner
+
+# Linhas de progresso estruturadas, para outro programa ler da saída. Só são impressas se pedidas
+# (pv-process.py --progress-json ou PV_PROGRESS_JSON=1); a GUI usa set_progress_listener.
+PROGRESS_PREFIX = "##PROGRESS## "
+PROGRESS_JSON_ENV = "PV_PROGRESS_JSON"
+
+_progress_listener = None
+_progress_json = os.environ.get(PROGRESS_JSON_ENV) == "1"
+
+
+def set_progress_json(enabled):
+    """Liga/desliga a impressão das linhas PROGRESS_PREFIX + JSON quando não há listener."""
+    global _progress_json
+    _progress_json = enabled
+
+
+def set_progress_listener(listener):
+    """
+    Envia o progresso para listener(dict) em vez de imprimi-lo (None volta ao padrão).
+    Vale para o processo todo; retorna o listener anterior.
+    """
+    global _progress_listener
+    previous, _progress_listener = _progress_listener, listener
+    return previous
+
+
+def print_progress(stage, done, total, detail="", overall=False):
+    """
+    Repassa o progresso {stage, done, total, detail, overall} ao listener, se houver; senão imprime
+    PROGRESS_PREFIX + JSON só com set_progress_json(True) (as etapas já imprimem suas mensagens).
+    """
+    progress = {"stage": stage, "done": done, "total": total, "detail": detail, "overall": overall}
+    if _progress_listener: _progress_listener(progress)
+    elif _progress_json: print(PROGRESS_PREFIX + json.dumps(progress, ensure_ascii=False), flush=True)
+
+def get_cache_dir():
+    """Diretório de cache por usuário (ex.: resultados do autotune). Pode ser trocado com PV_CACHE_DIR."""
+    cache_dir = os.environ.get("PV_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".pv-process")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
 
 def get_extended_video_info(video_path):
     """
     Obtém informações estendidas de um arquivo de vídeo usando ffprobe.
     Retorna um dicionário com: filepath, exists, size_bytes, duration_s, 
-                               fps, total_frames, video_stream_info, 
+                               fps, total_frames, width, height, video_stream_info, 
                                audio_stream_info, error.
     """
     if not os.path.isfile(video_path):
         return {
             "filepath": video_path, "exists": False, "size_bytes": 0, 
-            "duration_s": 0.0, "fps": 0.0, "total_frames": 0, 
+            "duration_s": 0.0, "fps": 0.0, "total_frames": 0, "width": 0, "height": 0,
             "video_stream_info": None, "audio_stream_info": None, "error": "Arquivo não encontrado"
         }
 
     size_bytes = os.path.getsize(video_path)
     info = {
         "filepath": video_path, "exists": True, "size_bytes": size_bytes, 
-        "duration_s": 0.0, "fps": 0.0, "total_frames": 0,
+        "duration_s": 0.0, "fps": 0.0, "total_frames": 0, "width": 0, "height": 0,
         "video_stream_info": "N/A", "audio_stream_info": "N/A", "error": None
     }
 
@@ -32,8 +75,10 @@ def get_extended_video_info(video_path):
             '-show_format', '-show_streams', # Pega informações do formato e dos streams
             '-of', 'json', video_path
         ]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
-        data = json.loads(result.stdout)
+        result = pv_ffmpeg_runner.run(cmd, label="ffprobe", stdout_handler=lambda stream: stream.read())
+        if result["returncode"] != 0:
+            raise subprocess.CalledProcessError(result["returncode"], cmd, stderr=result["stderr_tail"])
+        data = json.loads(result["stdout_result"])
 
         if 'format' in data and 'duration' in data['format']:
             try: info["duration_s"] = float(data['format']['duration'])
@@ -46,6 +91,7 @@ def get_extended_video_info(video_path):
             for stream in data['streams']:
                 if stream.get('codec_type') == 'video':
                     vs_info = f"Codec: {stream.get('codec_name', 'N/A')}, {stream.get('width')}x{stream.get('height')}"
+                    if info["width"] == 0: info["width"], info["height"] = stream.get('width') or 0, stream.get('height') or 0
                     if 'r_frame_rate' in stream:
                         try:
                             num, den = map(int, stream['r_frame_rate'].split('/'))
@@ -89,6 +135,7 @@ def get_extended_video_info(video_path):
     if (info["duration_s"] == 0.0 or info["fps"] == 0.0) and os.path.isfile(video_path):
         if info["error"]: print(f"  Aviso (ffprobe): {info['error']}. Tentando MoviePy para duration/fps...")
         try:
+            from moviepy.editor import VideoFileClip # Carregado só aqui: importar o MoviePy é lento
             clip = VideoFileClip(video_path)
             if info["duration_s"] == 0.0: info["duration_s"] = clip.duration if clip.duration is not None else 0.0
             if info["fps"] == 0.0: info["fps"] = clip.fps if clip.fps is not None else 0.0
@@ -103,40 +150,113 @@ def get_extended_video_info(video_path):
     return info
 
 
-def get_video_keyframes(video_path_kf):
-    """Usa ffprobe para obter uma lista de timestamps (em segundos) de todos os keyframes."""
-    print(f"Mapeando keyframes do vídeo: {os.path.basename(video_path_kf)}...")
-    command = [
-        'ffprobe', '-v', 'error',
-        '-select_streams', 'v:0', '-show_entries', 'frame=key_frame,pkt_pts_time',
-        '-of', 'json', video_path_kf
-    ]
+# Folga padrão de check_artifact: o maior entre o absoluto e a fração da duração prevista.
+ARTIFACT_TOLERANCE_S = 0.5
+ARTIFACT_TOLERANCE_RATIO = 0.05
+
+
+def check_artifact(path, expected_duration_s=None, tolerance_s=None):
+    """
+    Confere, sem decodificar, se um arquivo intermediário de uma execução anterior pode ser
+    reaproveitado: o contêiner abre no ffprobe, tem vídeo com pacotes (nb_frames do cabeçalho) e
+    a duração bate com a planejada (expected_duration_s) dentro de tolerance_s.
+    Retorna (True, None) ou (False, motivo).
+    """
+    if not os.path.isfile(path): return False, "não existe"
+    if os.path.getsize(path) == 0: return False, "arquivo vazio"
+    command = ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries',
+               'format=duration:stream=nb_frames', '-of', 'json', path]
     try:
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
-        data = json.loads(result.stdout)
-        keyframes = []
-        if 'frames' in data:
-            for frame_info in data['frames']:
-                if int(frame_info.get('key_frame', 0)) == 1 and 'pkt_pts_time' in frame_info:
-                    try: keyframes.append(float(frame_info['pkt_pts_time']))
-                    except (ValueError, TypeError): pass
-        
-        keyframes = sorted(list(set(kf for kf in keyframes if kf >= 0)))
-        if not keyframes or (keyframes and keyframes[0] > 0.01 and 0.0 not in keyframes):
-            bisect.insort(keyframes, 0.0)
-        if not keyframes: keyframes = [0.0]
-
-        print(f"Encontrados {len(keyframes)} keyframes. Primeiro: {keyframes[0]:.3f}s, Último: {keyframes[-1]:.3f}s" if keyframes else "Nenhum keyframe.")
+        result = pv_ffmpeg_runner.run(command, label="ffprobe", stdout_handler=lambda stream: stream.read())
+        data = json.loads(result["stdout_result"] or b"{}") if result["returncode"] == 0 else None
+    except (OSError, json.JSONDecodeError) as e:
+        return False, f"ffprobe falhou ({e})"
+    if data is None: return False, "contêiner ilegível"
+    if not data.get("streams"): return False, "sem stream de vídeo"
+    packets = data["streams"][0].get("nb_frames")
+    if packets not in (None, "N/A") and int(packets) == 0: return False, "sem pacotes de vídeo"
+    try: duration_s = float(data.get("format", {}).get("duration"))
+    except (TypeError, ValueError): return False, "sem duração"
+    if expected_duration_s:
+        if tolerance_s is None: tolerance_s = max(ARTIFACT_TOLERANCE_S, expected_duration_s * ARTIFACT_TOLERANCE_RATIO)
+        if abs(duration_s - expected_duration_s) > tolerance_s:
+            return False, f"duração {duration_s:.2f}s, esperada {expected_duration_s:.2f}s"
+    elif duration_s <= 0:
+        return False, "duração zero"
+    return True, None
+
+
+def keyframe_index_path(video_path, cache_dir=None):
+    """Sidecar do índice de keyframes, identificado pelo nome, tamanho e data de modificação da fonte."""
+    source_stat = os.stat(video_path)
+    base = os.path.splitext(os.path.basename(video_path))[0]
+    return os.path.join(cache_dir or get_cache_dir(), f"keyframes_{base}_{source_stat.st_size}_{source_stat.st_mtime_ns}.f64")
+
+
+def load_keyframe_index(index_path):
+    """Mapeia (mmap) um sidecar de keyframes como sequência de float64 ordenada, sem copiá-lo para a memória."""
+    with open(index_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0: return memoryview(array('d'))
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) # Continua válido após fechar o arquivo
+    return memoryview(mapped).cast('d')
+
+
+def read_packet_keyframes(video_path):
+    """
+    Lê os tempos (s) dos pacotes de vídeo marcados como keyframe (flag K) via ffprobe -show_packets,
+    em streaming (CSV linha a linha), sem decodificar quadros. Retorna um array('d') ordenado.
+    """
+    command = ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+               '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', video_path]
+    keyframes = array('d')
+
+    def read_packets(stream):
+        for line in stream:
+            pts_time, _, flags = line.decode('ascii', errors='replace').strip().partition(',')
+            if not flags.startswith('K'): continue
+            try: keyframes.append(float(pts_time))
+            except ValueError: pass # pts_time "N/A"
+
+    result = pv_ffmpeg_runner.run(command, label="ffprobe", stdout_handler=read_packets)
+    if result["returncode"] != 0:
+        raise subprocess.CalledProcessError(result["returncode"], command, stderr=result["stderr_tail"])
+    # Pacotes vêm em ordem de decodificação; o índice fica ordenado e sem repetições.
+    keyframes = array('d', sorted(set(kf for kf in keyframes if kf >= 0)))
+    if not keyframes or keyframes[0] > 0.01: keyframes.insert(0, 0.0)
+    return keyframes
+
+
+def get_video_keyframes(video_path_kf, cache_dir=None):
+    """
+    Timestamps (em segundos) de todos os keyframes, em ordem crescente. O índice é montado a partir
+    das flags dos pacotes e salvo como sidecar binário (float64) em cache_dir (padrão: get_cache_dir());
+    nas chamadas seguintes o sidecar é só mapeado (mmap). Retorna uma sequência somente leitura
+    (memoryview), aceita por find_kf_before_or_at/find_kf_after_or_at.
+    """
+    index_path = keyframe_index_path(video_path_kf, cache_dir)
+    if os.path.isfile(index_path):
+        keyframes = load_keyframe_index(index_path)
+        print(f"Índice de keyframes reaproveitado: {os.path.basename(index_path)} ({len(keyframes)} keyframes).")
         return keyframes
+
+    print(f"Mapeando keyframes do vídeo: {os.path.basename(video_path_kf)}...")
+    try:
+        keyframes = read_packet_keyframes(video_path_kf)
     except FileNotFoundError:
         print("!! ERRO CRÍTICO: 'ffprobe' não encontrado."); raise
     except subprocess.CalledProcessError as e:
-        print(f"Erro ao executar ffprobe (JSON) para {os.path.basename(video_path_kf)}: {e.stderr}"); raise
-    except json.JSONDecodeError:
-        output_stdout = result.stdout if 'result' in locals() and hasattr(result, 'stdout') else 'N/A (sem output capturado)'
-        print(f"Erro ao decodificar JSON do ffprobe. Saída: {output_stdout}"); raise
-    except Exception as e:
-        print(f"Erro inesperado ao obter keyframes (JSON) para {os.path.basename(video_path_kf)}: {e}"); raise
+        print(f"Erro ao executar ffprobe (pacotes) para {os.path.basename(video_path_kf)}: {e.stderr}"); raise
+    print(f"Encontrados {len(keyframes)} keyframes. Primeiro: {keyframes[0]:.3f}s, Último: {keyframes[-1]:.3f}s")
+
+    try:
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        temp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f: keyframes.tofile(f)
+        os.replace(temp_path, index_path) # Nunca deixa um sidecar pela metade
+        return load_keyframe_index(index_path)
+    except OSError as e:
+        print(f"  Aviso: não foi possível salvar o índice de keyframes ({e}). Usando-o só em memória.")
+        return memoryview(keyframes)
 
 def find_kf_before_or_at(target_time, kf_list_sorted):
     """Encontra o maior keyframe <= target_time."""
@@ -153,8 +273,11 @@ def find_kf_after_or_at(target_time, kf_list_sorted, video_duration_s_ref):
     return min(kf_list_sorted[idx], video_duration_s_ref)
 
 
-def re_encode_video_for_keyframes(input_video_path, output_video_path, keyframe_interval_s=1.0):
-    """Recodifica o vídeo para forçar keyframes mais frequentes."""
+def re_encode_video_for_keyframes(input_video_path, output_video_path, keyframe_interval_s=1.0,
+                                  encoder_profile=None):
+    """Recodifica o vídeo para forçar keyframes mais frequentes (perfil de codificação: encoder_profile)."""
+    # Resolvido aqui (e não no default) porque pv_encoder_profiles também importa pv_utils.
+    if encoder_profile is None: encoder_profile = pv_encoder_profiles.DEFAULT_STAGE_PROFILES["keyframes"]
     print("-" * 50)
     print(f"Iniciando re-codificação de '{os.path.basename(input_video_path)}' para adicionar keyframes...")
     print(f"Novo arquivo será salvo como: '{os.path.basename(output_video_path)}'")
@@ -176,7 +299,7 @@ def re_encode_video_for_keyframes(input_video_path, output_video_path, keyframe_
     os.makedirs(os.path.dirname(output_video_path), exist_ok=True)
     re_encode_command = [
         'ffmpeg', '-y', '-i', input_video_path,
-        '-c:v', 'libx264', '-preset', 'medium', 
+        *pv_encoder_profiles.video_encoder_args(encoder_profile),
         '-c:a', 'aac', '-b:a', '192k',
     ]
     if gop_size_str:
@@ -187,8 +310,8 @@ def re_encode_video_for_keyframes(input_video_path, output_video_path, keyframe_
     
     try:
         print(f"Executando FFmpeg para re-codificação: {' '.join(re_encode_command)}")
-        result = subprocess.run(re_encode_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=False)
-        if result.returncode == 0:
+        result = pv_ffmpeg_runner.run(re_encode_command, label="keyframes")
+        if result["returncode"] == 0:
             print("Re-codificação concluída com sucesso!")
             re_encode_details["status"] = "Sucesso"
             try:
@@ -199,7 +322,7 @@ def re_encode_video_for_keyframes(input_video_path, output_video_path, keyframe_
             return True, re_encode_details
         else:
             print("!! Erro durante a re-codificação do vídeo:")
-            if result.stderr: print(f"   Stderr: {result.stderr.strip()}")
+            if result["stderr_tail"]: print(f"   Stderr: {result['stderr_tail'].strip()}")
             return False, re_encode_details
     except FileNotFoundError:
         print("!! ERRO CRÍTICO: 'ffmpeg' não encontrado para re-codificação."); return False, re_encode_details